@@ -14,7 +14,7 @@ import re
 from collections import Counter
 from typing import Any
 
-from peakon_api.db import get_db
+from peakon_api.db import get_sync_db
 from peakon_api.main import _answer_driver_id, _as_lookup_ids, _english_text, _nested_value
 
 
@@ -100,7 +100,7 @@ def main() -> None:
     parser.add_argument("--missing-csv", help="Optional path to write missing questionId examples for lookup-table completion")
     args = parser.parse_args()
 
-    db = get_db()
+    db = get_sync_db()
     query = {
         "attributes.responseAnsweredAt": {
             "$gte": args.start,
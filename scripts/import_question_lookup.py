@@ -18,7 +18,7 @@ import re
 from pathlib import Path
 from typing import Any
 
-from peakon_api.db import get_db
+from peakon_api.db import get_sync_db
 
 
 QUESTION_ID_COLUMNS = ("questionId", "question_id", "id", "_id")
@@ -56,7 +56,7 @@ def main() -> None:
     args = parser.parse_args()
 
     path = Path(normalize_input_path(args.csv_path))
-    db = get_db()
+    db = get_sync_db()
 
     seen = 0
     imported = 0
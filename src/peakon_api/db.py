@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from typing import ContextManager
 
-from pymongo import MongoClient
+import pymongo
+from pymongo import AsyncMongoClient, MongoClient
 
 from peakon_ingest.config import get_settings
+from peakon_ingest.generations import GENERATION_STATE, GenerationDb, generation_db
 
 
 @lru_cache
@@ -13,11 +16,43 @@ def _settings():
 
 
 @lru_cache
-def _client() -> MongoClient:
+def _client() -> AsyncMongoClient:
     settings = _settings()
-    return MongoClient(settings.mongo_uri)
+    return AsyncMongoClient(
+        settings.mongo_uri,
+        maxPoolSize=settings.api_mongo_max_pool_size,
+        minPoolSize=settings.api_mongo_min_pool_size,
+    )
 
 
-def get_db():
+@lru_cache
+def _sync_client() -> MongoClient:
+    return MongoClient(_settings().mongo_uri)
+
+
+async def get_db() -> GenerationDb:
+    """The database at the current generation; each request reads the pointer once, so never sees half a swap."""
+    settings = _settings()
+    db = _client()[settings.mongo_db]
+    return generation_db(db, await db.sync_state.find_one({"_id": GENERATION_STATE}))
+
+
+def get_sync_db() -> GenerationDb:
+    """Blocking access at the current generation, for the maintenance scripts."""
     settings = _settings()
-    return _client()[settings.mongo_db]
+    db = _sync_client()[settings.mongo_db]
+    return generation_db(db, db.sync_state.find_one({"_id": GENERATION_STATE}))
+
+
+def request_deadline() -> ContextManager[None]:
+    """Bound every Mongo operation inside the block by the request's remaining time (pymongo sends it as maxTimeMS)."""
+    return pymongo.timeout(_settings().api_request_timeout_seconds or None)
+
+
+async def close_client() -> None:
+    if _client.cache_info().currsize:
+        await _client().close()
+        _client.cache_clear()
+    if _sync_client.cache_info().currsize:
+        _sync_client().close()
+        _sync_client.cache_clear()
@@ -1,22 +1,46 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import bisect
 import csv
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 import io
 import re
-from collections import defaultdict
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict, defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from bson import ObjectId
-from fastapi import FastAPI, Query
+from bson import Decimal128, ObjectId, json_util
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, Response
 from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+
+from peakon_ingest.aggregates import AGG_COLLECTION, AGG_STATE, merge_buckets
+from peakon_ingest.normalize import (
+    NORM_VERSION,
+    answer_norm,
+    canonical_id,
+    contains_any,
+    csv_values,
+    employee_filter_query,
+    employee_norm,
+    score_norm,
+)
+
+from .db import close_client, get_db, request_deadline
+from .org_map import org_payload
+
 
-from .db import get_db
-from .org_map import build_org_map_payload
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    yield
+    await close_client()
 
-app = FastAPI(title="Peakon Browse API")
+
+app = FastAPI(title="Peakon Browse API", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,6 +54,18 @@ ANSWERS_ORPHANED_MANAGER_ID = "__orphaned__"
 MANAGER_VISIBILITY_THRESHOLD = 5
 
 
+@app.middleware("http")
+async def _mongo_deadline(request: Request, call_next):
+    # One time budget for all queries of a request; a query that runs out fails with a timeout.
+    try:
+        with request_deadline():
+            return await call_next(request)
+    except PyMongoError as e:
+        if not e.timeout:
+            raise
+        return JSONResponse({"detail": "Database query timed out"}, status_code=504)
+
+
 def _serialize(value: Any) -> Any:
     if isinstance(value, ObjectId):
         return str(value)
@@ -40,20 +76,145 @@ def _serialize(value: Any) -> Any:
     return value
 
 
-def _list_collection(
+def _encode_cursor(values: List[Any]) -> str:
+    """Opaque page token: the sort key of the last item of a page, as extended JSON."""
+    raw = json_util.dumps(values, json_options=json_util.CANONICAL_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str, size: int) -> List[Any]:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8"))
+    except Exception:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+# BSON types in the order Mongo sorts them, for the `_id`s the collections hold.
+_ID_SORT_TYPES = ("number", "string", "objectId", "bool", "date")
+
+
+def _id_sort_type(value: Any) -> Optional[str]:
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, Decimal128)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    return None
+
+
+def _after_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Condition selecting what comes after the page a `cursor` ends, newest `_id` first.
+
+    The token keeps the `_id`'s type (extended JSON). `$lt` only compares
+    within a type, while the sort puts e.g. string ids above numeric ones, so
+    ids of the types sorting below the last one are selected as well.
+    """
+    if not cursor:
+        return None
+    (last_id,) = _decode_cursor(cursor, 1)
+    id_type = _id_sort_type(last_id)
+    lower = list(_ID_SORT_TYPES[: _ID_SORT_TYPES.index(id_type)]) if id_type else []
+    if not lower:
+        return {"_id": {"$lt": last_id}}
+    return {"$or": [{"_id": {"$lt": last_id}}, {"_id": {"$type": lower}}]}
+
+
+async def _read_page(
+    coll: Any, query: Dict[str, Any], after: Optional[Dict[str, Any]], *, limit: int, skip: int
+) -> List[Dict[str, Any]]:
+    page_query = ({"$and": [query, after]} if query else after) if after else query
+    find = coll.find(page_query).sort("_id", DESCENDING).skip(0 if after else skip).limit(limit + 1)
+    return [doc async for doc in find]
+
+
+def _page(docs: List[Dict[str, Any]], *, limit: int, skip: int, total: int) -> Dict[str, Any]:
+    # Pages are read with one extra doc, which tells whether there is a next page.
+    next_cursor = _encode_cursor([docs[limit - 1]["_id"]]) if len(docs) > limit else None
+    items = [_serialize(doc) for doc in docs[:limit]]
+    return {"items": items, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor}
+
+
+async def _list_collection(
+    db: Any,
     name: str,
     *,
     limit: int,
     skip: int,
     filter_query: Optional[Dict[str, Any]] = None,
+    cursor: Optional[str] = None,
 ) -> Dict[str, Any]:
-    db = get_db()
+    """One page, newest `_id` first.
+
+    With a `cursor` (the `next_cursor` of the previous page) the page starts
+    after that `_id` and `skip` is not applied, so deep pages cost the same as
+    the first; `skip` is echoed back for the caller's position display.
+    """
     coll = db[name]
     query = filter_query or {}
-    cursor = coll.find(query).sort("_id", DESCENDING).skip(skip).limit(limit)
-    items = [_serialize(doc) for doc in cursor]
-    total = coll.count_documents(query)
-    return {"items": items, "total": total, "skip": skip, "limit": limit}
+    after = _after_cursor(cursor)
+    docs = await _read_page(coll, query, after, limit=limit, skip=skip)
+    total = await coll.count_documents(query)
+    return _page(docs, limit=limit, skip=skip, total=total)
+
+
+# Totals of recent /answers_export filters by (data version, filter), so paging
+# through one result set counts it once.
+ANSWERS_TOTALS_CACHED = 256
+_answers_totals: "OrderedDict[Tuple[Any, ...], Dict[str, int]]" = OrderedDict()
+
+
+async def _answers_data_version(db: Any) -> Tuple[Any, ...]:
+    """Changes whenever the answers the API reads may have: a generation swap or an ingest write.
+
+    The ingest moves `sync_state.answers_export.updated_at` with every page checkpoint and at the end.
+    """
+    state = await db.sync_state.find_one({"_id": "answers_export"}, {"updated_at": 1}) or {}
+    return db["answers_export"].name, state.get("updated_at")
+
+
+async def _list_answers_export(
+    db: Any, query: Dict[str, Any], *, limit: int, skip: int, cursor: Optional[str]
+) -> Dict[str, Any]:
+    """A page of answers with the filter's `total` and `unique_employees`.
+
+    The page is always read by the `_id`-ordered find, which walks the index
+    (a `$sort` inside `$facet` could not). Both counts come from one `$facet`
+    on the first request for a filter and are cached for its later pages.
+    """
+    coll = db.answers_export
+    docs = await _read_page(coll, query, _after_cursor(cursor), limit=limit, skip=skip)
+    key = (await _answers_data_version(db), json_util.dumps(query, sort_keys=True))
+    totals = _answers_totals.get(key)
+    if totals is None:
+        pipeline = [
+            {"$match": query},
+            {
+                "$facet": {
+                    "total": [{"$count": "n"}],
+                    "unique_employees": [
+                        {"$match": {"norm.employee_id": {"$ne": None}}},
+                        {"$group": {"_id": "$norm.employee_id"}},
+                        {"$count": "n"},
+                    ],
+                }
+            },
+        ]
+        (facet,) = [doc async for doc in await coll.aggregate(pipeline, allowDiskUse=True)]
+        totals = {name: (facet[name] or [{"n": 0}])[0]["n"] for name in ("total", "unique_employees")}
+        _answers_totals[key] = totals
+        while len(_answers_totals) > ANSWERS_TOTALS_CACHED:
+            _answers_totals.popitem(last=False)
+    else:
+        _answers_totals.move_to_end(key)
+    return {**_page(docs, limit=limit, skip=skip, total=totals["total"]), "unique_employees": totals["unique_employees"]}
 
 
 def _iso_range(field: str, start: Optional[str], end: Optional[str]) -> Dict[str, Any]:
@@ -76,26 +237,21 @@ def _parse_int(value: Optional[str]) -> Optional[int]:
         return None
 
 
-def _id_lookup_values(raw_ids: List[Any]) -> List[Any]:
-    out: List[Any] = []
-    seen: set[str] = set()
+def _norm(doc: Dict[str, Any], derive) -> Dict[str, Any]:
+    """The doc's `norm` subdocument, derived on the fly for docs written before NORM_VERSION."""
+    norm = doc.get("norm")
+    if isinstance(norm, dict) and norm.get("v") == NORM_VERSION:
+        return norm
+    return derive(doc)
 
-    def add(value: Any) -> None:
-        if value is None:
-            return
-        key = f"{type(value).__name__}:{value}"
-        if key not in seen:
-            seen.add(key)
-            out.append(value)
 
+def _canonical_ids(raw_ids: List[Any]) -> List[Any]:
+    """Distinct ids in their stored form (see `canonical_id`), for `$in` on `_id`/`norm.*_id`."""
+    out: List[Any] = []
     for raw_id in raw_ids:
-        add(raw_id)
-        raw_str = str(raw_id)
-        add(raw_str)
-        parsed = _parse_int(raw_str)
-        if parsed is not None:
-            add(parsed)
-
+        value = canonical_id(raw_id)
+        if value is not None and value not in out:
+            out.append(value)
     return out
 
 
@@ -157,25 +313,14 @@ def _as_lookup_ids(value: Any) -> List[Any]:
 
 
 def _answer_driver_id(answer: Dict[str, Any]) -> Any:
-    attrs = answer.get("attributes") or {}
-    rels = answer.get("relationships") or {}
-    return _nested_value(
-        attrs,
-        "driverId",
-        "driverID",
-        "engagementDriverId",
-        "engagement_driver_id",
-        "driver.id",
-    ) or _nested_value(
-        rels,
-        "driver.data.id",
-        "Driver.data.id",
-        "engagementDriver.data.id",
-        "question.data.relationships.driver.data.id",
-    )
+    return _norm(answer, answer_norm).get("driver_id")
+
+
+def _answer_employee_id(answer: Dict[str, Any]) -> Any:
+    return _norm(answer, answer_norm).get("employee_id")
 
 
-def _driver_lookup(db: Any, driver_ids: set[Any], question_ids: set[Any]) -> Dict[str, Dict[str, Any]]:
+async def _driver_lookup(db: Any, driver_ids: set[Any], question_ids: set[Any]) -> Dict[str, Dict[str, Any]]:
     lookup: Dict[str, Dict[str, Any]] = {}
     ids: List[Any] = []
     for value in list(driver_ids) + list(question_ids):
@@ -183,7 +328,7 @@ def _driver_lookup(db: Any, driver_ids: set[Any], question_ids: set[Any]) -> Dic
     if not ids:
         return lookup
     try:
-        for doc in db.drivers_catalog.find({"_id": {"$in": ids}}):
+        async for doc in db.drivers_catalog.find({"_id": {"$in": ids}}):
             lookup[str(doc.get("_id"))] = doc
     except Exception:
         return lookup
@@ -237,19 +382,19 @@ def _answers_export_query(
     emp_id = _parse_int(employee_id)
     q_id = _parse_int(question_id)
     if emp_id is not None:
-        query["attributes.employeeId"] = emp_id
+        query["norm.employee_id"] = emp_id
     if q_id is not None:
-        query["attributes.questionId"] = q_id
+        query["norm.question_id"] = q_id
     if min_score is not None or max_score is not None:
         score_query: Dict[str, Any] = {}
         if min_score is not None:
             score_query["$gte"] = min_score
         if max_score is not None:
             score_query["$lte"] = max_score
-        query["attributes.answerScore"] = score_query
+        query["norm.score"] = score_query
     start = _validate_iso(answered_from)
     end = _validate_iso(answered_to)
-    query.update(_iso_range("attributes.responseAnsweredAt", start, end))
+    query.update(_iso_range("norm.answered_at", start, end))
     if search:
         query["$or"] = [
             {"attributes.questionText": {"$regex": search, "$options": "i"}},
@@ -286,25 +431,8 @@ def _answers_export_query(
 
 
 def _employee_manager_id(employee: Dict[str, Any]) -> Optional[str]:
-    relationships = employee.get("relationships") or {}
-    if isinstance(relationships, dict):
-        for key in ("Manager", "manager"):
-            rel = relationships.get(key) or {}
-            if isinstance(rel, dict):
-                data = rel.get("data") or {}
-                if isinstance(data, dict):
-                    mgr_id = data.get("id")
-                    if mgr_id is not None and str(mgr_id).strip() != "":
-                        return str(mgr_id)
-    attrs = employee.get("attributes") or {}
-    manager = attrs.get("manager")
-    if isinstance(manager, dict):
-        data = manager.get("data") or {}
-        if isinstance(data, dict):
-            mgr_id = data.get("id")
-            if mgr_id is not None and str(mgr_id).strip() != "":
-                return str(mgr_id)
-    return None
+    manager_id = _norm(employee, employee_norm).get("manager_id")
+    return str(manager_id) if manager_id is not None else None
 
 
 def _is_orphaned_manager_filter(manager_id: Optional[str]) -> bool:
@@ -312,25 +440,7 @@ def _is_orphaned_manager_filter(manager_id: Optional[str]) -> bool:
 
 
 def _employee_name(employee: Dict[str, Any]) -> Optional[str]:
-    attrs = employee.get("attributes") or {}
-    first = attrs.get("First name") or attrs.get("first_name") or attrs.get("firstName")
-    last = attrs.get("Last name") or attrs.get("last_name") or attrs.get("lastName")
-    if first or last:
-        return f"{first or ''} {last or ''}".strip()
-    for key in (
-        "Full name",
-        "full_name",
-        "fullName",
-        "Name",
-        "name",
-        "Display name",
-        "display_name",
-        "displayName",
-    ):
-        value = attrs.get(key)
-        if value is not None and str(value).strip() != "":
-            return str(value).strip()
-    return None
+    return _norm(employee, employee_norm).get("name")
 
 
 def _employee_identifier(employee: Optional[Dict[str, Any]]) -> Optional[str]:
@@ -345,12 +455,7 @@ def _employee_identifier(employee: Optional[Dict[str, Any]]) -> Optional[str]:
 
 
 def _employee_department(employee: Dict[str, Any]) -> Optional[str]:
-    attrs = employee.get("attributes") or {}
-    for key in ("Department", "department"):
-        value = attrs.get(key)
-        if value is not None and str(value).strip() != "":
-            return str(value).strip()
-    return None
+    return _norm(employee, employee_norm).get("department")
 
 
 def _employee_manager_groups(employees: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
@@ -368,7 +473,7 @@ def _orphaned_employee_ids(employees: List[Dict[str, Any]]) -> List[Any]:
     for employee_ids in _employee_manager_groups(employees).values():
         if 0 < len(employee_ids) < MANAGER_VISIBILITY_THRESHOLD:
             raw_ids.extend(employee_ids)
-    return _id_lookup_values(raw_ids)
+    return _canonical_ids(raw_ids)
 
 
 def _parse_month_name(month_raw: str) -> Optional[int]:
@@ -595,71 +700,17 @@ def _employee_start_value(employee: Dict[str, Any]) -> Optional[tuple[float, str
     )
 
 
-def _csv_values(raw: Optional[str]) -> List[str]:
-    if not raw:
-        return []
-    return [part.strip() for part in str(raw).split(",") if part.strip()]
-
-
-def _employee_filter_query(
-    department: Optional[str],
-    sub_department: Optional[str],
-    manager_id: Optional[str],
-) -> Optional[Dict[str, Any]]:
-    conditions = []
-
-    department_values = _csv_values(department)
-    if department_values:
-        department_or = []
-        for dep in department_values:
-            pattern = {"$regex": re.escape(dep), "$options": "i"}
-            department_or.append({"attributes.Department": pattern})
-            department_or.append({"attributes.department": pattern})
-        conditions.append({"$or": department_or})
-
-    sub_department_values = _csv_values(sub_department)
-    if sub_department_values:
-        sub_department_or = []
-        for sub_dep in sub_department_values:
-            pattern = {"$regex": re.escape(sub_dep), "$options": "i"}
-            sub_department_or.append({"attributes.Sub-Department": pattern})
-            sub_department_or.append({"attributes.sub_department": pattern})
-            sub_department_or.append({"attributes.sub-department": pattern})
-        conditions.append({"$or": sub_department_or})
-
-    if manager_id:
-        manager_value = str(_parse_int(manager_id) or manager_id)
-        conditions.append(
-            {
-                "$or": [
-                    {"relationships.Manager.data.id": manager_value},
-                    {"relationships.manager.data.id": manager_value},
-                ]
-            }
-        )
-
-    if not conditions:
-        return None
-    if len(conditions) == 1:
-        return conditions[0]
-    return {"$and": conditions}
-
-
-def _employee_ids_matching_filter(
+async def _employee_ids_matching_filter(
+    db: Any,
     department: Optional[str],
     sub_department: Optional[str],
     manager_id: Optional[str],
 ) -> Optional[List[Any]]:
-    emp_filter = _employee_filter_query(department, sub_department, manager_id)
+    emp_filter = employee_filter_query(department, sub_department, manager_id)
     if not emp_filter:
         return None
 
-    db = get_db()
-    raw_ids = [doc.get("_id") for doc in db.employees.find(emp_filter, {"_id": 1})]
-    if not raw_ids:
-        return []
-
-    return _id_lookup_values(raw_ids)
+    return [doc.get("_id") async for doc in db.employees.find(emp_filter, {"_id": 1})]
 
 
 def _apply_employee_scope_filter(
@@ -689,32 +740,15 @@ def _coerce_float(value: Any) -> Optional[float]:
 
 
 def _score_employee_id(score_doc: Dict[str, Any]) -> Any:
-    return _nested_value(
-        score_doc,
-        "attributes.employeeId",
-        "attributes.employee_id",
-        "employeeId",
-        "employee_id",
-        "attributes.respondentEmployeeId",
-        "attributes.respondent_employee_id",
-    )
+    return _norm(score_doc, score_norm).get("employee_id")
 
 
 def _score_mean(score_doc: Dict[str, Any]) -> Optional[float]:
-    return _coerce_float(
-        _nested_value(
-            score_doc,
-            "attributes.scores.mean",
-            "scores.mean",
-            "attributes.mean",
-            "mean",
-        )
-    )
+    return _coerce_float(_norm(score_doc, score_norm).get("mean"))
 
 
 def _score_time(score_doc: Dict[str, Any]) -> str:
-    raw = _nested_value(score_doc, "attributes.scores.time", "scores.time", "time")
-    return str(raw or "")
+    return str(_norm(score_doc, score_norm).get("time") or "")
 
 
 def _score_context_matches_metric(score_doc: Dict[str, Any], metric_key: str) -> bool:
@@ -738,32 +772,17 @@ def _answer_matches_metric(answer: Dict[str, Any], catalog: Dict[str, Dict[str,
     return any(target in str(part or "").strip().lower() for part in parts)
 
 
-def _metric_scores_by_employee(db: Any, employee_ids: List[Any], metric_key: str) -> Dict[str, Dict[str, Any]]:
-    lookup_ids = _id_lookup_values(employee_ids)
+async def _metric_scores_by_employee(db: Any, employee_ids: List[Any], metric_key: str) -> Dict[str, Dict[str, Any]]:
+    lookup_ids = _canonical_ids(employee_ids)
     if not lookup_ids:
         return {}
 
-    id_fields = [
-        "attributes.employeeId",
-        "attributes.employee_id",
-        "employeeId",
-        "employee_id",
-        "attributes.respondentEmployeeId",
-        "attributes.respondent_employee_id",
-    ]
-    query = {"$or": [{field: {"$in": lookup_ids}} for field in id_fields]}
-    projection = {
-        "_id": 1,
-        "attributes": 1,
-        "employeeId": 1,
-        "employee_id": 1,
-        "scores": 1,
-        "driver_id": 1,
-    }
+    query = {"norm.employee_id": {"$in": lookup_ids}}
+    projection = {"_id": 1, "attributes": 1, "driver_id": 1, "norm": 1}
 
     by_employee: Dict[str, Dict[str, Any]] = {}
     try:
-        score_docs = db.scores_contexts.find(query, projection)
+        score_docs = [doc async for doc in db.scores_contexts.find(query, projection)]
     except Exception:
         score_docs = []
 
@@ -787,10 +806,10 @@ def _metric_scores_by_employee(db: Any, employee_ids: List[Any], metric_key: str
     if not missing_ids:
         return by_employee
 
-    answer_query = {"attributes.employeeId": {"$in": missing_ids}}
-    answer_projection = {"_id": 1, "attributes": 1, "relationships": 1}
+    answer_query = {"norm.employee_id": {"$in": missing_ids}}
+    answer_projection = {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1}
     try:
-        answers = list(db.answers_export.find(answer_query, answer_projection))
+        answers = [doc async for doc in db.answers_export.find(answer_query, answer_projection)]
     except Exception:
         answers = []
     if not answers:
@@ -802,12 +821,12 @@ def _metric_scores_by_employee(db: Any, employee_ids: List[Any], metric_key: str
         for answer in answers
         if answer.get("attributes", {}).get("questionId") not in (None, "")
     }
-    catalog = _driver_lookup(db, driver_ids, question_ids)
+    catalog = await _driver_lookup(db, driver_ids, question_ids)
 
     grouped: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"scores": [], "latest": ""})
     for answer in answers:
         attrs = answer.get("attributes") or {}
-        employee_id = attrs.get("employeeId")
+        employee_id = _answer_employee_id(answer)
         if employee_id in (None, "") or str(employee_id) in by_employee:
             continue
         if not _answer_matches_metric(answer, catalog, metric_key):
@@ -835,28 +854,27 @@ def _metric_scores_by_employee(db: Any, employee_ids: List[Any], metric_key: str
     return by_employee
 
 
-def _engagement_scores_by_employee(db: Any, employee_ids: List[Any]) -> Dict[str, Dict[str, Any]]:
-    return _metric_scores_by_employee(db, employee_ids, "engagement")
+async def _engagement_scores_by_employee(db: Any, employee_ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    return await _metric_scores_by_employee(db, employee_ids, "engagement")
 
 
-def _autonomy_scores_by_employee(db: Any, employee_ids: List[Any]) -> Dict[str, Dict[str, Any]]:
-    return _metric_scores_by_employee(db, employee_ids, "autonomy")
+async def _autonomy_scores_by_employee(db: Any, employee_ids: List[Any]) -> Dict[str, Dict[str, Any]]:
+    return await _metric_scores_by_employee(db, employee_ids, "autonomy")
 
 
-def _answer_employees_for_query(query: Dict[str, Any]) -> List[Dict[str, Any]]:
-    db = get_db()
-    answer_employee_ids = db.answers_export.distinct("attributes.employeeId", query)
+async def _answer_employees_for_query(db: Any, query: Dict[str, Any]) -> List[Dict[str, Any]]:
+    answer_employee_ids = await db.answers_export.distinct("norm.employee_id", query)
     if not answer_employee_ids:
         return []
-    return list(
-        db.employees.find(
-            {"_id": {"$in": _id_lookup_values(answer_employee_ids)}},
-            {"_id": 1, "attributes": 1, "relationships": 1},
-        )
+    cursor = db.employees.find(
+        {"_id": {"$in": _canonical_ids(answer_employee_ids)}},
+        {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1},
     )
+    return [doc async for doc in cursor]
 
 
-def _apply_answers_employee_filters(
+async def _apply_answers_employee_filters(
+    db: Any,
     query: Dict[str, Any],
     *,
     department: Optional[str],
@@ -864,30 +882,31 @@ def _apply_answers_employee_filters(
     manager_id: Optional[str],
 ) -> Optional[Dict[str, Any]]:
     manager_scope = None if _is_orphaned_manager_filter(manager_id) else manager_id
-    employee_scope_ids = _employee_ids_matching_filter(department, sub_department, manager_scope)
+    employee_scope_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_scope)
     if employee_scope_ids is not None:
         if not employee_scope_ids:
             return None
-        query = _apply_employee_scope_filter(query, employee_scope_ids, id_fields=["attributes.employeeId"])
+        query = _apply_employee_scope_filter(query, employee_scope_ids, id_fields=["norm.employee_id"])
 
     if not _is_orphaned_manager_filter(manager_id):
         return query
 
-    orphaned_ids = _orphaned_employee_ids(_answer_employees_for_query(query))
+    orphaned_ids = _orphaned_employee_ids(await _answer_employees_for_query(db, query))
     if not orphaned_ids:
         return None
-    return _apply_employee_scope_filter(query, orphaned_ids, id_fields=["attributes.employeeId"])
+    return _apply_employee_scope_filter(query, orphaned_ids, id_fields=["norm.employee_id"])
 
 
 @app.get("/health")
-def health() -> Dict[str, str]:
+async def health() -> Dict[str, str]:
     return {"status": "ok"}
 
 
 @app.get("/answers_export")
-def list_answers_export(
+async def list_answers_export(
     limit: int = Query(50, ge=1, le=500),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     employee_id: Optional[str] = None,
     question_id: Optional[str] = None,
     min_score: Optional[int] = Query(None, ge=0, le=10),
@@ -910,32 +929,31 @@ def list_answers_export(
         search=search,
         has_comment=has_comment,
     )
+    db = await get_db()
     emp_id = _parse_int(employee_id)
     if emp_id is not None and not _is_orphaned_manager_filter(manager_id):
-        employee_scope_ids = _employee_ids_matching_filter(department, sub_department, manager_id)
+        employee_scope_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_id)
         if employee_scope_ids is not None:
-            emp_match = [v for v in employee_scope_ids if _parse_int(str(v)) == emp_id or str(v) == str(emp_id)]
+            emp_match = [v for v in employee_scope_ids if canonical_id(v) == emp_id]
             if not emp_match:
-                return {"items": [], "total": 0, "skip": skip, "limit": limit, "unique_employees": 0}
-            query = _apply_employee_scope_filter(query, emp_match, id_fields=["attributes.employeeId"])
+                return {"items": [], "total": 0, "skip": skip, "limit": limit, "next_cursor": None, "unique_employees": 0}
+            query = _apply_employee_scope_filter(query, emp_match, id_fields=["norm.employee_id"])
     else:
-        scoped_query = _apply_answers_employee_filters(
+        scoped_query = await _apply_answers_employee_filters(
+            db,
             query,
             department=department,
             sub_department=sub_department,
             manager_id=manager_id,
         )
         if scoped_query is None:
-            return {"items": [], "total": 0, "skip": skip, "limit": limit, "unique_employees": 0}
+            return {"items": [], "total": 0, "skip": skip, "limit": limit, "next_cursor": None, "unique_employees": 0}
         query = scoped_query
-    result = _list_collection("answers_export", limit=limit, skip=skip, filter_query=query)
-    db = get_db()
-    result["unique_employees"] = len(db.answers_export.distinct("attributes.employeeId", query))
-    return result
+    return await _list_answers_export(db, query, limit=limit, skip=skip, cursor=cursor)
 
 
 @app.get("/answers_export/managers")
-def list_answers_export_managers(
+async def list_answers_export_managers(
     employee_id: Optional[str] = None,
     question_id: Optional[str] = None,
     min_score: Optional[int] = Query(None, ge=0, le=10),
@@ -959,16 +977,17 @@ def list_answers_export_managers(
         has_comment=has_comment,
     )
     emp_id = _parse_int(employee_id)
-    db = get_db()
+    db = await get_db()
     if emp_id is not None and not _is_orphaned_manager_filter(manager_id):
-        employee_scope_ids = _employee_ids_matching_filter(department, sub_department, manager_id)
+        employee_scope_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_id)
         if employee_scope_ids is not None:
-            emp_match = [v for v in employee_scope_ids if _parse_int(str(v)) == emp_id or str(v) == str(emp_id)]
+            emp_match = [v for v in employee_scope_ids if canonical_id(v) == emp_id]
             if not emp_match:
                 return {"items": [], "total": 0}
-            query = _apply_employee_scope_filter(query, emp_match, id_fields=["attributes.employeeId"])
+            query = _apply_employee_scope_filter(query, emp_match, id_fields=["norm.employee_id"])
     else:
-        scoped_query = _apply_answers_employee_filters(
+        scoped_query = await _apply_answers_employee_filters(
+            db,
             query,
             department=department,
             sub_department=sub_department,
@@ -978,33 +997,28 @@ def list_answers_export_managers(
             return {"items": [], "total": 0}
         query = scoped_query
 
-    answer_employee_ids = db.answers_export.distinct("attributes.employeeId", query)
+    answer_employee_ids = await db.answers_export.distinct("norm.employee_id", query)
     if not answer_employee_ids:
         return {"items": [], "total": 0}
 
-    employees = list(
-        db.employees.find(
-            {"_id": {"$in": _id_lookup_values(answer_employee_ids)}},
-            {"_id": 1, "attributes": 1, "relationships": 1},
+    employees = [
+        doc
+        async for doc in db.employees.find(
+            {"_id": {"$in": _canonical_ids(answer_employee_ids)}},
+            {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1},
         )
-    )
+    ]
     manager_groups = _employee_manager_groups(employees)
     manager_ids = set(manager_groups.keys())
     manager_counts = {manager_id_value: len(employee_ids) for manager_id_value, employee_ids in manager_groups.items()}
 
-    manager_lookup_ids: set[Any] = set()
-    for manager_id_value in manager_ids:
-        manager_lookup_ids.add(manager_id_value)
-        parsed_id = _parse_int(manager_id_value)
-        if parsed_id is not None:
-            manager_lookup_ids.add(parsed_id)
-
-    managers = list(
-        db.employees.find(
-            {"_id": {"$in": list(manager_lookup_ids)}},
-            {"_id": 1, "attributes": 1},
+    managers = [
+        doc
+        async for doc in db.employees.find(
+            {"_id": {"$in": _canonical_ids(list(manager_ids))}},
+            {"_id": 1, "attributes": 1, "norm": 1},
         )
-    )
+    ]
     manager_docs_by_id = {str(manager.get("_id")): manager for manager in managers}
     manager_items: list[Dict[str, Any]] = []
     for manager_id_value in sorted(manager_ids):
@@ -1042,73 +1056,102 @@ def list_answers_export_managers(
     return {"items": manager_items, "total": len(manager_items)}
 
 
-@app.get("/answers_export/manager_question_csv")
-def export_manager_question_csv(
-    start_date: str = Query(..., description="Inclusive responseAnsweredAt/report start date"),
-    end_date: str = Query(..., description="Inclusive responseAnsweredAt/report end date"),
-    department: Optional[str] = None,
-    sub_department: Optional[str] = None,
-    manager_id: Optional[str] = None,
-    min_respondents: int = Query(5, ge=1),
-) -> Response:
-    start = _validate_iso(start_date)
-    end = _validate_iso(end_date)
-    if not start or not end:
-        return _csv_response(
-            "manager-question-export-error.csv",
-            [["error"], ["start_date and end_date must be ISO-like dates, for example 2026-01-01"]],
-        )
+ManagerQuestionKey = tuple[str, Any, str, str, str, str]
+
+
+def _new_manager_question_group() -> Dict[str, Any]:
+    return {"score_sum": 0.0, "score_count": 0, "respondents": set()}
+
+
+async def _manager_question_agg_ready(db: Any) -> bool:
+    """Whether the daily manager x question buckets cover every stored answer."""
+    try:
+        state = await db.sync_state.find_one({"_id": AGG_STATE}) or {}
+        if not state.get("built_at"):
+            return False
+        return await db.answers_export.find_one({"agg_pending": True}, {"_id": 1}) is None
+    except Exception:
+        return False
+
 
-    db = get_db()
+async def _manager_question_groups_from_agg(
+    db: Any,
+    start: str,
+    end: str,
+    manager_id: Optional[str],
+) -> Dict[ManagerQuestionKey, Dict[str, Any]]:
+    query: Dict[str, Any] = {"day": {"$gte": start, "$lte": end}}
+    if manager_id:
+        query["manager_id"] = str(canonical_id(manager_id))
+    merged = merge_buckets([bucket async for bucket in db[AGG_COLLECTION].find(query)])
+
+    samples = [entry["sample"] or {} for entry in merged.values()]
+    driver_ids = {_answer_driver_id(sample) for sample in samples if _answer_driver_id(sample) not in (None, "")}
+    question_ids = {(sample.get("attributes") or {}).get("questionId") for sample in samples}
+    question_ids.discard(None)
+    question_ids.discard("")
+    catalog = await _driver_lookup(db, driver_ids, question_ids)
+
+    grouped: Dict[ManagerQuestionKey, Dict[str, Any]] = defaultdict(_new_manager_question_group)
+    for (mgr_id, question_id_value, _driver_id), entry in merged.items():
+        sample = entry["sample"] or {}
+        attrs = sample.get("attributes") or {}
+        question_text = _english_text(attrs.get("questionText") or attrs.get("question") or "")
+        category, driver, subdriver = _answer_hierarchy(sample, catalog)
+        group = grouped[(str(mgr_id), question_id_value, category, driver, subdriver, question_text)]
+        group["score_sum"] += entry["score_sum"]
+        group["score_count"] += entry["score_count"]
+        group["respondents"].update(entry["respondents"])
+    return grouped
+
+
+async def _manager_question_groups_from_answers(
+    db: Any,
+    start: str,
+    end_bound: str,
+    department: Optional[str],
+    sub_department: Optional[str],
+    manager_id: Optional[str],
+) -> Dict[ManagerQuestionKey, Dict[str, Any]]:
     query: Dict[str, Any] = {}
-    # Date-only end dates should include the whole selected day for ISO timestamp strings.
-    end_bound = f"{end}T23:59:59.999999Z" if re.fullmatch(r"\d{4}-\d{2}-\d{2}", end) else end
-    query.update(_iso_range("attributes.responseAnsweredAt", start, end_bound))
+    query.update(_iso_range("norm.answered_at", start, end_bound))
 
-    employee_scope_ids = _employee_ids_matching_filter(department, sub_department, manager_id)
+    employee_scope_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_id)
     if employee_scope_ids is not None:
         if not employee_scope_ids:
             employee_scope_ids = []
-        query = _apply_employee_scope_filter(query, employee_scope_ids, id_fields=["attributes.employeeId"])
-
-    answers = list(db.answers_export.find(query, {"attributes": 1, "relationships": 1}))
-    employee_ids = {answer.get("attributes", {}).get("employeeId") for answer in answers}
-    employee_lookup_ids: set[Any] = set()
-    for employee_id_value in employee_ids:
-        employee_lookup_ids.update(_as_lookup_ids(employee_id_value))
-
-    employees = list(
-        db.employees.find(
-            {"_id": {"$in": list(employee_lookup_ids)}},
-            {"_id": 1, "attributes": 1, "relationships": 1},
-        )
-    )
-    employees_by_id = {str(employee.get("_id")): employee for employee in employees}
+        query = _apply_employee_scope_filter(query, employee_scope_ids, id_fields=["norm.employee_id"])
 
-    manager_lookup_ids: set[Any] = set()
-    for employee in employees:
-        mgr_id = _employee_manager_id(employee)
-        for lookup_id in _as_lookup_ids(mgr_id):
-            manager_lookup_ids.add(lookup_id)
-    manager_docs = list(
-        db.employees.find(
-            {"_id": {"$in": list(manager_lookup_ids)}},
-            {"_id": 1, "attributes": 1},
+    answers = [doc async for doc in db.answers_export.find(query, {"attributes": 1, "relationships": 1, "norm": 1})]
+    employee_lookup_ids = _canonical_ids([_answer_employee_id(answer) for answer in answers])
+
+    employees = [
+        doc
+        async for doc in db.employees.find(
+            {"_id": {"$in": employee_lookup_ids}},
+            {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1},
         )
-    ) if manager_lookup_ids else []
-    manager_docs_by_id = {str(manager.get("_id")): manager for manager in manager_docs}
+    ]
+    employees_by_id = {str(employee.get("_id")): employee for employee in employees}
 
     driver_ids = {_answer_driver_id(answer) for answer in answers if _answer_driver_id(answer) not in (None, "")}
     question_ids = {answer.get("attributes", {}).get("questionId") for answer in answers if answer.get("attributes", {}).get("questionId") not in (None, "")}
-    catalog = _driver_lookup(db, driver_ids, question_ids)
+    catalog = await _driver_lookup(db, driver_ids, question_ids)
+    # Grouping a wide date range is CPU-bound; keep it off the event loop.
+    return await asyncio.to_thread(_group_answers_by_manager_question, answers, employees_by_id, catalog, manager_id)
 
-    grouped: Dict[tuple[str, Any, str, str, str, str], Dict[str, Any]] = defaultdict(
-        lambda: {"scores": [], "respondents": set()}
-    )
+
+def _group_answers_by_manager_question(
+    answers: List[Dict[str, Any]],
+    employees_by_id: Dict[str, Dict[str, Any]],
+    catalog: Dict[str, Dict[str, Any]],
+    manager_id: Optional[str],
+) -> Dict[ManagerQuestionKey, Dict[str, Any]]:
+    grouped: Dict[ManagerQuestionKey, Dict[str, Any]] = defaultdict(_new_manager_question_group)
 
     for answer in answers:
         attrs = answer.get("attributes") or {}
-        employee_id_value = attrs.get("employeeId")
+        employee_id_value = _answer_employee_id(answer)
         employee = employees_by_id.get(str(employee_id_value))
         if not employee:
             continue
@@ -1128,8 +1171,51 @@ def export_manager_question_csv(
         question_text = _english_text(attrs.get("questionText") or attrs.get("question") or "")
         category, driver, subdriver = _answer_hierarchy(answer, catalog)
         key = (str(mgr_id), question_id_value, category, driver, subdriver, question_text)
-        grouped[key]["scores"].append(numeric_score)
+        grouped[key]["score_sum"] += numeric_score
+        grouped[key]["score_count"] += 1
         grouped[key]["respondents"].add(str(employee_id_value))
+    return grouped
+
+
+@app.get("/answers_export/manager_question_csv")
+async def export_manager_question_csv(
+    start_date: str = Query(..., description="Inclusive responseAnsweredAt/report start date"),
+    end_date: str = Query(..., description="Inclusive responseAnsweredAt/report end date"),
+    department: Optional[str] = None,
+    sub_department: Optional[str] = None,
+    manager_id: Optional[str] = None,
+    min_respondents: int = Query(5, ge=1),
+) -> Response:
+    start = _validate_iso(start_date)
+    end = _validate_iso(end_date)
+    if not start or not end:
+        return _csv_response(
+            "manager-question-export-error.csv",
+            [["error"], ["start_date and end_date must be ISO-like dates, for example 2026-01-01"]],
+        )
+
+    db = await get_db()
+    date_only = re.compile(r"\d{4}-\d{2}-\d{2}")
+    # Whole-day ranges without respondent department filters can be summed from
+    # the daily buckets; anything else (or buckets still catching up) scans answers.
+    if (
+        date_only.fullmatch(start)
+        and date_only.fullmatch(end)
+        and department is None
+        and sub_department is None
+        and await _manager_question_agg_ready(db)
+    ):
+        grouped = await _manager_question_groups_from_agg(db, start, end, manager_id)
+    else:
+        # Date-only end dates should include the whole selected day for ISO timestamp strings.
+        end_bound = f"{end}T23:59:59.999999Z" if date_only.fullmatch(end) else end
+        grouped = await _manager_question_groups_from_answers(db, start, end_bound, department, sub_department, manager_id)
+
+    manager_lookup_ids = _canonical_ids([key[0] for key in grouped])
+    manager_docs = [
+        doc async for doc in db.employees.find({"_id": {"$in": manager_lookup_ids}}, {"_id": 1, "attributes": 1})
+    ] if manager_lookup_ids else []
+    manager_docs_by_id = {str(manager.get("_id")): manager for manager in manager_docs}
 
     headers = [
         "managerId",
@@ -1148,8 +1234,7 @@ def export_manager_question_csv(
         respondent_count = len(data["respondents"])
         if respondent_count < min_respondents:
             continue
-        scores = data["scores"]
-        avg_score = round(sum(scores) / len(scores), 2) if scores else ""
+        avg_score = round(data["score_sum"] / data["score_count"], 2) if data["score_count"] else ""
         manager_identifier = _employee_identifier(manager_docs_by_id.get(str(mgr_id))) or mgr_id
         rows.append([
             manager_identifier,
@@ -1170,9 +1255,10 @@ def export_manager_question_csv(
 
 
 @app.get("/scores_contexts")
-def list_scores_contexts(
+async def list_scores_contexts(
     limit: int = Query(50, ge=1, le=500),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     grade: Optional[str] = None,
     impact: Optional[str] = None,
     time_from: Optional[str] = None,
@@ -1190,26 +1276,21 @@ def list_scores_contexts(
     end = _validate_iso(time_to)
     query.update(_iso_range("attributes.scores.time", start, end))
 
-    employee_ids = _employee_ids_matching_filter(department, sub_department, manager_id)
+    db = await get_db()
+    employee_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_id)
     query = _apply_employee_scope_filter(
         query,
         employee_ids,
-        id_fields=[
-            "attributes.employeeId",
-            "attributes.employee_id",
-            "employeeId",
-            "employee_id",
-            "attributes.respondentEmployeeId",
-            "attributes.respondent_employee_id",
-        ],
+        id_fields=["norm.employee_id"],
     )
-    return _list_collection("scores_contexts", limit=limit, skip=skip, filter_query=query)
+    return await _list_collection(db, "scores_contexts", limit=limit, skip=skip, filter_query=query, cursor=cursor)
 
 
 @app.get("/scores_by_driver")
-def list_scores_by_driver(
+async def list_scores_by_driver(
     limit: int = Query(50, ge=1, le=500),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     driver_id: Optional[str] = None,
     grade: Optional[str] = None,
     time_from: Optional[str] = None,
@@ -1227,57 +1308,24 @@ def list_scores_by_driver(
     end = _validate_iso(time_to)
     query.update(_iso_range("attributes.scores.time", start, end))
 
-    employee_ids = _employee_ids_matching_filter(department, sub_department, manager_id)
+    db = await get_db()
+    employee_ids = await _employee_ids_matching_filter(db, department, sub_department, manager_id)
     query = _apply_employee_scope_filter(
         query,
         employee_ids,
-        id_fields=[
-            "attributes.employeeId",
-            "attributes.employee_id",
-            "employeeId",
-            "employee_id",
-            "attributes.respondentEmployeeId",
-            "attributes.respondent_employee_id",
-        ],
+        id_fields=["norm.employee_id"],
     )
-    return _list_collection("scores_by_driver", limit=limit, skip=skip, filter_query=query)
+    return await _list_collection(db, "scores_by_driver", limit=limit, skip=skip, filter_query=query, cursor=cursor)
 
 
 @app.get("/employees/facets")
-def employee_facets() -> Dict[str, List[str]]:
-    db = get_db()
-    departments = sorted(
-        [
-            value
-            for value in db.employees.distinct("attributes.Department")
-            if value is not None and str(value).strip() != ""
-        ]
-    )
-    departments_alt = sorted(
-        [
-            value
-            for value in db.employees.distinct("attributes.department")
-            if value is not None and str(value).strip() != ""
-        ]
+async def employee_facets() -> Dict[str, List[str]]:
+    db = await get_db()
+    department_values = sorted(
+        {str(v).strip() for v in await db.employees.distinct("norm.department") if v is not None and str(v).strip()}
     )
-    sub_departments = sorted(
-        [
-            value
-            for value in db.employees.distinct("attributes.Sub-Department")
-            if value is not None and str(value).strip() != ""
-        ]
-    )
-    sub_departments_alt = sorted(
-        [
-            value
-            for value in db.employees.distinct("attributes.sub_department")
-            if value is not None and str(value).strip() != ""
-        ]
-    )
-
-    department_values = sorted({str(v).strip() for v in (departments + departments_alt) if str(v).strip()})
     sub_department_values = sorted(
-        {str(v).strip() for v in (sub_departments + sub_departments_alt) if str(v).strip()}
+        {str(v).strip() for v in await db.employees.distinct("norm.sub_department") if v is not None and str(v).strip()}
     )
     return {
         "departments": department_values,
@@ -1286,22 +1334,18 @@ def employee_facets() -> Dict[str, List[str]]:
 
 
 @app.get("/employees/birthdays")
-def list_employee_birthdays(
+async def list_employee_birthdays(
     department: Optional[str] = None,
     include_unassigned: bool = True,
 ) -> Dict[str, Any]:
-    db = get_db()
+    db = await get_db()
     query: Dict[str, Any] = {}
 
-    department_values = _csv_values(department)
+    department_values = csv_values(department)
     if department_values:
-        query["$or"] = []
-        for dep in department_values:
-            pattern = {"$regex": re.escape(dep), "$options": "i"}
-            query["$or"].append({"attributes.Department": pattern})
-            query["$or"].append({"attributes.department": pattern})
+        query["norm.department"] = contains_any(department_values)
 
-    employees = list(db.employees.find(query, {"_id": 1, "attributes": 1}))
+    employees = [doc async for doc in db.employees.find(query, {"_id": 1, "attributes": 1, "norm": 1})]
     grouped: Dict[str, List[Dict[str, Any]]] = {}
     with_birthdays = 0
     source = "employees"
@@ -1330,7 +1374,7 @@ def list_employee_birthdays(
         emp_lookup = {str(emp.get("_id")): emp for emp in employees}
         seen_emp_ids: set[str] = set()
         cursor = db.answers_export.find({}, {"attributes": 1})
-        for doc in cursor:
+        async for doc in cursor:
             attrs = (doc or {}).get("attributes") or {}
             emp_id_raw = attrs.get("employeeId") or attrs.get("employee_id")
             if emp_id_raw is None:
@@ -1383,18 +1427,20 @@ def list_employee_birthdays(
 
 
 @app.get("/employees/start-dates")
-def list_employee_start_dates(
+async def list_employee_start_dates(
     limit: int = Query(200, ge=1, le=1000),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     department: Optional[str] = None,
     sub_department: Optional[str] = None,
     manager_id: Optional[str] = None,
     search: Optional[str] = None,
 ) -> Dict[str, Any]:
-    db = get_db()
-    emp_filter = _employee_filter_query(department, sub_department, manager_id)
+    db = await get_db()
+    emp_filter = employee_filter_query(department, sub_department, manager_id)
     query = emp_filter or {}
-    employees = list(db.employees.find(query, {"_id": 1, "attributes": 1, "relationships": 1}))
+    projection = {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1}
+    employees = [doc async for doc in db.employees.find(query, projection)]
 
     rows: List[Dict[str, Any]] = []
     search_lower = (search or "").strip().lower()
@@ -1405,15 +1451,11 @@ def list_employee_start_dates(
         if not hire_value and not start_value:
             continue
         sort_ts, sort_iso = hire_value or start_value  # hire date wins when present
-        name = _employee_name(employee) or str(employee.get("_id"))
-        department_name = _employee_department(employee)
-        attrs = employee.get("attributes") or {}
-        sub_department_name = (
-            attrs.get("Sub-Department") or attrs.get("sub_department") or attrs.get("sub-department")
-        )
-        title = (
-            attrs.get("Title") or attrs.get("title") or attrs.get("Job title") or attrs.get("job_title")
-        )
+        norm = _norm(employee, employee_norm)
+        name = norm.get("name") or str(employee.get("_id"))
+        department_name = norm.get("department")
+        sub_department_name = norm.get("sub_department")
+        title = norm.get("title")
         if search_lower:
             haystack = " | ".join(
                 [
@@ -1443,41 +1485,43 @@ def list_employee_start_dates(
             }
         )
 
-    rows.sort(key=lambda row: (-row["sortTimestamp"], str(row.get("name") or "").lower(), row["id"]))
+    def sort_key(row: Dict[str, Any]) -> List[Any]:
+        return [-row["sortTimestamp"], str(row.get("name") or "").lower(), row["id"]]
+
+    rows.sort(key=sort_key)
     total = len(rows)
+    if cursor:
+        after = _decode_cursor(cursor, 3)
+        skip = bisect.bisect_right([sort_key(row) for row in rows], after)
     sliced = rows[skip : skip + limit]
+    next_cursor = _encode_cursor(sort_key(sliced[-1])) if sliced and skip + limit < total else None
     return {
         "items": sliced,
         "total": total,
         "skip": skip,
         "limit": limit,
+        "next_cursor": next_cursor,
         "unique_employees": total,
     }
 
 
 @app.get("/employees/{employee_id}")
-def get_employee(employee_id: str) -> Dict[str, Any]:
-    db = get_db()
-    emp_id = _parse_int(employee_id)
-    query: Dict[str, Any] = {"_id": emp_id} if emp_id is not None else {"_id": employee_id}
-    doc = db.employees.find_one(query)
+async def get_employee(employee_id: str) -> Dict[str, Any]:
+    db = await get_db()
+    doc = await db.employees.find_one({"_id": canonical_id(employee_id)})
     if not doc:
         return {"employee": None}
     return {"employee": _serialize(doc)}
 
 
 @app.get("/org_headcount")
-def org_headcount(
+async def org_headcount(
     department: Optional[str] = None,
     sub_department: Optional[str] = None,
     manager_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    db = get_db()
-    emp_filter = _employee_filter_query(department, sub_department, manager_id)
-    query = emp_filter or {}
-
-    employees = list(db.employees.find(query, {"_id": 1, "attributes": 1, "relationships": 1}))
-    payload = build_org_map_payload(employees)
+    db = await get_db()
+    payload = await org_payload(db, employee_filter_query(department, sub_department, manager_id))
 
     node_by_id = {node["id"]: node for node in payload.get("nodes", [])}
     children: Dict[str, List[str]] = {}
@@ -1540,15 +1584,12 @@ def org_headcount(
 
 
 @app.get("/org_headcount/managers")
-def org_headcount_managers(
+async def org_headcount_managers(
     department: Optional[str] = None,
     sub_department: Optional[str] = None,
 ) -> Dict[str, Any]:
-    db = get_db()
-    emp_filter = _employee_filter_query(department, sub_department, None)
-    query = emp_filter or {}
-    employees = list(db.employees.find(query, {"_id": 1, "attributes": 1, "relationships": 1}))
-    payload = build_org_map_payload(employees)
+    db = await get_db()
+    payload = await org_payload(db, employee_filter_query(department, sub_department, None))
 
     manager_options = sorted(
         [
@@ -1568,17 +1609,13 @@ def org_headcount_managers(
 
 
 @app.get("/org_map")
-def org_map(
+async def org_map(
     department: Optional[str] = None,
     sub_department: Optional[str] = None,
     manager_id: Optional[str] = None,
 ) -> Dict[str, Any]:
-    db = get_db()
-    query = _employee_filter_query(department, sub_department, None) or {}
-
-    employees = list(db.employees.find(query, {"_id": 1, "attributes": 1, "relationships": 1}))
-    payload = build_org_map_payload(employees)
-
+    db = await get_db()
+    payload = await org_payload(db, employee_filter_query(department, sub_department, None))
 
     if manager_id:
         manager_str = str(manager_id)
@@ -1610,10 +1647,11 @@ def org_map(
         payload["stats"]["renderedEdges"] = len(payload["edges"])
 
     org_node_ids = [node.get("id") for node in payload.get("nodes", [])]
-    metric_sources = {
-        "engagement": _engagement_scores_by_employee(db, org_node_ids),
-        "autonomy": _autonomy_scores_by_employee(db, org_node_ids),
-    }
+    engagement, autonomy = await asyncio.gather(
+        _engagement_scores_by_employee(db, org_node_ids),
+        _autonomy_scores_by_employee(db, org_node_ids),
+    )
+    metric_sources = {"engagement": engagement, "autonomy": autonomy}
     for metric_key, metric_scores in metric_sources.items():
         nodes_with_metric = 0
         for node in payload.get("nodes", []):
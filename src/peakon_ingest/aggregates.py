@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import datetime as dt
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from .normalize import NORM_VERSION, answer_driver_id, canonical_id, employee_norm
+
+# Daily (manager, question, driver) buckets of answer scores behind the
+# manager question CSV, kept up to date by the manager_question_agg stage.
+AGG_COLLECTION = "manager_question_daily"
+# sync_state key; `built_at` is set once every stored answer has been aggregated.
+AGG_STATE = "manager_question_agg"
+
+# What the aggregation reads from an answer, and what a bucket keeps of the
+# first answer it saw so the CSV can derive question text and hierarchy.
+ANSWER_PROJECTION = {"attributes": 1, "relationships": 1, "norm": 1, "agg": 1}
+AGG_EMPLOYEE_PROJECTION = {"attributes": 1, "relationships": 1, "norm": 1}
+# Answers waiting to be folded into the buckets, and the update that queues
+# every answer again for a rebuild.
+PENDING_ANSWERS = {"agg_pending": True}
+REQUEUE_ANSWERS = {"$set": {"agg_pending": True}, "$unset": {"agg": ""}}
+# Queues answers again but keeps `agg`, so the refresh moves their old
+# contribution out of the previous manager's buckets.
+REFOLD_ANSWERS = {"$set": {"agg_pending": True}}
+_SAMPLE_ATTRS = (
+    "questionId",
+    "answerId",
+    "questionText",
+    "question",
+    "driverId",
+    "driverID",
+    "engagementDriverId",
+    "engagement_driver_id",
+    "driver",
+    "driverName",
+    "questionDriver",
+    "subDriver",
+    "subdriver",
+    "subDriverName",
+    "questionSubDriver",
+    "category",
+    "questionCategory",
+    "group",
+    "engagementGroup",
+)
+_SAMPLE_RELS = ("driver", "Driver", "engagementDriver", "question")
+_DAY = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def day_bucket(answered_at: Any) -> Optional[str]:
+    """The YYYY-MM-DD prefix of an ISO date/timestamp, as compared by the raw date filter."""
+    if not isinstance(answered_at, str) or not _DAY.match(answered_at):
+        return None
+    return answered_at[:10]
+
+
+def employee_manager(employee: Dict[str, Any]) -> Optional[str]:
+    norm = employee.get("norm")
+    if not (isinstance(norm, dict) and norm.get("v") == NORM_VERSION):
+        norm = employee_norm(employee)
+    manager_id = norm.get("manager_id")
+    return str(manager_id) if manager_id not in (None, "") else None
+
+
+def moved_employee_ids(stored: Iterable[Dict[str, Any]], managers: Dict[Any, Optional[str]]) -> List[Any]:
+    """Ids in `managers` (id -> `employee_manager`) whose answers sit in the wrong buckets.
+
+    That is stored employees whose manager changed, and employees not stored
+    yet who have a manager: answers refreshed before them were left out of
+    every bucket. An employees upsert queues their answers with REFOLD_ANSWERS
+    for the next refresh.
+    """
+    known = {e["_id"]: employee_manager(e) for e in stored}
+    return [
+        emp_id
+        for emp_id, manager_id in managers.items()
+        if (known[emp_id] != manager_id if emp_id in known else manager_id is not None)
+    ]
+
+
+def answer_contribution(answer: Dict[str, Any], manager_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """What one answer adds to its bucket, or None when the CSV would not count it."""
+    attrs = answer.get("attributes") or {}
+    employee_id = attrs.get("employeeId") or attrs.get("employee_id")
+    day = day_bucket(attrs.get("responseAnsweredAt"))
+    if not manager_id or employee_id in (None, "") or day is None:
+        return None
+    try:
+        score = float(attrs.get("answerScore"))
+    except Exception:
+        return None
+    question_id = attrs.get("questionId") or attrs.get("answerId") or answer.get("_id")
+    driver_id = answer_driver_id(answer)
+    return {
+        "bucket": f"{manager_id}::{question_id}::{driver_id if driver_id is not None else ''}::{day}",
+        "manager_id": manager_id,
+        "question_id": question_id,
+        "driver_id": driver_id,
+        "day": day,
+        "employee_id": str(employee_id),
+        "score": score,
+    }
+
+
+def pending_employee_ids(answers: Iterable[Dict[str, Any]]) -> List[Any]:
+    ids = set()
+    for answer in answers:
+        attrs = answer.get("attributes") or {}
+        ids.add(canonical_id(attrs.get("employeeId") or attrs.get("employee_id")))
+    ids.discard(None)
+    return list(ids)
+
+
+def _sample(answer: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = answer.get("attributes") or {}
+    rels = answer.get("relationships") or {}
+    return {
+        "_id": answer.get("_id"),
+        "attributes": {k: attrs[k] for k in _SAMPLE_ATTRS if k in attrs},
+        "relationships": {k: rels[k] for k in _SAMPLE_RELS if k in rels},
+    }
+
+
+def plan_agg_batch(
+    answers: Iterable[Dict[str, Any]],
+    employees_by_id: Dict[str, Dict[str, Any]],
+) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[Any, Optional[Dict[str, Any]]]]]:
+    """Bucket deltas and per-answer contributions for a batch of pending answers.
+
+    An answer that was aggregated before (a changed answer) carries its old
+    contribution under `agg`, which is subtracted before the new one is added.
+    Returns `{bucket_id: delta}` and `[(answer_id, contribution)]`.
+    """
+    deltas: Dict[str, Dict[str, Any]] = {}
+    contributions: List[Tuple[Any, Optional[Dict[str, Any]]]] = []
+
+    def apply(contribution: Dict[str, Any], sign: int, sample: Optional[Dict[str, Any]] = None) -> None:
+        delta = deltas.setdefault(
+            contribution["bucket"],
+            {
+                "fields": {k: contribution[k] for k in ("manager_id", "question_id", "driver_id", "day")},
+                "score_sum": 0.0,
+                "score_count": 0,
+                "respondents": {},
+                "sample": None,
+            },
+        )
+        delta["score_sum"] += sign * contribution["score"]
+        delta["score_count"] += sign
+        respondents = delta["respondents"]
+        respondents[contribution["employee_id"]] = respondents.get(contribution["employee_id"], 0) + sign
+        if sample is not None and delta["sample"] is None:
+            delta["sample"] = sample
+
+    for answer in answers:
+        old = answer.get("agg")
+        if isinstance(old, dict):
+            apply(old, -1)
+        attrs = answer.get("attributes") or {}
+        employee = employees_by_id.get(str(attrs.get("employeeId") or attrs.get("employee_id")))
+        new = answer_contribution(answer, employee_manager(employee) if employee else None)
+        if new is not None:
+            apply(new, 1, _sample(answer))
+        contributions.append((answer.get("_id"), new))
+    return deltas, contributions
+
+
+def bucket_update(bucket_id: str, delta: Dict[str, Any]) -> UpdateOne:
+    inc: Dict[str, Any] = {"score_sum": delta["score_sum"], "score_count": delta["score_count"]}
+    for employee_id, count in delta["respondents"].items():
+        if count:
+            inc[f"respondents.{employee_id}"] = count
+    on_insert = dict(delta["fields"])
+    if delta["sample"] is not None:
+        on_insert["sample"] = delta["sample"]
+    return UpdateOne({"_id": bucket_id}, {"$inc": inc, "$setOnInsert": on_insert}, upsert=True)
+
+
+def answer_update(answer_id: Any, contribution: Optional[Dict[str, Any]]) -> UpdateOne:
+    return UpdateOne({"_id": answer_id}, {"$set": {"agg": contribution}, "$unset": {"agg_pending": ""}})
+
+
+def apply_bucket_delta(buckets: Dict[str, Dict[str, Any]], bucket_id: str, delta: Dict[str, Any]) -> None:
+    """`bucket_update` applied to an in-memory `{bucket_id: bucket}` dict."""
+    bucket = buckets.setdefault(
+        bucket_id,
+        {"_id": bucket_id, **delta["fields"], "sample": delta["sample"], "score_sum": 0.0, "score_count": 0, "respondents": {}},
+    )
+    bucket["score_sum"] += delta["score_sum"]
+    bucket["score_count"] += delta["score_count"]
+    for employee_id, count in delta["respondents"].items():
+        bucket["respondents"][employee_id] = bucket["respondents"].get(employee_id, 0) + count
+
+
+class AggRefresh:
+    """One run of the manager_question_agg refresh, minus the reads and writes.
+
+    A storage backend requeues every answer when `rebuild` is set, then loops:
+    read up to a batch of `PENDING_ANSWERS`, read their `employee_filter`
+    employees, and write the deltas/contributions `plan` returns (`writes`
+    gives them as bulk ops) until no answer is pending; it finally stores
+    `finished_state` under AGG_STATE.
+    """
+
+    def __init__(self, state: Dict[str, Any], *, rebuild: bool = False):
+        # Before the first build there are no buckets to update incrementally.
+        self.rebuild = rebuild or not state.get("built_at")
+        self.built_at = None if self.rebuild else state.get("built_at")
+        self.stats = {"rebuilt": int(self.rebuild), "answers": 0, "buckets": 0}
+
+    @staticmethod
+    def employee_filter(answers: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"_id": {"$in": pending_employee_ids(answers)}}
+
+    def plan(
+        self, answers: List[Dict[str, Any]], employees: Iterable[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Dict[str, Any]], List[Tuple[Any, Optional[Dict[str, Any]]]]]:
+        deltas, contributions = plan_agg_batch(answers, {str(e["_id"]): e for e in employees})
+        self.stats["answers"] += len(answers)
+        self.stats["buckets"] += len(deltas)
+        return deltas, contributions
+
+    def writes(
+        self, answers: List[Dict[str, Any]], employees: Iterable[Dict[str, Any]]
+    ) -> Tuple[List[UpdateOne], List[UpdateOne]]:
+        """`plan` as bulk ops for the bucket collection and for answers_export."""
+        deltas, contributions = self.plan(answers, employees)
+        return (
+            [bucket_update(bucket_id, delta) for bucket_id, delta in deltas.items()],
+            [answer_update(answer_id, contribution) for answer_id, contribution in contributions],
+        )
+
+    def finished_state(self, now: dt.datetime) -> Dict[str, Any]:
+        return {"built_at": self.built_at or now, "refreshed_at": now}
+
+
+def merge_buckets(buckets: Iterable[Dict[str, Any]]) -> Dict[Tuple[str, Any, Any], Dict[str, Any]]:
+    """Sum the buckets of a date range per (manager, question, driver).
+
+    Respondents are unioned across days, so someone answering on two days
+    counts once, as in the raw export.
+    """
+    merged: Dict[Tuple[str, Any, Any], Dict[str, Any]] = {}
+    for bucket in buckets:
+        key = (bucket.get("manager_id"), bucket.get("question_id"), bucket.get("driver_id"))
+        entry = merged.setdefault(key, {"score_sum": 0.0, "score_count": 0, "respondents": set(), "sample": None})
+        entry["score_sum"] += bucket.get("score_sum") or 0.0
+        entry["score_count"] += bucket.get("score_count") or 0
+        entry["respondents"].update(k for k, v in (bucket.get("respondents") or {}).items() if v > 0)
+        if entry["sample"] is None:
+            entry["sample"] = bucket.get("sample")
+    return merged
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from pymongo import ASCENDING, DESCENDING, AsyncMongoClient, ReturnDocument
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .aggregates import (
+    AGG_COLLECTION,
+    AGG_EMPLOYEE_PROJECTION,
+    AGG_STATE,
+    ANSWER_PROJECTION,
+    PENDING_ANSWERS,
+    REFOLD_ANSWERS,
+    REQUEUE_ANSWERS,
+    AggRefresh,
+    moved_employee_ids,
+)
+from .config import Settings
+from .generations import GenerationDb, base_generation
+from .indexes import INDEXES
+from .org_tree import (
+    EMPLOYEE_PROJECTION,
+    ORG_SNAPSHOT_NODES,
+    ORG_SNAPSHOT_STATE,
+    ORG_SNAPSHOTS,
+    ORG_SNAPSHOTS_KEPT,
+    org_snapshot_docs,
+    stale_snapshot_ids,
+)
+from .storage import (
+    DEFAULT_BULK_BATCH_SIZE,
+    DEFAULT_BULK_MAX_BYTES,
+    BulkUpserter,
+    MongoStorage,
+    _BulkBuffer,
+    _empty_write_stats,
+    _hashed_ids,
+    _lock_filter,
+    _lock_update,
+    _record_bulk_result,
+)
+from .telemetry import record_write
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBulkUpserter(_BulkBuffer):
+    """Async counterpart of `BulkUpserter` for `AsyncMongoStorage`.
+
+    Flushes are awaited on the event loop, so HTTP requests keep progressing
+    while a batch is in flight. Concurrent writers each write their own batch;
+    `flush` returns only once every batch started before it is written.
+    """
+
+    def __init__(self, collection: Any, **kwargs: Any):
+        super().__init__(collection, **kwargs)
+        self._in_flight: Set["asyncio.Task[None]"] = set()
+
+    async def add(self, _id: Any, doc: Dict[str, Any]) -> None:
+        if self._buffer(_id, doc):
+            await self._write_pending()
+
+    async def add_many(self, docs: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        for _id, doc in docs:
+            await self.add(_id, doc)
+
+    async def flush(self) -> None:
+        await self._write_pending()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight)
+
+    async def _write_pending(self) -> None:
+        if not self._pending:
+            return
+        # Swap the buffer out before awaiting so concurrent writers start a new batch.
+        task = asyncio.ensure_future(self._write(self._take()))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+        await task
+
+    async def _write(self, pending: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        started = time.monotonic()
+        existing: Dict[Any, Any] = {}
+        hashed_ids = _hashed_ids(pending)
+        if hashed_ids:
+            cursor = self.collection.find({"_id": {"$in": hashed_ids}}, {"content_hash": 1})
+            existing = {doc["_id"]: doc.get("content_hash") async for doc in cursor}
+        ops, batch_num = self._plan(pending, existing)
+        if not ops:
+            record_write(0, time.monotonic() - started)
+            return
+        try:
+            result = await self.collection.bulk_write(ops, ordered=False)
+            _record_bulk_result(self.stats, result)
+        except BulkWriteError as e:
+            self._record_error(batch_num, len(ops), e)
+        finally:
+            record_write(len(ops), time.monotonic() - started)
+
+    async def close(self) -> Dict[str, Any]:
+        await self.flush()
+        return self.stats
+
+
+class AsyncMongoStorage:
+    """`MongoStorage` with the same operations as coroutines, on pymongo's async client."""
+
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        *,
+        bulk_batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+        bulk_max_bytes: int = DEFAULT_BULK_MAX_BYTES,
+        touch_unchanged: bool = True,
+    ):
+        self.client: AsyncMongoClient = AsyncMongoClient(mongo_uri)
+        self.base_db: AsyncDatabase = self.client[db_name]
+        self.db = GenerationDb(self.base_db, base_generation()["collections"])
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_max_bytes = bulk_max_bytes
+        self.touch_unchanged = touch_unchanged
+        self.write_stats: Dict[str, Dict[str, Any]] = {}
+
+    async def aclose(self) -> None:
+        await self.client.close()
+
+    # --- generations ---
+    def use_generation(self, generation: Dict[str, Any]) -> None:
+        self.db = GenerationDb(self.base_db, generation["collections"])
+
+    async def drop_collections(self, names: List[str]) -> None:
+        for name in names:
+            await self.base_db.drop_collection(name)
+
+    async def ensure_indexes(self) -> None:
+        for name in (
+            "auth_tokens",
+            "sync_state",
+            "answers_export",
+            "employees",
+            "drivers",
+            "drivers_catalog",
+            "scores_contexts",
+            "scores_by_driver",
+            "ingestion_runs",
+            "http_cache",
+            "locks",
+        ):
+            await self.db[name].create_index([("_id", ASCENDING)])
+        for name, keys in INDEXES:
+            await self.db[name].create_index(list(keys))
+
+    # --- auth token cache ---
+    async def get_cached_bearer(self, cache_id: str) -> Optional[str]:
+        doc = await self.db.auth_tokens.find_one({"_id": cache_id})
+        if doc and isinstance(doc.get("bearer_token"), str):
+            return doc["bearer_token"]
+        return None
+
+    async def set_cached_bearer(self, cache_id: str, bearer_token: str) -> None:
+        await self.db.auth_tokens.update_one(
+            {"_id": cache_id},
+            {"$set": {"bearer_token": bearer_token, "obtained_at": dt.datetime.utcnow()}},
+            upsert=True,
+        )
+
+    # --- sync state ---
+    async def get_state(self, key: str) -> Dict[str, Any]:
+        return await self.db.sync_state.find_one({"_id": key}) or {"_id": key}
+
+    async def set_state(self, key: str, state: Dict[str, Any]) -> None:
+        state = dict(state)
+        state["_id"] = key
+        state["updated_at"] = dt.datetime.utcnow()
+        await self.db.sync_state.update_one({"_id": key}, {"$set": state}, upsert=True)
+
+    # --- http response cache ---
+    async def get_http_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self.db.http_cache.find_one({"_id": key})
+
+    async def set_http_cache(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = dict(entry)
+        entry["_id"] = key
+        entry["updated_at"] = dt.datetime.utcnow()
+        await self.db.http_cache.update_one({"_id": key}, {"$set": entry}, upsert=True)
+
+    # --- lease locks ---
+    async def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = dt.datetime.utcnow()
+        try:
+            doc = await self.db.locks.find_one_and_update(
+                _lock_filter(name, owner, now),
+                _lock_update(owner, now, ttl_seconds),
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return False
+        return bool(doc) and doc.get("owner") == owner
+
+    async def renew_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = dt.datetime.utcnow()
+        result = await self.db.locks.update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"renewed_at": now, "expires_at": now + dt.timedelta(seconds=ttl_seconds)}},
+        )
+        return result.matched_count == 1
+
+    async def release_lock(self, name: str, owner: str) -> None:
+        await self.db.locks.delete_one({"_id": name, "owner": owner})
+
+    # --- manager x question aggregates ---
+    async def refresh_manager_question_agg(self, *, rebuild: bool = False) -> Dict[str, int]:
+        refresh = AggRefresh(await self.get_state(AGG_STATE), rebuild=rebuild)
+        if refresh.rebuild:
+            await self.db[AGG_COLLECTION].delete_many({})
+            await self.db.answers_export.update_many({}, REQUEUE_ANSWERS)
+        while True:
+            cursor = self.db.answers_export.find(PENDING_ANSWERS, ANSWER_PROJECTION).limit(self.bulk_batch_size)
+            answers = [doc async for doc in cursor]
+            if not answers:
+                break
+            cursor = self.db.employees.find(refresh.employee_filter(answers), AGG_EMPLOYEE_PROJECTION)
+            bucket_ops, answer_ops = refresh.writes(answers, [doc async for doc in cursor])
+            if bucket_ops:
+                await self.db[AGG_COLLECTION].bulk_write(bucket_ops, ordered=False)
+            await self.db.answers_export.bulk_write(answer_ops, ordered=False)
+        await self.set_state(AGG_STATE, refresh.finished_state(dt.datetime.utcnow()))
+        return refresh.stats
+
+    async def refold_moved_employees(self, managers: Dict[Any, Optional[str]]) -> int:
+        if not managers:
+            return 0
+        cursor = self.db.employees.find({"_id": {"$in": list(managers)}}, AGG_EMPLOYEE_PROJECTION)
+        moved = moved_employee_ids([doc async for doc in cursor], managers)
+        if not moved:
+            return 0
+        result = await self.db.answers_export.update_many({"norm.employee_id": {"$in": moved}}, REFOLD_ANSWERS)
+        return result.modified_count
+
+    # --- org snapshots ---
+    async def write_org_snapshot(
+        self, run_id: str, *, keep: int = ORG_SNAPSHOTS_KEPT, publish: bool = True
+    ) -> Dict[str, int]:
+        employees = [doc async for doc in self.db.employees.find({}, EMPLOYEE_PROJECTION)]
+        # The layout is CPU-bound; keep it off the event loop.
+        header, nodes = await asyncio.to_thread(org_snapshot_docs, run_id, employees)
+        await self.db[ORG_SNAPSHOT_NODES].delete_many({"run_id": run_id})
+        for start in range(0, len(nodes), self.bulk_batch_size):
+            await self.db[ORG_SNAPSHOT_NODES].insert_many(nodes[start : start + self.bulk_batch_size], ordered=False)
+        await self.db[ORG_SNAPSHOTS].replace_one({"_id": run_id}, header, upsert=True)
+        if publish:
+            await self.set_state(ORG_SNAPSHOT_STATE, {"run_id": run_id})
+
+        headers = [doc async for doc in self.db[ORG_SNAPSHOTS].find({}, {"_id": 1, "created_at": 1})]
+        served = (await self.get_state(ORG_SNAPSHOT_STATE)).get("run_id")
+        stale = stale_snapshot_ids(headers, keep=keep, served=served)
+        if stale:
+            await self.db[ORG_SNAPSHOT_NODES].delete_many({"run_id": {"$in": stale}})
+            await self.db[ORG_SNAPSHOTS].delete_many({"_id": {"$in": stale}})
+        return {"nodes": len(nodes), "pruned": len(stale)}
+
+    # --- upserts ---
+    async def has_documents(self, collection: str) -> bool:
+        return await self.db[collection].find_one({}, {"_id": 1}) is not None
+
+    async def upsert_doc(self, collection: str, _id: Any, doc: Dict[str, Any]) -> None:
+        await self.db[collection].update_one({"_id": _id}, {"$set": doc}, upsert=True)
+
+    def bulk_upserter(self, collection: str) -> AsyncBulkUpserter:
+        """Return a buffered upserter; counts accumulate in `write_stats[collection]`."""
+        stats = self.write_stats.setdefault(collection, _empty_write_stats())
+        return AsyncBulkUpserter(
+            self.db[collection],
+            batch_size=self.bulk_batch_size,
+            max_bytes=self.bulk_max_bytes,
+            stats=stats,
+            touch_unchanged=self.touch_unchanged,
+        )
+
+    async def record_run_start(self, run_id: str) -> None:
+        await self.db.ingestion_runs.update_one(
+            {"_id": run_id},
+            {"$set": {"started_at": dt.datetime.utcnow(), "status": "running"}},
+            upsert=True,
+        )
+
+    async def record_run_finish(self, run_id: str, status: str, stats: Dict[str, Any]) -> None:
+        await self.db.ingestion_runs.update_one(
+            {"_id": run_id},
+            {"$set": {"finished_at": dt.datetime.utcnow(), "status": status, "stats": stats}},
+            upsert=True,
+        )
+
+    async def get_latest_run(self) -> Optional[Dict[str, Any]]:
+        return await self.db.ingestion_runs.find_one({}, {"stats": 0}, sort=[("started_at", DESCENDING)])
+
+
+class ThreadedBulkUpserter:
+    """Awaitable facade over a thread-safe `BulkUpserter`."""
+
+    def __init__(self, upserter: BulkUpserter):
+        self._upserter = upserter
+        self.stats = upserter.stats
+
+    @property
+    def failed_batches(self) -> int:
+        return self._upserter.failed_batches
+
+    async def add(self, _id: Any, doc: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._upserter.add, _id, doc)
+
+    async def add_many(self, docs: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        await asyncio.to_thread(self._upserter.add_many, docs)
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._upserter.flush)
+
+    async def close(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._upserter.close)
+
+
+class ThreadedMongoStorage:
+    """Expose the synchronous `MongoStorage` through the async storage interface.
+
+    Each call runs in a worker thread. Used when STORAGE_BACKEND=sync.
+    """
+
+    def __init__(self, storage: MongoStorage):
+        self._storage = storage
+        self.write_stats = storage.write_stats
+
+    @property
+    def db(self) -> GenerationDb:
+        return self._storage.db
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._storage.close)
+
+    def use_generation(self, generation: Dict[str, Any]) -> None:
+        self._storage.use_generation(generation)
+
+    async def drop_collections(self, names: List[str]) -> None:
+        await asyncio.to_thread(self._storage.drop_collections, names)
+
+    async def ensure_indexes(self) -> None:
+        await asyncio.to_thread(self._storage.ensure_indexes)
+
+    async def get_cached_bearer(self, cache_id: str) -> Optional[str]:
+        return await asyncio.to_thread(self._storage.get_cached_bearer, cache_id)
+
+    async def set_cached_bearer(self, cache_id: str, bearer_token: str) -> None:
+        await asyncio.to_thread(self._storage.set_cached_bearer, cache_id, bearer_token)
+
+    async def get_state(self, key: str) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._storage.get_state, key)
+
+    async def set_state(self, key: str, state: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._storage.set_state, key, state)
+
+    async def get_http_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._storage.get_http_cache, key)
+
+    async def set_http_cache(self, key: str, entry: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._storage.set_http_cache, key, entry)
+
+    async def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        return await asyncio.to_thread(self._storage.acquire_lock, name, owner, ttl_seconds)
+
+    async def renew_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        return await asyncio.to_thread(self._storage.renew_lock, name, owner, ttl_seconds)
+
+    async def release_lock(self, name: str, owner: str) -> None:
+        await asyncio.to_thread(self._storage.release_lock, name, owner)
+
+    async def refresh_manager_question_agg(self, *, rebuild: bool = False) -> Dict[str, int]:
+        return await asyncio.to_thread(self._storage.refresh_manager_question_agg, rebuild=rebuild)
+
+    async def refold_moved_employees(self, managers: Dict[Any, Optional[str]]) -> int:
+        return await asyncio.to_thread(self._storage.refold_moved_employees, managers)
+
+    async def write_org_snapshot(
+        self, run_id: str, *, keep: int = ORG_SNAPSHOTS_KEPT, publish: bool = True
+    ) -> Dict[str, int]:
+        return await asyncio.to_thread(self._storage.write_org_snapshot, run_id, keep=keep, publish=publish)
+
+    async def has_documents(self, collection: str) -> bool:
+        return await asyncio.to_thread(self._storage.has_documents, collection)
+
+    async def upsert_doc(self, collection: str, _id: Any, doc: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._storage.upsert_doc, collection, _id, doc)
+
+    def bulk_upserter(self, collection: str) -> ThreadedBulkUpserter:
+        return ThreadedBulkUpserter(self._storage.bulk_upserter(collection))
+
+    async def record_run_start(self, run_id: str) -> None:
+        await asyncio.to_thread(self._storage.record_run_start, run_id)
+
+    async def record_run_finish(self, run_id: str, status: str, stats: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._storage.record_run_finish, run_id, status, stats)
+
+    async def get_latest_run(self) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._storage.get_latest_run)
+
+
+IngestStorage = Union[AsyncMongoStorage, ThreadedMongoStorage]
+
+
+def open_storage(settings: Settings) -> IngestStorage:
+    """Build the storage backend selected by STORAGE_BACKEND (`async` or `sync`)."""
+    kwargs = {
+        "bulk_batch_size": settings.mongo_bulk_batch_size,
+        "bulk_max_bytes": settings.mongo_bulk_max_bytes,
+        "touch_unchanged": settings.ingest_touch_unchanged,
+    }
+    backend = settings.storage_backend.strip().lower()
+    if backend == "async":
+        return AsyncMongoStorage(settings.mongo_uri, settings.mongo_db, **kwargs)
+    if backend == "sync":
+        return ThreadedMongoStorage(MongoStorage(settings.mongo_uri, settings.mongo_db, **kwargs))
+    raise ValueError(f"Unknown STORAGE_BACKEND {settings.storage_backend!r}; expected 'async' or 'sync'.")
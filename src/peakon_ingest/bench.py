@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .aggregates import AGG_COLLECTION, AGG_STATE, AggRefresh, apply_bucket_delta, moved_employee_ids
+from .generations import base_generation
+from .http import PeakonClient
+from .ingest import ingest_all
+from .mock_peakon import FaultPlan, MockPeakonTransport, SyntheticTenant
+from .org_tree import (
+    ORG_SNAPSHOT_NODES,
+    ORG_SNAPSHOT_STATE,
+    ORG_SNAPSHOTS,
+    ORG_SNAPSHOTS_KEPT,
+    org_snapshot_docs,
+    stale_snapshot_ids,
+)
+from .pagination import PageSizeBounds
+from .storage import _empty_write_stats
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+BENCH_BASE_URL = "https://peakon.invalid/api/v1"
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class _MemoryWriter:
+    def __init__(self, docs: Dict[Any, Dict[str, Any]], stats: Dict[str, Any]):
+        self.docs = docs
+        self.stats = stats
+        self.failed_batches = 0
+
+    async def add(self, _id: Any, doc: Dict[str, Any]) -> None:
+        await self.add_many([(_id, doc)])
+
+    async def add_many(self, docs: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        for _id, doc in docs:
+            self.stats["inserted" if _id not in self.docs else "changed"] += 1
+            # Merge like the Mongo `$set` upsert, keeping fields the ingest does not write.
+            self.docs[_id] = {**self.docs.get(_id, {}), **doc}
+        self.stats["docs"] += len(docs)
+        self.stats["upserted"] += len(docs)
+
+    async def flush(self) -> None:
+        return None
+
+    async def close(self) -> Dict[str, Any]:
+        return self.stats
+
+
+class MemoryStorage:
+    """Dict-backed stand-in for the Mongo storage backends, for benchmarks that should measure the pipeline only."""
+
+    def __init__(self) -> None:
+        self.collections: Dict[str, Dict[Any, Dict[str, Any]]] = {}
+        self.write_stats: Dict[str, Dict[str, Any]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.names: Dict[str, str] = base_generation()["collections"]
+
+    def _coll(self, name: str) -> Dict[Any, Dict[str, Any]]:
+        return self.collections.setdefault(self.names.get(name, name), {})
+
+    async def aclose(self) -> None:
+        return None
+
+    def use_generation(self, generation: Dict[str, Any]) -> None:
+        self.names = dict(generation["collections"])
+
+    async def drop_collections(self, names: List[str]) -> None:
+        for name in names:
+            self.collections.pop(name, None)
+
+    async def ensure_indexes(self) -> None:
+        return None
+
+    async def get_cached_bearer(self, cache_id: str) -> Optional[str]:
+        return None
+
+    async def set_cached_bearer(self, cache_id: str, bearer_token: str) -> None:
+        return None
+
+    async def get_state(self, key: str) -> Dict[str, Any]:
+        return dict(self.collections.get("sync_state", {}).get(key) or {"_id": key})
+
+    async def set_state(self, key: str, state: Dict[str, Any]) -> None:
+        current = self.collections.setdefault("sync_state", {}).setdefault(key, {"_id": key})
+        current.update(state)
+
+    async def get_http_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.collections.get("http_cache", {}).get(key)
+
+    async def set_http_cache(self, key: str, entry: Dict[str, Any]) -> None:
+        self.collections.setdefault("http_cache", {})[key] = dict(entry)
+
+    async def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        locks = self.collections.setdefault("locks", {})
+        now = dt.datetime.utcnow()
+        current = locks.get(name)
+        if current and current["owner"] != owner and current["expires_at"] > now:
+            return False
+        locks[name] = {"_id": name, "owner": owner, "expires_at": now + dt.timedelta(seconds=ttl_seconds)}
+        return True
+
+    async def renew_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        current = self.collections.get("locks", {}).get(name)
+        if not current or current["owner"] != owner:
+            return False
+        current["expires_at"] = dt.datetime.utcnow() + dt.timedelta(seconds=ttl_seconds)
+        return True
+
+    async def release_lock(self, name: str, owner: str) -> None:
+        locks = self.collections.get("locks", {})
+        if locks.get(name, {}).get("owner") == owner:
+            del locks[name]
+
+    async def refresh_manager_question_agg(self, *, rebuild: bool = False) -> Dict[str, int]:
+        answers = self._coll("answers_export")
+        buckets = self._coll(AGG_COLLECTION)
+        refresh = AggRefresh(await self.get_state(AGG_STATE), rebuild=rebuild)
+        if refresh.rebuild:
+            buckets.clear()
+            for doc in answers.values():
+                doc.pop("agg", None)
+                doc["agg_pending"] = True
+        pending = [doc for doc in answers.values() if doc.get("agg_pending")]
+        employees = self._coll("employees")
+        ids = refresh.employee_filter(pending)["_id"]["$in"]
+        deltas, contributions = refresh.plan(pending, [employees[i] for i in ids if i in employees])
+        for bucket_id, delta in deltas.items():
+            apply_bucket_delta(buckets, bucket_id, delta)
+        for answer_id, contribution in contributions:
+            answers[answer_id]["agg"] = contribution
+            answers[answer_id].pop("agg_pending", None)
+        await self.set_state(AGG_STATE, refresh.finished_state(dt.datetime.utcnow()))
+        return refresh.stats
+
+    async def refold_moved_employees(self, managers: Dict[Any, Optional[str]]) -> int:
+        employees = self._coll("employees")
+        moved = set(moved_employee_ids([employees[i] for i in managers if i in employees], managers))
+        answers = [doc for doc in self._coll("answers_export").values() if (doc.get("norm") or {}).get("employee_id") in moved]
+        for doc in answers:
+            doc["agg_pending"] = True
+        return len(answers)
+
+    async def write_org_snapshot(
+        self, run_id: str, *, keep: int = ORG_SNAPSHOTS_KEPT, publish: bool = True
+    ) -> Dict[str, int]:
+        header, nodes = org_snapshot_docs(run_id, list(self._coll("employees").values()))
+        snapshots = self.collections.setdefault(ORG_SNAPSHOTS, {})
+        snapshot_nodes = self.collections.setdefault(ORG_SNAPSHOT_NODES, {})
+        snapshot_nodes.update({doc["_id"]: doc for doc in nodes})
+        snapshots[run_id] = header
+        if publish:
+            await self.set_state(ORG_SNAPSHOT_STATE, {"run_id": run_id})
+        served = (await self.get_state(ORG_SNAPSHOT_STATE)).get("run_id")
+        stale = set(stale_snapshot_ids(snapshots.values(), keep=keep, served=served))
+        for snapshot_id in stale:
+            del snapshots[snapshot_id]
+        for node_id in [k for k, doc in snapshot_nodes.items() if doc["run_id"] in stale]:
+            del snapshot_nodes[node_id]
+        return {"nodes": len(nodes), "pruned": len(stale)}
+
+    async def has_documents(self, collection: str) -> bool:
+        return bool(self._coll(collection))
+
+    def bulk_upserter(self, collection: str) -> _MemoryWriter:
+        stats = self.write_stats.setdefault(collection, _empty_write_stats())
+        return _MemoryWriter(self._coll(collection), stats)
+
+    async def record_run_start(self, run_id: str) -> None:
+        self.runs[run_id] = {"status": "running"}
+
+    async def record_run_finish(self, run_id: str, status: str, stats: Dict[str, Any]) -> None:
+        self.runs[run_id] = {"status": status, "stats": stats}
+
+    async def get_latest_run(self) -> Optional[Dict[str, Any]]:
+        return None
+
+
+async def run_benchmark(
+    tenant: SyntheticTenant,
+    faults: Optional[FaultPlan] = None,
+    *,
+    storage: Any = None,
+    per_page: int = 1000,
+    queue_size: int = 4,
+    writers: int = 1,
+    max_in_flight: int = 4,
+    max_parallel_stages: int = 3,
+    stream_chunk_size: Optional[int] = None,
+    page_size_bounds: Optional[PageSizeBounds] = None,
+    requests_per_second: Optional[float] = None,
+    burst: int = 1,
+    staged: bool = False,
+) -> Dict[str, Any]:
+    """Run `ingest_all` against `MockPeakonTransport` and report throughput.
+
+    Uses `MemoryStorage` unless a storage backend is passed. A failed run is
+    reported (status and error) rather than raised.
+    """
+    transport = MockPeakonTransport(tenant, faults, base_url=BENCH_BASE_URL)
+    storage = storage if storage is not None else MemoryStorage()
+    client = PeakonClient(
+        BENCH_BASE_URL,
+        app_token="bench",
+        timeout_seconds=60,
+        requests_per_second=requests_per_second,
+        burst=burst,
+        transport=transport,
+    )
+
+    status, error, stats = "success", None, {}
+    started = time.perf_counter()
+    try:
+        stats = await ingest_all(
+            client,
+            storage,
+            company_id=tenant.company_id,
+            engagement_groups=tenant.engagement_groups,
+            per_page=per_page,
+            full_sync=True,
+            queue_size=queue_size,
+            writers=writers,
+            max_in_flight=max_in_flight,
+            max_parallel_stages=max_parallel_stages,
+            stream_chunk_size=stream_chunk_size,
+            page_size_bounds=page_size_bounds,
+            staged=staged,
+        )
+    except Exception as e:
+        status, error = "failure", str(e)
+    finally:
+        elapsed = time.perf_counter() - started
+        await client.aclose()
+
+    docs = sum(s.get("docs", 0) for s in storage.write_stats.values())
+    stages = {name: record.get("duration_s") for name, record in (stats.get("stages") or {}).items()}
+    return {
+        "status": status,
+        "error": error,
+        "elapsed_s": round(elapsed, 3),
+        "docs": docs,
+        "docs_per_s": round(docs / elapsed, 1) if elapsed else None,
+        "pages": transport.stats.pages,
+        "pages_per_s": round(transport.stats.pages / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stages,
+        "requests": {k: v for k, v in asdict(transport.stats).items() if k != "by_path"},
+        "rate_limit": client.rate_limiter.snapshot(),
+        "telemetry": stats.get("telemetry"),
+    }
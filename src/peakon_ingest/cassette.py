@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import base64
+import datetime as dt
+import gzip
+import json
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PATTERN = "segment-*.ndjson.gz"
+# Roll over to a new segment once this much (uncompressed) body data was written.
+DEFAULT_SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+# Response headers worth keeping; everything else (cookies, tracing, ...) is dropped.
+# content-encoding must be kept: the recorded body is the raw (possibly compressed) stream.
+_KEPT_HEADERS = ("content-type", "content-encoding", "etag", "last-modified")
+# Recorded in place of the bearer token returned by /auth/application.
+REPLAY_BEARER_TOKEN = "replay-token"
+# Not part of the request key: on replay the recorded pages decide the page size,
+# whatever PEAKON_PER_PAGE or adaptive paging would ask for.
+_UNKEYED_PARAMS = {"per_page"}
+
+
+def _request_key(method: str, url: str) -> str:
+    """Method + URL with query parameters sorted, so param order does not matter."""
+    parts = urlsplit(url)
+    params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in _UNKEYED_PARAMS]
+    query = urlencode(sorted(params))
+    return f"{method.upper()} {urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))}"
+
+
+def _is_auth(url: httpx.URL) -> bool:
+    return url.path.rstrip("/").endswith("/auth/application")
+
+
+class _TeeStream(httpx.AsyncByteStream):
+    """Pass body chunks through unchanged and hand the full body over once read to the end."""
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_complete):
+        self._inner = inner
+        self._on_complete = on_complete
+        self._chunks: List[bytes] = []
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._inner:
+            self._chunks.append(chunk)
+            yield chunk
+        self._on_complete(b"".join(self._chunks))
+        self._chunks = []
+
+    async def aclose(self) -> None:
+        await self._inner.aclose()
+
+
+class CassetteRecorder:
+    """Append recorded responses to gzip NDJSON segment files in `directory`."""
+
+    def __init__(self, directory: str | Path, *, segment_max_bytes: int = DEFAULT_SEGMENT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_max_bytes = segment_max_bytes
+        self.records = 0
+        self._segment = len(list(self.directory.glob(SEGMENT_PATTERN)))
+        self._file: Optional[gzip.GzipFile] = None
+        self._written = 0
+
+    def _open_next(self) -> gzip.GzipFile:
+        self.close()
+        self._segment += 1
+        path = self.directory / f"segment-{self._segment:05d}.ndjson.gz"
+        self._file = gzip.open(path, "wb")
+        self._written = 0
+        logger.info("Recording Peakon responses to %s", path)
+        return self._file
+
+    def write(self, request: httpx.Request, response: httpx.Response, body: bytes) -> None:
+        record: Dict[str, Any] = {
+            "key": _request_key(request.method, str(request.url)),
+            "status": response.status_code,
+            "headers": {k: response.headers[k] for k in _KEPT_HEADERS if k in response.headers},
+            "recorded_at": dt.datetime.utcnow().isoformat() + "Z",
+        }
+        if _is_auth(request.url):
+            # Never persist a live bearer token.
+            body = json.dumps({"data": {"id": REPLAY_BEARER_TOKEN}}).encode("utf-8")
+            record["headers"].pop("content-encoding", None)
+        try:
+            record["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            record["body_b64"] = base64.b64encode(body).decode("ascii")
+
+        file = self._file
+        if file is None or self._written >= self.segment_max_bytes:
+            file = self._open_next()
+        line = json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n"
+        file.write(line)
+        self._written += len(line)
+        self.records += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Forward requests to `inner` and record every successful response body.
+
+    Streamed bodies are recorded once the caller has read them to the end, so
+    streaming callers still see chunks as they arrive.
+    """
+
+    def __init__(self, recorder: CassetteRecorder, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.recorder = recorder
+        self._inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._inner.handle_async_request(request)
+        if not 200 <= response.status_code < 300:
+            return response
+
+        def on_complete(body: bytes) -> None:
+            self.recorder.write(request, response, body)
+
+        response.stream = _TeeStream(response.stream, on_complete)  # type: ignore[arg-type]
+        return response
+
+    async def aclose(self) -> None:
+        self.recorder.close()
+        await self._inner.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serve responses from recorded segments without touching the network.
+
+    Responses for the same request are replayed in recorded order; once they
+    run out the last one is repeated. Only an index is kept in memory: bodies
+    are re-read from their segment on demand, with the last few decoded
+    segments cached because replay mostly follows recording order.
+    """
+
+    def __init__(self, directory: str | Path, *, cached_segments: int = 2):
+        self.directory = Path(directory)
+        self._segments = sorted(self.directory.glob(SEGMENT_PATTERN))
+        if not self._segments:
+            raise FileNotFoundError(f"No recorded segments ({SEGMENT_PATTERN}) in {self.directory}")
+        self._index: Dict[str, List[Tuple[int, int]]] = {}
+        self._served: Dict[str, int] = {}
+        self._cache: "OrderedDict[int, List[bytes]]" = OrderedDict()
+        self._cached_segments = max(1, cached_segments)
+        self.stats = {"served": 0, "missing": 0}
+        for seg_num, path in enumerate(self._segments):
+            with gzip.open(path, "rb") as f:
+                for line_num, line in enumerate(f):
+                    key = json.loads(line)["key"]
+                    self._index.setdefault(key, []).append((seg_num, line_num))
+
+    def _lines(self, seg_num: int) -> List[bytes]:
+        if seg_num in self._cache:
+            self._cache.move_to_end(seg_num)
+            return self._cache[seg_num]
+        with gzip.open(self._segments[seg_num], "rb") as f:
+            lines = f.readlines()
+        self._cache[seg_num] = lines
+        while len(self._cache) > self._cached_segments:
+            self._cache.popitem(last=False)
+        return lines
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _request_key(request.method, str(request.url))
+        positions = self._index.get(key)
+        if not positions:
+            self.stats["missing"] += 1
+            logger.warning("No recorded response for %s", key)
+            return httpx.Response(404, json={"error": f"not recorded: {key}"}, request=request)
+
+        served = self._served.get(key, 0)
+        self._served[key] = served + 1
+        seg_num, line_num = positions[min(served, len(positions) - 1)]
+        record = json.loads(self._lines(seg_num)[line_num])
+        if "body_b64" in record:
+            body = base64.b64decode(record["body_b64"])
+        else:
+            body = record["body"].encode("utf-8")
+        self.stats["served"] += 1
+        return httpx.Response(record["status"], headers=record.get("headers") or {}, content=body, request=request)
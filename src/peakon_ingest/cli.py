@@ -1,49 +1,192 @@
 from __future__ import annotations
 
 import asyncio
+import datetime as dt
+import json
+from typing import List, Optional
+
 import typer
 
-from .config import get_settings
+from .config import Settings, get_settings
 from .logging_utils import setup_logging
+from .cassette import CassetteRecorder, RecordingTransport, ReplayTransport
 from .http import PeakonClient
-from .storage import MongoStorage
-from .ingest import ingest_all
+from .async_storage import open_storage
+from .bench import run_benchmark
+from .mock_peakon import FaultPlan, generate_tenant
+from .normalize import NORMALIZERS, backfill_norm
+from .generations import GENERATION_STATE, current_generation, rolled_back_pointer
+from .indexes import advise
+from .ingest import DERIVED_STAGES, STAGE_NAMES, ingest_all
+from .lease import LeaseLock
+from .org_tree import ORG_SNAPSHOT_STATE
 from .scheduler import run_daemon
+from .storage import MongoStorage
+from .tenants import ingest_tenants, load_tenants
 
 app = typer.Typer(add_completion=False)
 
 
+def _open_mongo_storage(settings: Settings) -> MongoStorage:
+    """Sync storage on the generation the API currently reads."""
+    storage = MongoStorage(settings.mongo_uri, settings.mongo_db)
+    storage.use_generation(current_generation(storage.get_state(GENERATION_STATE)))
+    return storage
+
+
 @app.command()
-def ingest(full_sync: bool = typer.Option(None, help="Override FULL_SYNC env var (true/false)")) -> None:
+def ingest(
+    full_sync: bool = typer.Option(None, help="Override FULL_SYNC env var (true/false)"),
+    storage_backend: str = typer.Option(None, "--storage", help="Override STORAGE_BACKEND env var (async/sync)"),
+    resume: bool = typer.Option(False, "--resume", help="Continue answers/employees from the checkpoints of a failed run"),
+    run_id: str = typer.Option(None, "--run-id", help="Run to resume (default: the latest run, if it did not succeed)"),
+    record: str = typer.Option(None, "--record", help="Also write every Peakon response to gzip NDJSON segments in DIR"),
+    replay: str = typer.Option(None, "--replay", help="Serve Peakon responses from segments recorded in DIR (no network)"),
+    only: Optional[List[str]] = typer.Option(
+        None, "--only", help=f"Run only this stage (repeatable; dependencies are added): {', '.join(STAGE_NAMES)}"
+    ),
+    skip: Optional[List[str]] = typer.Option(None, "--skip", help="Do not run this stage (repeatable)"),
+    employee_ids: Optional[List[int]] = typer.Option(
+        None, "--employee-id", help="Refresh only this employee (repeatable); implies --only employees"
+    ),
+    answers_since: str = typer.Option(
+        None, "--answers-since", help="Write only answers given on/after this ISO date; implies --only answers_export"
+    ),
+    no_lock: bool = typer.Option(False, "--no-lock", help="Run even if another ingest holds the lock in Mongo"),
+    staged: bool = typer.Option(
+        None, "--staged/--no-staged", help="Override INGEST_STAGED: ingest into shadow collections, swap on success"
+    ),
+) -> None:
     """Run ingestion once and exit."""
     settings = get_settings()
     setup_logging(settings.log_level)
 
     if full_sync is not None:
         settings.full_sync = full_sync
+    if storage_backend is not None:
+        settings.storage_backend = storage_backend
+    if record and replay:
+        raise typer.BadParameter("--record and --replay cannot be combined")
+    unknown = [name for name in [*(only or []), *(skip or [])] if name not in STAGE_NAMES]
+    if unknown:
+        raise typer.BadParameter(f"Unknown stages {unknown}; choose from {', '.join(STAGE_NAMES)}")
+    answered_since = None
+    if answers_since:
+        try:
+            answered_since = dt.datetime.fromisoformat(answers_since)
+        except ValueError:
+            raise typer.BadParameter(f"--answers-since must be an ISO date or datetime, got {answers_since!r}")
+        if answered_since.tzinfo is None:
+            answered_since = answered_since.replace(tzinfo=dt.timezone.utc)
+    targeted = bool(resume or only or skip or employee_ids or answered_since)
+    if staged and targeted:
+        raise typer.BadParameter("--staged rebuilds every collection and cannot be combined with a resume or partial run")
+    # INGEST_STAGED applies to full runs; targeted refreshes update the current generation in place.
+    staged = settings.ingest_staged and not targeted if staged is None else staged
+    then: List[str] = []
+    if not only and (employee_ids or answered_since):
+        # Targeted refreshes run the stage they target and the cheap stages derived
+        # from it (org snapshot, manager x question aggregates) unless --only says otherwise.
+        only = (["employees"] if employee_ids else []) + (["answers_export"] if answered_since else [])
+        then = list(DERIVED_STAGES)
+
+    transport = None
+    if record:
+        transport = RecordingTransport(CassetteRecorder(record))
+    elif replay:
+        transport = ReplayTransport(replay)
 
     async def _main() -> None:
+        storage = open_storage(settings)
         client = PeakonClient(
             base_url=settings.peakon_base_url,
-            app_token=settings.peakon_app_token,
+            app_token=settings.peakon_app_token or ("replay" if replay else None),
             timeout_seconds=settings.http_timeout_seconds,
+            # Replay runs at local speed; recording needs full bodies, not 304s.
+            requests_per_second=None if replay else settings.peakon_rate_limit_per_second,
+            burst=settings.peakon_rate_limit_burst,
+            response_cache=storage if settings.peakon_http_cache and not (record or replay) else None,
+            transport=transport,
         )
-        storage = MongoStorage(settings.mongo_uri, settings.mongo_db)
+        lease = LeaseLock(storage, ttl_seconds=settings.schedule_lock_ttl_seconds)
         try:
-            await ingest_all(
+            if not no_lock and not await lease.acquire():
+                typer.echo("Another ingest holds the lock (locks.ingest); use --no-lock to run anyway.", err=True)
+                raise typer.Exit(code=1)
+            resume_run_id = run_id
+            if resume and not resume_run_id:
+                latest = await storage.get_latest_run()
+                if not latest or latest.get("status") == "success":
+                    typer.echo("Nothing to resume: the latest run did not fail.", err=True)
+                    raise typer.Exit(code=1)
+                resume_run_id = latest["_id"]
+            run = ingest_all(
                 client,
                 storage,
                 company_id=settings.peakon_company_id,
-                engagement_group=settings.peakon_engagement_group,
+                engagement_groups=settings.engagement_groups(),
                 per_page=settings.peakon_per_page,
                 full_sync=settings.full_sync,
+                queue_size=settings.ingest_queue_size,
+                writers=settings.ingest_writers,
+                max_in_flight=settings.peakon_max_in_flight,
+                max_parallel_stages=settings.ingest_max_parallel_stages,
+                stream_chunk_size=settings.stream_chunk_size(),
+                page_size_bounds=settings.page_size_bounds(),
+                resume_run_id=resume_run_id if resume else None,
+                only=only or None,
+                skip=skip or None,
+                then=then or None,
+                employee_ids=employee_ids or None,
+                answered_since=answered_since,
+                staged=staged,
             )
+            await (lease.hold(run) if lease.held else run)
         finally:
+            await lease.release()
             await client.aclose()
+            await storage.aclose()
 
     asyncio.run(_main())
 
 
+@app.command("ingest-tenants")
+def ingest_tenants_command(
+    tenants_file: str = typer.Option(None, "--tenants", help="Tenant config JSON (default: PEAKON_TENANTS_FILE)"),
+    processes: int = typer.Option(None, help="Tenants ingested at once (default: INGEST_TENANT_PROCESSES)"),
+    tenant_names: Optional[List[str]] = typer.Option(None, "--tenant", help="Only ingest this tenant (repeatable)"),
+    full_sync: bool = typer.Option(None, help="Override FULL_SYNC env var (true/false)"),
+    as_json: bool = typer.Option(False, "--json", help="Print the per-tenant results as JSON"),
+) -> None:
+    """Ingest every configured Peakon company, each into its own database, across a process pool."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    if full_sync is not None:
+        settings.full_sync = full_sync
+    path = tenants_file or settings.peakon_tenants_file
+    if not path:
+        raise typer.BadParameter("Pass --tenants or set PEAKON_TENANTS_FILE")
+    tenants = load_tenants(path)
+    if tenant_names:
+        unknown = sorted(set(tenant_names) - {t.name for t in tenants})
+        if unknown:
+            raise typer.BadParameter(f"Unknown tenants {unknown}")
+        tenants = [t for t in tenants if t.name in tenant_names]
+
+    results = ingest_tenants(settings, tenants, processes=processes or settings.ingest_tenant_processes)
+    if as_json:
+        typer.echo(json.dumps(results, indent=2, default=str))
+    else:
+        for result in results:
+            line = f"{result['tenant']:<20} {result['status']:<8} {result.get('duration_s', '-')}s"
+            if result.get("error"):
+                line += f"  {result['error']}"
+            typer.echo(line)
+    if any(result["status"] == "failure" for result in results):
+        raise typer.Exit(code=1)
+
+
 @app.command()
 def daemon() -> None:
     """Run a long-lived scheduler process that executes ingestion weekly."""
@@ -52,5 +195,182 @@ def daemon() -> None:
     run_daemon(settings)
 
 
+@app.command("backfill-norm")
+def backfill_norm_command(
+    collections: Optional[List[str]] = typer.Option(
+        None, "--collection", help="Only backfill this collection (repeatable, default: all normalized collections)"
+    ),
+) -> None:
+    """Write the `norm` query fields on stored documents that lack them or are from an older NORM_VERSION."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    unknown = sorted(set(collections or []) - set(NORMALIZERS))
+    if unknown:
+        raise typer.BadParameter(f"Unknown collections {unknown}; expected some of {sorted(NORMALIZERS)}")
+    storage = _open_mongo_storage(settings)
+    try:
+        storage.ensure_indexes()
+        counts = backfill_norm(storage.db, collections=collections)
+    finally:
+        storage.close()
+    for name, count in counts.items():
+        typer.echo(f"{name:<18} {count} updated")
+
+
+@app.command("rebuild-manager-question-agg")
+def rebuild_manager_question_agg() -> None:
+    """Recompute the manager x question buckets from every stored answer, e.g. after managers changed."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    storage = _open_mongo_storage(settings)
+    try:
+        storage.ensure_indexes()
+        stats = storage.refresh_manager_question_agg(rebuild=True)
+    finally:
+        storage.close()
+    typer.echo(f"{stats['answers']} answers aggregated into {stats['buckets']} bucket updates")
+
+
+@app.command("index-advise")
+def index_advise(
+    ensure: bool = typer.Option(False, "--ensure", help="Create the declared indexes before explaining"),
+    as_json: bool = typer.Option(False, "--json", help="Print the report as JSON"),
+) -> None:
+    """Explain the API's representative queries and report COLLSCANs and docs examined per doc returned."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    storage = _open_mongo_storage(settings)
+    try:
+        if ensure:
+            storage.ensure_indexes()
+        report = advise(storage.db)
+    finally:
+        storage.close()
+    if as_json:
+        typer.echo(json.dumps(report, indent=2, default=str))
+        return
+    for row in report:
+        if row.get("error"):
+            typer.echo(f"{row['endpoint']:<40} ERROR {row['error']}")
+            continue
+        plan = "COLLSCAN" if row["collscan"] else ",".join(row["indexes"]) or "-"
+        typer.echo(
+            f"{row['endpoint']:<40} {plan:<50} returned={row['returned']} "
+            f"docs_examined={row['docs_examined']} ratio={row['examined_ratio']}"
+        )
+
+
+@app.command()
+def generations(as_json: bool = typer.Option(False, "--json", help="Print the pointer as JSON")) -> None:
+    """Show the collection generation the API reads and the previous ones kept for rollback."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    storage = MongoStorage(settings.mongo_uri, settings.mongo_db)
+    try:
+        pointer = storage.get_state(GENERATION_STATE)
+    finally:
+        storage.close()
+    rows = [("current", current_generation(pointer))] + [("previous", g) for g in pointer.get("previous") or []]
+    if as_json:
+        typer.echo(json.dumps([{"role": role, **generation} for role, generation in rows], indent=2, default=str))
+        return
+    for role, generation in rows:
+        typer.echo(f"{role:<9} {generation['id']:<34} {generation.get('created_at') or '-'}")
+
+
+@app.command()
+def rollback() -> None:
+    """Point the API back at the previous generation (run again to roll forward)."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    storage = MongoStorage(settings.mongo_uri, settings.mongo_db)
+    try:
+        try:
+            pointer = rolled_back_pointer(storage.get_state(GENERATION_STATE))
+        except ValueError as e:
+            typer.echo(str(e), err=True)
+            raise typer.Exit(code=1)
+        storage.set_state(GENERATION_STATE, {"current": pointer["current"], "previous": pointer["previous"]})
+        if pointer["current"].get("org_snapshot"):
+            storage.set_state(ORG_SNAPSHOT_STATE, {"run_id": pointer["current"]["org_snapshot"]})
+    finally:
+        storage.close()
+    typer.echo(f"API now reads generation {pointer['current']['id']}")
+
+
+@app.command()
+def bench(
+    employees: int = typer.Option(1000, help="Synthetic employees"),
+    answers: int = typer.Option(20000, help="Synthetic answers"),
+    span: int = typer.Option(8, help="Direct reports per manager in the synthetic hierarchy"),
+    latency_ms: float = typer.Option(0.0, help="Latency added to every mock response"),
+    jitter_ms: float = typer.Option(0.0, help="Random extra latency, up to this much"),
+    rate_429: float = typer.Option(0.0, "--429-rate", help="Share of requests answered with 429"),
+    rate_5xx: float = typer.Option(0.0, "--5xx-rate", help="Share of requests answered with 503"),
+    token_ttl: int = typer.Option(0, help="Expire the bearer token after this many requests (forces 401s)"),
+    seed: int = typer.Option(0, help="Seed for the data generator and fault injection"),
+    storage_backend: str = typer.Option(
+        "memory", "--storage", help="memory, or async/sync to write to Mongo (MONGO_URI) in --mongo-db"
+    ),
+    mongo_db: str = typer.Option("peakon_bench", help="Database used with --storage async/sync"),
+    as_json: bool = typer.Option(False, "--json", help="Print the report as JSON"),
+) -> None:
+    """Benchmark ingest_all against an in-process fake Peakon API (no network access)."""
+    settings = get_settings()
+    setup_logging(settings.log_level)
+
+    tenant = generate_tenant(employees=employees, answers=answers, span=span, seed=seed)
+    faults = FaultPlan(
+        latency_seconds=latency_ms / 1000,
+        jitter_seconds=jitter_ms / 1000,
+        rate_429=rate_429,
+        rate_5xx=rate_5xx,
+        token_ttl_requests=token_ttl,
+        seed=seed,
+    )
+
+    async def _main() -> dict:
+        storage = None
+        if storage_backend != "memory":
+            settings.storage_backend = storage_backend
+            settings.mongo_db = mongo_db
+            storage = open_storage(settings)
+        try:
+            return await run_benchmark(
+                tenant,
+                faults,
+                storage=storage,
+                per_page=settings.peakon_per_page,
+                queue_size=settings.ingest_queue_size,
+                writers=settings.ingest_writers,
+                max_in_flight=settings.peakon_max_in_flight,
+                max_parallel_stages=settings.ingest_max_parallel_stages,
+                stream_chunk_size=settings.stream_chunk_size(),
+                page_size_bounds=settings.page_size_bounds(),
+                requests_per_second=settings.peakon_rate_limit_per_second,
+                burst=settings.peakon_rate_limit_burst,
+            )
+        finally:
+            if storage is not None:
+                await storage.aclose()
+
+    report = asyncio.run(_main())
+    if as_json:
+        typer.echo(json.dumps(report, indent=2))
+        return
+    typer.echo(f"status:      {report['status']}" + (f" ({report['error']})" if report["error"] else ""))
+    typer.echo(f"elapsed:     {report['elapsed_s']}s")
+    typer.echo(f"docs:        {report['docs']} ({report['docs_per_s']}/s)")
+    typer.echo(f"pages:       {report['pages']} ({report['pages_per_s']}/s)")
+    typer.echo(f"peak RSS:    {report['peak_rss_mb']} MB")
+    for name, seconds in report["stages"].items():
+        typer.echo(f"  {name:<18} {seconds}s")
+
+
 if __name__ == "__main__":
     app()
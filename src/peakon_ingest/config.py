@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+from typing import List, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
+from .pagination import PageSizeBounds
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
@@ -12,21 +16,85 @@ class Settings(BaseSettings):
     peakon_app_token: str | None = Field(default=None, alias="PEAKON_APP_TOKEN")
     peakon_company_id: int = Field(default=22182, alias="PEAKON_COMPANY_ID")
     peakon_engagement_group: str = Field(default="engagement", alias="PEAKON_ENGAGEMENT_GROUP")
+    # Optional comma-separated list; overrides PEAKON_ENGAGEMENT_GROUP when set.
+    peakon_engagement_groups: str | None = Field(default=None, alias="PEAKON_ENGAGEMENT_GROUPS")
     peakon_per_page: int = Field(default=10000, alias="PEAKON_PER_PAGE")
     http_timeout_seconds: int = Field(default=60, alias="HTTP_TIMEOUT_SECONDS")
+    peakon_max_in_flight: int = Field(default=4, alias="PEAKON_MAX_IN_FLIGHT")
+    # Client-side token bucket shared by all requests; 0 disables (Retry-After is still honoured)
+    peakon_rate_limit_per_second: float = Field(default=10.0, alias="PEAKON_RATE_LIMIT_PER_SECOND")
+    peakon_rate_limit_burst: int = Field(default=10, alias="PEAKON_RATE_LIMIT_BURST")
+    # Revalidate drivers/context score responses with ETag/Last-Modified and skip unchanged ones
+    peakon_http_cache: bool = Field(default=True, alias="PEAKON_HTTP_CACHE")
+    # Adapt answers/employees per_page within these bounds to hit the target page latency
+    peakon_adaptive_paging: bool = Field(default=False, alias="PEAKON_ADAPTIVE_PAGING")
+    peakon_per_page_min: int = Field(default=500, alias="PEAKON_PER_PAGE_MIN")
+    peakon_per_page_max: int = Field(default=10000, alias="PEAKON_PER_PAGE_MAX")
+    peakon_target_page_seconds: float = Field(default=10.0, alias="PEAKON_TARGET_PAGE_SECONDS")
+    peakon_max_page_bytes: int = Field(default=64 * 1024 * 1024, alias="PEAKON_MAX_PAGE_BYTES")
+
+    # Multi-tenant mode: JSON file listing companies (see README); each is ingested into its own database
+    peakon_tenants_file: str | None = Field(default=None, alias="PEAKON_TENANTS_FILE")
+    # Tenants ingested at once, each in its own worker process
+    ingest_tenant_processes: int = Field(default=4, alias="INGEST_TENANT_PROCESSES")
+
+    # Ingest pipeline: fetched pages waiting to be written, and concurrent page writers
+    ingest_queue_size: int = Field(default=4, alias="INGEST_QUEUE_SIZE")
+    ingest_writers: int = Field(default=1, alias="INGEST_WRITERS")
+    # Parse answers/employees pages incrementally and hand them to writers in slices of this many items
+    peakon_stream_pages: bool = Field(default=True, alias="PEAKON_STREAM_PAGES")
+    ingest_stream_chunk_size: int = Field(default=1000, alias="INGEST_STREAM_CHUNK_SIZE")
+    # Independent ingest stages (answers, employees, drivers, ...) running at once
+    ingest_max_parallel_stages: int = Field(default=3, alias="INGEST_MAX_PARALLEL_STAGES")
 
     # Mongo
     mongo_uri: str = Field(default="mongodb://mongo:27017", alias="MONGO_URI")
     mongo_db: str = Field(default="peakon", alias="MONGO_DB")
+    mongo_bulk_batch_size: int = Field(default=1000, alias="MONGO_BULK_BATCH_SIZE")
+    mongo_bulk_max_bytes: int = Field(default=8 * 1024 * 1024, alias="MONGO_BULK_MAX_BYTES")
+    # `async` (pymongo async client on the ingest event loop) or `sync` (MongoStorage in worker threads)
+    storage_backend: str = Field(default="async", alias="STORAGE_BACKEND")
+    # Docs whose content hash is unchanged only get `last_seen_run` bumped (or are skipped when false)
+    ingest_touch_unchanged: bool = Field(default=True, alias="INGEST_TOUCH_UNCHANGED")
+    # Write full runs to shadow collections and swap the API over once they succeed (see generations.py)
+    ingest_staged: bool = Field(default=False, alias="INGEST_STAGED")
+
+    # Browse API: async Mongo connection pool, and the time budget for all queries of one request (sent as maxTimeMS)
+    api_mongo_max_pool_size: int = Field(default=100, alias="API_MONGO_MAX_POOL_SIZE")
+    api_mongo_min_pool_size: int = Field(default=0, alias="API_MONGO_MIN_POOL_SIZE")
+    api_request_timeout_seconds: float = Field(default=30.0, alias="API_REQUEST_TIMEOUT_SECONDS")
 
     # Scheduler
+    # Serve Prometheus metrics on this port from the daemon (0 disables)
+    metrics_port: int = Field(default=0, alias="METRICS_PORT")
     schedule_cron: str = Field(default="0 3 * * 1", alias="SCHEDULE_CRON")
     run_on_start: bool = Field(default=True, alias="RUN_ON_START")
+    # What to do when a run comes due while the previous one is still going: `skip` or `queue` (one)
+    schedule_overlap: str = Field(default="skip", alias="SCHEDULE_OVERLAP")
+    # Lease on the `locks.ingest` document; renewed every third of this while a run is in progress
+    schedule_lock_ttl_seconds: float = Field(default=300.0, alias="SCHEDULE_LOCK_TTL_SECONDS")
     full_sync: bool = Field(default=False, alias="FULL_SYNC")
 
     # Logging
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
 
+    def stream_chunk_size(self) -> Optional[int]:
+        return self.ingest_stream_chunk_size if self.peakon_stream_pages else None
+
+    def page_size_bounds(self) -> Optional[PageSizeBounds]:
+        if not self.peakon_adaptive_paging:
+            return None
+        return PageSizeBounds(
+            min_per_page=self.peakon_per_page_min,
+            max_per_page=self.peakon_per_page_max,
+            target_seconds=self.peakon_target_page_seconds,
+            max_page_bytes=self.peakon_max_page_bytes,
+        )
+
+    def engagement_groups(self) -> List[str]:
+        groups = [g.strip() for g in (self.peakon_engagement_groups or "").split(",") if g.strip()]
+        return groups or [self.peakon_engagement_group]
+
 
 def get_settings() -> Settings:
     return Settings()
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import datetime as dt
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .aggregates import AGG_COLLECTION
+from .org_tree import ORG_SNAPSHOT_STATE
+
+logger = logging.getLogger(__name__)
+
+# sync_state key of the pointer naming the physical collections the API reads:
+# {"current": generation, "previous": [generation, ...]}, where a generation is
+# {"id", "collections": {logical name: physical name}, "org_snapshot", ...}.
+GENERATION_STATE = "generation"
+# Previous generations whose collections are kept for `rollback`.
+GENERATIONS_KEPT = 2
+BASE_GENERATION = "base"
+
+# What a staged run writes to shadow copies: everything the API serves that
+# the ingest rebuilds from Peakon (drivers_catalog is seeded, not fetched).
+STAGED_COLLECTIONS = (
+    "answers_export",
+    "employees",
+    "drivers",
+    "scores_contexts",
+    "scores_by_driver",
+    AGG_COLLECTION,
+)
+# Collections a staged run must have filled before it is published. The
+# aggregates are derived and legitimately empty when no answer has a manager.
+REQUIRED_COLLECTIONS = tuple(name for name in STAGED_COLLECTIONS if name != AGG_COLLECTION)
+# sync_state docs the staged stages advance; put back if the run is discarded,
+# so the next incremental run does not continue from data that was dropped.
+STAGED_STATE_KEYS = ("answers_export", "employees")
+
+
+def base_generation() -> Dict[str, Any]:
+    """The collections under their own names, as before any staged run."""
+    return {"id": BASE_GENERATION, "collections": {name: name for name in STAGED_COLLECTIONS}}
+
+
+def current_generation(pointer: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return (pointer or {}).get("current") or base_generation()
+
+
+def shadow_generation(run_id: str) -> Dict[str, Any]:
+    generation_id = run_id.replace("-", "")
+    return {
+        "id": generation_id,
+        "run_id": run_id,
+        "created_at": dt.datetime.utcnow(),
+        "collections": {name: f"{name}__{generation_id}" for name in STAGED_COLLECTIONS},
+    }
+
+
+def unreferenced(kept: Iterable[Dict[str, Any]], dropped: Iterable[Dict[str, Any]]) -> List[str]:
+    """Physical collections of `dropped` generations that no `kept` generation uses."""
+    in_use = {physical for generation in kept for physical in generation["collections"].values()}
+    return sorted({p for g in dropped for p in g["collections"].values()} - in_use)
+
+
+def published_pointer(
+    pointer: Optional[Dict[str, Any]], generation: Dict[str, Any], *, keep: int = GENERATIONS_KEPT
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Pointer with `generation` current, and the collections to drop once it is stored."""
+    history = [current_generation(pointer), *((pointer or {}).get("previous") or [])]
+    kept, dropped = history[: max(0, keep)], history[max(0, keep) :]
+    return {"current": generation, "previous": kept}, unreferenced([generation, *kept], dropped)
+
+
+def rolled_back_pointer(pointer: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Swap the current generation with the newest previous one; rolling back twice rolls forward."""
+    previous = list((pointer or {}).get("previous") or [])
+    if not previous:
+        raise ValueError("No previous generation to roll back to")
+    return {"current": previous[0], "previous": [current_generation(pointer), *previous[1:]]}
+
+
+async def stage_generation(storage: Any, run_id: str) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Point `storage` at fresh shadow collections for `run_id`.
+
+    Returns the generation and the sync_state docs to restore if it is discarded.
+    """
+    generation = shadow_generation(run_id)
+    saved = {key: await storage.get_state(key) for key in STAGED_STATE_KEYS}
+    await storage.drop_collections(list(generation["collections"].values()))
+    storage.use_generation(generation)
+    return generation, saved
+
+
+async def check_generation(storage: Any, generation: Dict[str, Any], required: Iterable[str] = REQUIRED_COLLECTIONS) -> None:
+    """Raise ValueError when any `required` collection of `generation` is empty."""
+    empty = [name for name in required if not await storage.has_documents(generation["collections"][name])]
+    if empty:
+        raise ValueError(f"Generation {generation['id']} has no documents in {empty}; not publishing it")
+
+
+async def publish_generation(
+    storage: Any,
+    generation: Dict[str, Any],
+    *,
+    keep: int = GENERATIONS_KEPT,
+    required: Iterable[str] = REQUIRED_COLLECTIONS,
+) -> Dict[str, Any]:
+    """Swap the API over to `generation` and drop collections only older generations used.
+
+    The swap is the single sync_state write of the pointer; the org snapshot
+    pointer follows when the generation carries a snapshot. Raises ValueError,
+    leaving the pointer alone, when any `required` collection of the
+    generation is empty.
+    """
+    await check_generation(storage, generation, required)
+    pointer, stale = published_pointer(await storage.get_state(GENERATION_STATE), generation, keep=keep)
+    await storage.set_state(GENERATION_STATE, {"current": pointer["current"], "previous": pointer["previous"]})
+    if generation.get("org_snapshot"):
+        await storage.set_state(ORG_SNAPSHOT_STATE, {"run_id": generation["org_snapshot"]})
+    await storage.drop_collections(stale)
+    logger.info("Published generation %s; dropped %s stale collections", generation["id"], len(stale))
+    return {"id": generation["id"], "dropped": stale}
+
+
+async def discard_generation(storage: Any, generation: Dict[str, Any], saved: Dict[str, Dict[str, Any]]) -> None:
+    """Drop the shadow collections of a failed staged run and put its sync_state back."""
+    await storage.drop_collections(list(generation["collections"].values()))
+    for key, before in saved.items():
+        after = await storage.get_state(key)
+        # set_state only `$set`s, so fields the run added are reset to None explicitly.
+        await storage.set_state(key, {k: before.get(k) for k in after if k not in ("_id", "updated_at")})
+    logger.warning("Discarded generation %s", generation["id"])
+
+
+class GenerationDb:
+    """A database whose staged collections resolve to one generation's physical collections.
+
+    `db.employees` and `db["employees"]` return the generation's collection;
+    every other name and attribute is the wrapped database's.
+    """
+
+    def __init__(self, db: Any, collections: Dict[str, str]):
+        self._db = db
+        self._collections = collections
+
+    def __getitem__(self, name: str) -> Any:
+        return self._db[self._collections.get(name, name)]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self._collections:
+            return self._db[self._collections[name]]
+        return getattr(self._db, name)
+
+
+def generation_db(db: Any, pointer: Optional[Dict[str, Any]]) -> GenerationDb:
+    """`db` as the API should read it: the current generation of the sync_state `pointer`."""
+    return GenerationDb(db, current_generation(pointer)["collections"])
@@ -1,16 +1,27 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+from tenacity import RetryCallState, retry, stop_after_attempt, wait_exponential, retry_if_exception
 
 from .auth import fetch_bearer_token
+from .http_cache import ConditionalResponse, ResponseCacheStore, body_hash, cache_key, empty_cache_stats
+from .json_stream import iter_json_page
+from .ratelimit import TokenBucket, parse_retry_after
+from .telemetry import record_request, record_retry
 
 logger = logging.getLogger(__name__)
 
 
+# Retry policy shared by get_json (tenacity) and stream_json_page: 5 attempts, exponential 1..30s.
+_MAX_ATTEMPTS = 5
+_MAX_BACKOFF_SECONDS = 30
+
+
 def _should_retry_exception(exc: BaseException) -> bool:  # type: ignore[name-defined]
     """Return True for retryable exceptions (network, timeouts, 5xx, 429)."""
     if isinstance(exc, (httpx.TransportError, httpx.ReadTimeout)):
@@ -21,30 +32,84 @@ def _should_retry_exception(exc: BaseException) -> bool:  # type: ignore[name-de
     return False
 
 
+def _retry_after_seconds(exc: BaseException | None) -> Optional[float]:
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response is not None and exc.response.status_code == 429:
+        return parse_retry_after(exc.response.headers.get("Retry-After"))
+    return None
+
+
+def _count_retry(retry_state: RetryCallState) -> None:
+    record_retry()
+
+
+_backoff = wait_exponential(multiplier=1, min=1, max=_MAX_BACKOFF_SECONDS)
+
+
+def _retry_wait(retry_state: RetryCallState) -> float:
+    """Exponential backoff, except after a 429 with Retry-After: the rate limiter is paused then."""
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    if _retry_after_seconds(exc) is not None:
+        return 0.0
+    return _backoff(retry_state)
+
+
 class PeakonClient:
-    def __init__(self, base_url: str, app_token: str | None, timeout_seconds: int = 60):
+    def __init__(
+        self,
+        base_url: str,
+        app_token: str | None,
+        timeout_seconds: int = 60,
+        *,
+        requests_per_second: float | None = None,
+        burst: int = 1,
+        response_cache: Optional[ResponseCacheStore] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
         self.base_url = base_url.rstrip("/")
         self.app_token = app_token
         self.timeout_seconds = timeout_seconds
         self._bearer_token: str | None = None
+        # Serialises (re-)authentication when many requests are in flight.
+        self._auth_lock = asyncio.Lock()
+        # Shared by every request from this client, including concurrent fan-out.
+        self.rate_limiter = TokenBucket(requests_per_second, burst)
+        # ETag/Last-Modified validators for get_json_conditional; None disables revalidation.
+        self.response_cache = response_cache
+        self.cache_stats = empty_cache_stats()
 
-        self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout_seconds))
+        # `transport` lets the cassette recorder/replayer sit under every request, including auth.
+        self._client = httpx.AsyncClient(timeout=httpx.Timeout(timeout_seconds), transport=transport)
 
     async def aclose(self) -> None:
         await self._client.aclose()
 
+    def reset_stats(self) -> None:
+        """Zero the cache and rate limit counters; a long-lived client reports them per run."""
+        self.cache_stats = empty_cache_stats()
+        self.rate_limiter.reset_stats()
+
     async def ensure_bearer(self) -> str:
         if self._bearer_token:
             return self._bearer_token
         if not self.app_token:
             raise RuntimeError("PEAKON_APP_TOKEN is required to authenticate.")
-        self._bearer_token = await fetch_bearer_token(self._client, self.base_url, self.app_token)
-        return self._bearer_token
+        async with self._auth_lock:
+            if not self._bearer_token:
+                self._bearer_token = await fetch_bearer_token(self._client, self.base_url, self.app_token)
+            return self._bearer_token
+
+    async def refresh_bearer(self, stale_token: str | None) -> str:
+        """Drop `stale_token` and re-authenticate, unless another request already did."""
+        async with self._auth_lock:
+            if self._bearer_token and self._bearer_token != stale_token:
+                return self._bearer_token
+            self._bearer_token = None
+        return await self.ensure_bearer()
 
     def set_bearer(self, token: str) -> None:
         self._bearer_token = token
 
-    async def _request(self, method: str, url: str, *, headers: Optional[Dict[str, str]] = None, **kwargs) -> httpx.Response:
+    async def _prepare(self, url: str, headers: Optional[Dict[str, str]]) -> Tuple[str, Dict[str, str]]:
         hdrs = dict(headers or {})
         if not url.startswith("http"):
             url = f"{self.base_url}/{url.lstrip('/')}"  # join
@@ -52,11 +117,33 @@ class PeakonClient:
         bearer = await self.ensure_bearer()
         hdrs["Authorization"] = f"Bearer {bearer}"
         hdrs.setdefault("Accept", "application/json")
+        return url, hdrs
 
-        return await self._client.request(method, url, headers=hdrs, **kwargs)
+    def _note_throttled(self, resp: httpx.Response) -> None:
+        if resp.status_code != 429:
+            return
+        seconds = parse_retry_after(resp.headers.get("Retry-After"))
+        if seconds is not None:
+            self.rate_limiter.pause(seconds)
 
-    @retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=30), retry=retry_if_exception(_should_retry_exception), reraise=True)  # type: ignore[arg-type]
-    async def get_json(self, url: str, *, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def _request(self, method: str, url: str, *, headers: Optional[Dict[str, str]] = None, **kwargs) -> httpx.Response:
+        url, hdrs = await self._prepare(url, headers)
+        await self.rate_limiter.acquire()
+        started = time.monotonic()
+        resp = await self._client.request(method, url, headers=hdrs, **kwargs)
+        record_request(resp.status_code, time.monotonic() - started, len(resp.content))
+        self._note_throttled(resp)
+        return resp
+
+    @retry(stop=stop_after_attempt(_MAX_ATTEMPTS), wait=_retry_wait, retry=retry_if_exception(_should_retry_exception), before_sleep=_count_retry, reraise=True)  # type: ignore[arg-type]
+    async def get_json(
+        self,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        response_stats: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        started = time.monotonic()
         resp = await self._request("GET", url, params=params)
         try:
             resp.raise_for_status()
@@ -64,16 +151,190 @@ class PeakonClient:
             # Let retry handle 429/5xx; but still include body in logs for debugging
             logger.warning("HTTP error %s for %s: %s", resp.status_code, resp.url, resp.text[:500])
             raise e
+        if response_stats is not None:
+            response_stats["seconds"] = time.monotonic() - started
+            response_stats["bytes"] = len(resp.content)
         return resp.json()
 
-    async def get_json_with_reauth_on_401(self, url: str, *, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def get_json_with_reauth_on_401(
+        self,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        response_stats: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """GET JSON, re-authenticating once on 401.
+
+        When `response_stats` is given it receives the `seconds` and `bytes` of
+        the successful response.
+        """
+        used_token = await self.ensure_bearer()
         try:
-            return await self.get_json(url, params=params)
+            return await self.get_json(url, params=params, response_stats=response_stats)
         except httpx.HTTPStatusError as e:
             if e.response is not None and e.response.status_code == 401:
                 logger.info("401 received; re-authenticating and retrying once...")
-                # refresh bearer and retry once
-                self._bearer_token = None
-                await self.ensure_bearer()
-                return await self.get_json(url, params=params)
+                record_retry()
+                # refresh bearer (once across concurrent callers) and retry once
+                await self.refresh_bearer(used_token)
+                return await self.get_json(url, params=params, response_stats=response_stats)
             raise
+
+    @retry(stop=stop_after_attempt(_MAX_ATTEMPTS), wait=_retry_wait, retry=retry_if_exception(_should_retry_exception), before_sleep=_count_retry, reraise=True)  # type: ignore[arg-type]
+    async def _get_revalidated(self, url: str, *, params: Optional[Dict[str, Any]], headers: Dict[str, str]) -> httpx.Response:
+        resp = await self._request("GET", url, params=params, headers=headers)
+        if resp.status_code == 304:
+            return resp
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            logger.warning("HTTP error %s for %s: %s", resp.status_code, resp.url, resp.text[:500])
+            raise e
+        return resp
+
+    async def get_json_conditional(
+        self, url: str, *, params: Optional[Dict[str, Any]] = None, scope: str, revalidate: bool = True
+    ) -> ConditionalResponse:
+        """GET JSON, revalidating against the ETag/Last-Modified cached for `scope` and this URL.
+
+        Returns a response with `payload=None` on 304, or when the body hash
+        matches the cached one (for servers without validators). With
+        `revalidate=False` the cached entry is ignored and the response is
+        always returned, but still remembered for the next run. Changed
+        responses are remembered only after `commit_cache`, so a failed write
+        downstream is retried in full next time. Same retry/401 policy as
+        `get_json_with_reauth_on_401`.
+        """
+        key = cache_key(url, params, scope=scope)
+        if self.response_cache is None:
+            return ConditionalResponse(key, await self.get_json_with_reauth_on_401(url, params=params))
+
+        self.cache_stats["requests"] += 1
+        cached = (await self.response_cache.get_http_cache(key) or {}) if revalidate else {}
+        headers: Dict[str, str] = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        used_token = await self.ensure_bearer()
+        try:
+            resp = await self._get_revalidated(url, params=params, headers=headers)
+        except httpx.HTTPStatusError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            logger.info("401 received; re-authenticating and retrying once...")
+            record_retry()
+            await self.refresh_bearer(used_token)
+            resp = await self._get_revalidated(url, params=params, headers=headers)
+
+        if resp.status_code == 304:
+            self.cache_stats["hits"] += 1
+            self.cache_stats["not_modified"] += 1
+            return ConditionalResponse(key, None, cached)
+
+        entry = {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "body_hash": body_hash(resp.content),
+        }
+        if cached and cached.get("body_hash") == entry["body_hash"]:
+            self.cache_stats["hits"] += 1
+            self.cache_stats["unchanged_body"] += 1
+            entry = {**cached, **entry}
+            await self.response_cache.set_http_cache(key, entry)
+            return ConditionalResponse(key, None, entry)
+
+        self.cache_stats["misses"] += 1
+        return ConditionalResponse(key, resp.json(), entry)
+
+    async def commit_cache(self, response: ConditionalResponse, *, extra: Optional[Dict[str, Any]] = None) -> None:
+        """Remember a changed response once its contents have been persisted."""
+        if self.response_cache is None or response.unchanged:
+            return
+        await self.response_cache.set_http_cache(response.key, {**response.entry, "extra": extra or {}})
+
+    async def stream_json_page(
+        self,
+        url: str,
+        *,
+        params: Optional[Dict[str, Any]] = None,
+        response_stats: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Tuple[Optional[str], Any]]:
+        """Stream one JSON page without loading the body; see `iter_json_page` for the events.
+
+        Follows the same policy as `get_json_with_reauth_on_401`: transient
+        errors and 429/5xx are retried with backoff and a 401 re-authenticates
+        once. A failure mid-body restarts the request and skips the items that
+        were already yielded, so callers never see an item twice.
+
+        `response_stats` receives the body `bytes` and the `seconds` spent on
+        the request, excluding time the caller held the generator suspended.
+        """
+        emitted_items = 0
+        emitted_keys: set[str] = set()
+        reauthed = False
+        attempt = 0
+        while True:
+            attempt += 1
+            used_token = await self.ensure_bearer()
+            seen_items = 0
+            body_bytes = 0
+            busy_seconds = 0.0
+            resumed = time.monotonic()
+
+            async def counted(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+                nonlocal body_bytes
+                async for chunk in chunks:
+                    body_bytes += len(chunk)
+                    yield chunk
+
+            try:
+                full_url, hdrs = await self._prepare(url, None)
+                await self.rate_limiter.acquire()
+                requested = time.monotonic()
+                async with self._client.stream("GET", full_url, headers=hdrs, params=params) as resp:
+                    self._note_throttled(resp)
+                    if resp.is_error:
+                        await resp.aread()
+                        record_request(resp.status_code, time.monotonic() - requested, len(resp.content))
+                        logger.warning("HTTP error %s for %s: %s", resp.status_code, resp.url, resp.text[:500])
+                        resp.raise_for_status()
+                    async for key, value in iter_json_page(counted(resp.aiter_bytes())):
+                        if key is None:
+                            seen_items += 1
+                            if seen_items <= emitted_items:
+                                continue
+                            emitted_items = seen_items
+                        elif key in emitted_keys:
+                            continue
+                        else:
+                            emitted_keys.add(key)
+                        busy_seconds += time.monotonic() - resumed
+                        yield key, value
+                        resumed = time.monotonic()
+                busy_seconds += time.monotonic() - resumed
+                record_request(resp.status_code, busy_seconds, body_bytes)
+                if response_stats is not None:
+                    response_stats["seconds"] = busy_seconds
+                    response_stats["bytes"] = body_bytes
+                return
+            except httpx.HTTPStatusError as e:
+                if e.response is not None and e.response.status_code == 401 and not reauthed:
+                    logger.info("401 received; re-authenticating and retrying once...")
+                    reauthed = True
+                    record_retry()
+                    await self.refresh_bearer(used_token)
+                    continue
+                if not _should_retry_exception(e) or attempt >= _MAX_ATTEMPTS:
+                    raise
+                record_retry()
+                if _retry_after_seconds(e) is not None:
+                    # The rate limiter is paused for Retry-After; no extra backoff.
+                    continue
+            except httpx.TransportError as e:
+                if attempt >= _MAX_ATTEMPTS:
+                    raise
+                logger.warning("Transport error streaming %s (attempt %s): %s", url, attempt, e)
+                record_retry()
+            await asyncio.sleep(min(_MAX_BACKOFF_SECONDS, 2 ** (attempt - 1)))
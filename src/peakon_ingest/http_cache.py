@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Protocol
+from urllib.parse import urlencode
+
+
+class ResponseCacheStore(Protocol):
+    """Where validators are persisted; the storage backends implement this (`http_cache`)."""
+
+    async def get_http_cache(self, key: str) -> Optional[Dict[str, Any]]: ...
+
+    async def set_http_cache(self, key: str, entry: Dict[str, Any]) -> None: ...
+
+
+def cache_key(url: str, params: Optional[Dict[str, Any]] = None, *, scope: str) -> str:
+    """Key of a cached response: the consumer `scope` (the collection it feeds) and the URL.
+
+    Two stages fetching the same URL each keep their own validators, so one
+    stage's write does not make the other see the response as unchanged.
+    """
+    if params:
+        url = f"{url}?{urlencode(sorted((k, str(v)) for k, v in params.items()))}"
+    return f"{scope}:{url}"
+
+
+def body_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def empty_cache_stats() -> Dict[str, int]:
+    return {"requests": 0, "hits": 0, "not_modified": 0, "unchanged_body": 0, "misses": 0}
+
+
+@dataclass
+class ConditionalResponse:
+    """Result of `PeakonClient.get_json_conditional`.
+
+    `payload` is None when the server answered 304 or returned a body whose
+    hash matches the cached one; `extra` then holds whatever the caller stored
+    with the previous response (e.g. derived ids). A changed response is only
+    remembered once the caller has persisted it and calls `commit_cache`.
+    """
+
+    key: str
+    payload: Optional[Dict[str, Any]]
+    entry: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def unchanged(self) -> bool:
+        return self.payload is None
+
+    @property
+    def extra(self) -> Dict[str, Any]:
+        return self.entry.get("extra") or {}
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+
+from .aggregates import AGG_COLLECTION
+from .normalize import employee_filter_query
+from .org_tree import ORG_SNAPSHOT_NODES, ORG_SNAPSHOT_STATE, ORG_SNAPSHOTS
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = Tuple[Tuple[str, int], ...]
+
+# Secondary indexes for the query shapes in peakon_api.main; created by
+# `ensure_indexes` on both storage backends. Compound keys put the equality
+# field first and the range field second.
+INDEXES: Tuple[Tuple[str, IndexKeys], ...] = (
+    # Employee filters (department / sub-department / manager) and hierarchy walks.
+    ("employees", (("norm.manager_id", ASCENDING),)),
+    ("employees", (("norm.department", ASCENDING), ("norm.sub_department", ASCENDING))),
+    ("employees", (("norm.sub_department", ASCENDING),)),
+    # Answers by employee (optionally within a date range), by question, and by date alone.
+    ("answers_export", (("norm.employee_id", ASCENDING), ("norm.answered_at", ASCENDING))),
+    ("answers_export", (("norm.question_id", ASCENDING), ("norm.answered_at", ASCENDING))),
+    ("answers_export", (("norm.answered_at", ASCENDING),)),
+    # Answers not yet folded into the manager x question buckets.
+    ("answers_export", (("agg_pending", ASCENDING),)),
+    # Manager question CSV from the daily buckets, for all managers or one.
+    (AGG_COLLECTION, (("day", ASCENDING),)),
+    (AGG_COLLECTION, (("manager_id", ASCENDING), ("day", ASCENDING))),
+    # Scores by employee scope, by period, and by driver within a period.
+    ("scores_contexts", (("norm.employee_id", ASCENDING),)),
+    ("scores_contexts", (("attributes.scores.time", ASCENDING),)),
+    ("scores_by_driver", (("driver_id", ASCENDING), ("attributes.scores.time", ASCENDING))),
+    ("scores_by_driver", (("norm.employee_id", ASCENDING),)),
+    # Nodes of one org snapshot in payload order, and snapshots by age for pruning.
+    (ORG_SNAPSHOT_NODES, (("run_id", ASCENDING), ("seq", ASCENDING))),
+    (ORG_SNAPSHOTS, (("created_at", DESCENDING),)),
+    # Latest run for --resume and the run history.
+    ("ingestion_runs", (("started_at", DESCENDING),)),
+)
+
+
+def _sample_norm(db: Any, collection: str, field: str) -> Dict[str, Any]:
+    doc = db[collection].find_one({f"norm.{field}": {"$ne": None}}, {"norm": 1, "driver_id": 1, "attributes.scores": 1})
+    return doc or {}
+
+
+def representative_queries(db: Any) -> List[Dict[str, Any]]:
+    """One query per API filter shape, with values sampled from the stored data where there is any."""
+    employee = _sample_norm(db, "employees", "manager_id")
+    emp_norm = employee.get("norm") or {}
+    answer = _sample_norm(db, "answers_export", "employee_id")
+    ans_norm = answer.get("norm") or {}
+    score = db.scores_by_driver.find_one({}, {"driver_id": 1, "attributes.scores": 1}) or {}
+    score_time = ((score.get("attributes") or {}).get("scores") or {}).get("time") or "1970-01-01"
+    snapshot_run_id = (db.sync_state.find_one({"_id": ORG_SNAPSHOT_STATE}) or {}).get("run_id") or ""
+
+    employee_id = ans_norm.get("employee_id", 0)
+    answered_at = ans_norm.get("answered_at") or "1970-01-01"
+    newest_first = [("_id", DESCENDING)]
+    return [
+        {
+            "endpoint": "/employees?department",
+            "collection": "employees",
+            "filter": employee_filter_query(emp_norm.get("department") or "-", None, None),
+        },
+        {
+            "endpoint": "/employees?sub_department",
+            "collection": "employees",
+            "filter": employee_filter_query(None, emp_norm.get("sub_department") or "-", None),
+        },
+        {
+            "endpoint": "/employees?manager_id",
+            "collection": "employees",
+            "filter": employee_filter_query(None, None, str(emp_norm.get("manager_id", 0))),
+        },
+        {
+            "endpoint": "/answers_export?employee_id",
+            "collection": "answers_export",
+            "filter": {"norm.employee_id": employee_id, "norm.answered_at": {"$gte": answered_at}},
+            "sort": newest_first,
+        },
+        {
+            "endpoint": "/answers_export?question_id",
+            "collection": "answers_export",
+            "filter": {"norm.question_id": ans_norm.get("question_id", 0)},
+            "sort": newest_first,
+        },
+        {
+            "endpoint": "/answers_export?answered_from",
+            "collection": "answers_export",
+            "filter": {"norm.answered_at": {"$gte": answered_at}},
+            "sort": newest_first,
+        },
+        {
+            # The `$match` of the `$facet` that counts a filter's total and unique employees.
+            "endpoint": "/answers_export (totals)",
+            "collection": "answers_export",
+            "filter": {"norm.answered_at": {"$gte": answered_at}},
+            "limit": 0,
+        },
+        {
+            "endpoint": "/answers_export/manager_question_csv",
+            "collection": AGG_COLLECTION,
+            "filter": {"day": {"$gte": answered_at[:10], "$lte": answered_at[:10]}},
+        },
+        {
+            "endpoint": "/answers_export/manager_question_csv?manager_id",
+            "collection": AGG_COLLECTION,
+            "filter": {"manager_id": str(emp_norm.get("manager_id", 0)), "day": {"$gte": answered_at[:10]}},
+        },
+        {
+            "endpoint": "engagement scores by employee",
+            "collection": "scores_contexts",
+            "filter": {"norm.employee_id": {"$in": [employee_id]}},
+        },
+        {
+            "endpoint": "/scores_contexts?time_from",
+            "collection": "scores_contexts",
+            "filter": {"attributes.scores.time": {"$gte": score_time}},
+            "sort": newest_first,
+        },
+        {
+            "endpoint": "/scores_by_driver?driver_id&time_from",
+            "collection": "scores_by_driver",
+            "filter": {"driver_id": score.get("driver_id") or "", "attributes.scores.time": {"$gte": score_time}},
+            "sort": newest_first,
+        },
+        {
+            "endpoint": "/org_map, /org_headcount (snapshot)",
+            "collection": ORG_SNAPSHOT_NODES,
+            "filter": {"run_id": snapshot_run_id},
+            "sort": [("seq", ASCENDING)],
+            "limit": 0,
+        },
+        {
+            "endpoint": "latest ingestion run",
+            "collection": "ingestion_runs",
+            "filter": {},
+            "sort": [("started_at", DESCENDING)],
+            "limit": 1,
+        },
+    ]
+
+
+def _plan_stages(plan: Any, stages: List[str], index_names: List[str]) -> None:
+    """Collect stage names and index names from a (classic or SBE) winning plan tree."""
+    if isinstance(plan, list):
+        for item in plan:
+            _plan_stages(item, stages, index_names)
+        return
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if plan.get("indexName"):
+        index_names.append(plan["indexName"])
+    for key, value in plan.items():
+        if isinstance(value, (dict, list)) and key not in ("keyPattern", "indexBounds", "filter", "multiKeyPaths"):
+            _plan_stages(value, stages, index_names)
+
+
+def summarize_explain(explain: Dict[str, Any]) -> Dict[str, Any]:
+    stages: List[str] = []
+    index_names: List[str] = []
+    _plan_stages((explain.get("queryPlanner") or {}).get("winningPlan") or {}, stages, index_names)
+    execution = explain.get("executionStats") or {}
+    returned = int(execution.get("nReturned") or 0)
+    docs_examined = int(execution.get("totalDocsExamined") or 0)
+    return {
+        "stages": stages,
+        "indexes": index_names,
+        "collscan": "COLLSCAN" in stages,
+        "returned": returned,
+        "docs_examined": docs_examined,
+        "keys_examined": int(execution.get("totalKeysExamined") or 0),
+        # Docs read per doc returned; 1.0 is ideal, large values mean the index does not cover the filter.
+        "examined_ratio": round(docs_examined / returned, 2) if returned else None,
+        "millis": execution.get("executionTimeMillis"),
+    }
+
+
+def _explain_command(query: Dict[str, Any], collection: str) -> Dict[str, Any]:
+    if "distinct" in query:
+        return {"distinct": collection, "key": query["distinct"], "query": query["filter"]}
+    command: Dict[str, Any] = {"find": collection, "filter": query["filter"], "limit": query.get("limit", 50)}
+    if query.get("sort"):
+        command["sort"] = dict(query["sort"])
+    return command
+
+
+def advise(db: Any, queries: Optional[Sequence[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Explain each representative query and report its plan, COLLSCANs and docs-examined ratio."""
+    report: List[Dict[str, Any]] = []
+    for query in queries if queries is not None else representative_queries(db):
+        row: Dict[str, Any] = {"endpoint": query["endpoint"], "collection": query["collection"]}
+        try:
+            # The physical name: `db` may map staged collections to a generation's copies.
+            command = _explain_command(query, db[query["collection"]].name)
+            explain = db.command("explain", command, verbosity="executionStats")
+        except Exception as e:
+            logger.warning("Explaining %s failed: %s", query["endpoint"], e)
+            row["error"] = str(e)
+        else:
+            row.update(summarize_explain(explain))
+        report.append(row)
+    return report
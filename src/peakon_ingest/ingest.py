@@ -1,16 +1,43 @@
 from __future__ import annotations
 
+import asyncio
+import copy
 import datetime as dt
+import hashlib
+import json
 import logging
+import time
 import uuid
-from typing import Any, Dict, List, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 import httpx
 
 from .http import PeakonClient
-from .pagination import paginate_json
-from .storage import MongoStorage
+from .http_cache import ConditionalResponse
+from .pagination import (
+    AdaptivePageSizer,
+    PageSizeBounds,
+    _get_next_link,
+    _split_url,
+    paginate_json,
+    paginate_json_chunks,
+)
+from .pipeline import bounded_gather, run_pipeline
+from .stages import Stage, run_stages, select_stages
+from .telemetry import Telemetry, current_telemetry
+from .aggregates import employee_manager
+from .async_storage import IngestStorage
 from .drivers_catalog import DRIVERS_CATALOG
+from .generations import (
+    GENERATION_STATE,
+    check_generation,
+    current_generation,
+    discard_generation,
+    publish_generation,
+    stage_generation,
+)
+from .normalize import NORM_VERSION, answer_norm, employee_norm, score_norm
+from .storage import BulkWriteFailed
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +53,26 @@ def _safe_int(value: Any) -> Any:
         return value
 
 
+def _content_hash(item: Dict[str, Any]) -> str:
+    """Stable hash of an upstream payload item, used to skip no-op upserts.
+
+    Salted with NORM_VERSION so a changed `norm` derivation rewrites every doc.
+    """
+    canonical = json.dumps([NORM_VERSION, item], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _parse_timestamp(value: Any) -> Optional[dt.datetime]:
+    """Parse an ISO timestamp from a payload; naive values are taken as UTC."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = dt.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=dt.timezone.utc)
+
+
 def _make_meta(endpoint: str, run_id: str, source_url: str) -> Dict[str, Any]:
     return {
         "endpoint": endpoint,
@@ -35,109 +82,400 @@ def _make_meta(endpoint: str, run_id: str, source_url: str) -> Dict[str, Any]:
     }
 
 
-async def seed_drivers_catalog(storage: MongoStorage) -> int:
-    count = 0
-    for numeric_id, driver, subdriver in DRIVERS_CATALOG:
-        doc = {"_id": numeric_id, "driver": driver, "subdriver": subdriver}
-        storage.upsert_doc("drivers_catalog", numeric_id, doc)
-        count += 1
-    return count
+def _page_source(
+    client: PeakonClient,
+    path: str,
+    params: Dict[str, Any],
+    stream_chunk_size: Optional[int],
+    page_sizer: Optional[AdaptivePageSizer] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    if stream_chunk_size:
+        return paginate_json_chunks(
+            client, path, first_params=params, chunk_size=stream_chunk_size, page_sizer=page_sizer
+        )
+    return paginate_json(client, path, first_params=params, page_sizer=page_sizer)
+
+
+def _page_sizer(
+    per_page: int, state: Dict[str, Any], page_size_bounds: Optional[PageSizeBounds]
+) -> Optional[AdaptivePageSizer]:
+    """Start adaptive paging from the size the previous run settled on, if any."""
+    if page_size_bounds is None:
+        return None
+    start = _safe_int(state.get("adaptive_per_page"))
+    return AdaptivePageSizer(start if isinstance(start, int) else per_page, page_size_bounds)
+
+
+class _PageCheckpointer:
+    """Persist a resume point for a paginated endpoint in `sync_state.<endpoint>.checkpoint`.
+
+    Fetched pages (or page slices) are numbered in order; writers may finish
+    them out of order. The checkpoint moves to a page's `links.next` only once
+    that page and everything before it has been written and the upserter
+    flushed, so resuming from it never skips an item.
+    """
+
+    def __init__(
+        self,
+        storage: IngestStorage,
+        writer: Any,
+        *,
+        endpoint: str,
+        run_id: str,
+        resumed: Optional[Dict[str, Any]] = None,
+    ):
+        resumed = resumed or {}
+        self.storage = storage
+        self.writer = writer
+        self.endpoint = endpoint
+        self.run_id = run_id
+        self.next_url: Optional[str] = resumed.get("next_url")
+        self.pages = int(resumed.get("pages") or 0)
+        self.items = int(resumed.get("items") or 0)
+        self.max_id: Optional[int] = resumed.get("max_id")
+        self._prefix_items = self.items
+        self._prefix_max_id = self.max_id
+        self._next_seq = 0
+        self._written: Dict[int, Tuple[int, Optional[int], Optional[str], bool]] = {}
+        self._lock = asyncio.Lock()
+
+    async def numbered(self, pages: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        seq = 0
+        async for page in pages:
+            yield seq, page
+            seq += 1
+
+    async def page_written(self, seq: int, page: Dict[str, Any], items: int, max_id: Optional[int]) -> None:
+        async with self._lock:
+            # Only the last slice of a streamed page carries `links`.
+            self._written[seq] = (items, max_id, _get_next_link(page), "links" in page)
+            advanced = False
+            while self._next_seq in self._written:
+                count, page_max, next_url, page_end = self._written.pop(self._next_seq)
+                self._next_seq += 1
+                self._prefix_items += count
+                if page_max is not None:
+                    self._prefix_max_id = max(self._prefix_max_id or page_max, page_max)
+                if page_end and next_url:
+                    self.pages += 1
+                    self.next_url = next_url
+                    self.items = self._prefix_items
+                    self.max_id = self._prefix_max_id
+                    advanced = True
+            if advanced:
+                await self.writer.flush()
+                if self.writer.failed_batches:
+                    # A failed batch may hold docs of any page up to here; the checkpoint stays
+                    # before it so `--resume` refetches them (the stage fails at its end).
+                    return
+                await self.storage.set_state(self.endpoint, {"checkpoint": self.as_state(done=False)})
+
+    def as_state(self, *, done: bool) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "done": done,
+            "next_url": None if done else self.next_url,
+            "pages": self.pages,
+            "items": self.items,
+            "max_id": self.max_id,
+            "updated_at": _utc_iso(),
+        }
+
+
+def _resume_checkpoint(state: Dict[str, Any], resume_run_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    checkpoint = state.get("checkpoint")
+    if resume_run_id and isinstance(checkpoint, dict) and checkpoint.get("run_id") == resume_run_id:
+        if checkpoint.get("done") or checkpoint.get("next_url"):
+            return checkpoint
+    return None
+
+
+async def seed_drivers_catalog(storage: IngestStorage) -> int:
+    docs = [
+        (numeric_id, {"_id": numeric_id, "driver": driver, "subdriver": subdriver})
+        for numeric_id, driver, subdriver in DRIVERS_CATALOG
+    ]
+    writer = storage.bulk_upserter("drivers_catalog")
+    await writer.add_many(docs)
+    await writer.close()
+    return len(docs)
 
 
 async def ingest_answers_export(
     client: PeakonClient,
-    storage: MongoStorage,
+    storage: IngestStorage,
     *,
     per_page: int,
     full_sync: bool,
     run_id: str,
-) -> Tuple[int, int]:
+    queue_size: int = 4,
+    writers: int = 1,
+    stream_chunk_size: Optional[int] = None,
+    page_size_bounds: Optional[PageSizeBounds] = None,
+    resume_run_id: Optional[str] = None,
+    answered_since: Optional[dt.datetime] = None,
+) -> Tuple[int, int, Dict[str, Any]]:
+    """Page through the answers export and upsert every answer.
+
+    With `answered_since`, only answers whose responseAnsweredAt is at or after
+    it are written. The export has no date filter, so this still pages from the
+    start (ignoring the incremental continuation, which is keyed on answer id)
+    and filters client-side; it saves the writes, not the download.
+    """
     endpoint = "answers_export"
     base_path = "/answers/export"
     params: Dict[str, Any] = {"per_page": per_page}
 
-    state = storage.get_state(endpoint)
-    if not full_sync and state.get("last_answer_id"):
+    state = await storage.get_state(endpoint)
+    path = base_path
+    checkpoint = _resume_checkpoint(state, resume_run_id)
+    if checkpoint and checkpoint.get("done"):
+        logger.info("answers_export already completed in run %s; skipping on resume", resume_run_id)
+        await storage.set_state(endpoint, {"checkpoint": {**checkpoint, "run_id": run_id}})
+        return int(checkpoint.get("items") or 0), (checkpoint.get("max_id") or -1), {"resumed": "done"}
+    if checkpoint:
+        logger.info("Resuming answers_export from page %s of run %s", checkpoint.get("pages"), resume_run_id)
+        path, params = _split_url(checkpoint["next_url"], client.base_url)
+    elif not full_sync and state.get("last_answer_id") and answered_since is None:
         # Best-effort incremental using continuation
         params["continuation"] = state["last_answer_id"]
-
-    upserted = 0
-    max_answer_id: int | None = None
-
-    async for page in paginate_json(client, base_path, first_params=params):
-        data = page.get("data") or []
-        for item in data:
+    page_sizer = _page_sizer(per_page, state, page_size_bounds)
+
+    upserted = int((checkpoint or {}).get("items") or 0)
+    max_answer_id: int | None = (checkpoint or {}).get("max_id")
+    writer = storage.bulk_upserter(endpoint)
+    checkpointer = _PageCheckpointer(storage, writer, endpoint=endpoint, run_id=run_id, resumed=checkpoint)
+
+    async def write_page(numbered: Tuple[int, Dict[str, Any]]) -> None:
+        nonlocal upserted, max_answer_id
+        seq, page = numbered
+        page_max: int | None = None
+        docs: List[Tuple[Any, Dict[str, Any]]] = []
+        for item in page.get("data") or []:
             attrs = item.get("attributes") or {}
             answer_id = _safe_int(attrs.get("answerId") or item.get("id"))
             if isinstance(answer_id, int):
-                max_answer_id = max(max_answer_id or answer_id, answer_id)
+                page_max = max(page_max or answer_id, answer_id)
+            if answered_since is not None:
+                answered_at = _parse_timestamp(attrs.get("responseAnsweredAt"))
+                if answered_at is None or answered_at < answered_since:
+                    continue
 
             doc = {
                 "_id": answer_id,
                 **item,
                 **_make_meta(endpoint, run_id, base_path),
+                "norm": answer_norm(item),
+                "content_hash": _content_hash(item),
+                # Only new or changed answers are written, so only they get folded into the aggregates.
+                "agg_pending": True,
             }
-            storage.upsert_doc(endpoint, answer_id, doc)
-            upserted += 1
+            docs.append((answer_id, doc))
+        await writer.add_many(docs)
+        upserted += len(docs)
+        if page_max is not None:
+            max_answer_id = max(max_answer_id or page_max, page_max)
+        await checkpointer.page_written(seq, page, len(docs), page_max)
+
+    try:
+        pipeline_stats = await run_pipeline(
+            checkpointer.numbered(_page_source(client, path, params, stream_chunk_size, page_sizer)),
+            write_page,
+            queue_size=queue_size,
+            writers=writers,
+        )
+    finally:
+        await writer.close()
+    if writer.failed_batches:
+        raise BulkWriteFailed(endpoint, writer.failed_batches)
 
+    checkpointer.items, checkpointer.max_id = upserted, max_answer_id
+    new_state: Dict[str, Any] = {"checkpoint": checkpointer.as_state(done=True)}
     if max_answer_id is not None:
-        storage.set_state(endpoint, {"last_answer_id": max_answer_id})
+        new_state["last_answer_id"] = max_answer_id
+    if page_sizer is not None:
+        new_state["adaptive_per_page"] = page_sizer.per_page
+    await storage.set_state(endpoint, new_state)
+
+    stats = pipeline_stats.as_dict()
+    if page_sizer is not None:
+        stats["page_size"] = page_sizer.as_dict()
+    return upserted, (max_answer_id or -1), stats
+
+
+async def _refold_moved_employees(storage: IngestStorage, docs: List[Tuple[Any, Dict[str, Any]]]) -> None:
+    """Before upserting `docs`, queue the answers of employees whose manager changed.
 
-    return upserted, (max_answer_id or -1)
+    Their contributions sit in the old manager's manager_question_agg buckets;
+    the next refresh moves them.
+    """
+    queued = await storage.refold_moved_employees({emp_id: employee_manager(doc) for emp_id, doc in docs})
+    if queued:
+        logger.info("Queued %s answers of employees with a new manager for the aggregates", queued)
 
 
 async def ingest_employees(
     client: PeakonClient,
-    storage: MongoStorage,
+    storage: IngestStorage,
     *,
     per_page: int,
     full_sync: bool,
     run_id: str,
-) -> Tuple[int, int]:
+    queue_size: int = 4,
+    writers: int = 1,
+    stream_chunk_size: Optional[int] = None,
+    page_size_bounds: Optional[PageSizeBounds] = None,
+    resume_run_id: Optional[str] = None,
+) -> Tuple[int, int, Dict[str, Any]]:
     endpoint = "employees"
     base_path = "/employees"
     params: Dict[str, Any] = {"per_page": per_page}
 
-    state = storage.get_state(endpoint)
-    if not full_sync and state.get("last_employee_id"):
+    state = await storage.get_state(endpoint)
+    path = base_path
+    checkpoint = _resume_checkpoint(state, resume_run_id)
+    if checkpoint and checkpoint.get("done"):
+        logger.info("employees already completed in run %s; skipping on resume", resume_run_id)
+        await storage.set_state(endpoint, {"checkpoint": {**checkpoint, "run_id": run_id}})
+        return int(checkpoint.get("items") or 0), (checkpoint.get("max_id") or -1), {"resumed": "done"}
+    if checkpoint:
+        logger.info("Resuming employees from page %s of run %s", checkpoint.get("pages"), resume_run_id)
+        path, params = _split_url(checkpoint["next_url"], client.base_url)
+    elif not full_sync and state.get("last_employee_id"):
         # Best-effort incremental (may not be supported; harmless if ignored)
         params["continuation"] = state["last_employee_id"]
-
-    upserted = 0
-    max_emp_id: int | None = None
-
-    async for page in paginate_json(client, base_path, first_params=params):
-        data = page.get("data") or []
-        for item in data:
+    page_sizer = _page_sizer(per_page, state, page_size_bounds)
+
+    upserted = int((checkpoint or {}).get("items") or 0)
+    max_emp_id: int | None = (checkpoint or {}).get("max_id")
+    writer = storage.bulk_upserter(endpoint)
+    checkpointer = _PageCheckpointer(storage, writer, endpoint=endpoint, run_id=run_id, resumed=checkpoint)
+
+    async def write_page(numbered: Tuple[int, Dict[str, Any]]) -> None:
+        nonlocal upserted, max_emp_id
+        seq, page = numbered
+        page_max: int | None = None
+        docs: List[Tuple[Any, Dict[str, Any]]] = []
+        for item in page.get("data") or []:
             emp_id = _safe_int(item.get("id"))
             if isinstance(emp_id, int):
-                max_emp_id = max(max_emp_id or emp_id, emp_id)
+                page_max = max(page_max or emp_id, emp_id)
 
             doc = {
                 "_id": emp_id,
                 **item,
                 **_make_meta(endpoint, run_id, base_path),
+                "norm": employee_norm(item),
+                "content_hash": _content_hash(item),
             }
-            storage.upsert_doc(endpoint, emp_id, doc)
-            upserted += 1
+            docs.append((emp_id, doc))
+        await _refold_moved_employees(storage, docs)
+        await writer.add_many(docs)
+        upserted += len(docs)
+        if page_max is not None:
+            max_emp_id = max(max_emp_id or page_max, page_max)
+        await checkpointer.page_written(seq, page, len(docs), page_max)
+
+    try:
+        pipeline_stats = await run_pipeline(
+            checkpointer.numbered(_page_source(client, path, params, stream_chunk_size, page_sizer)),
+            write_page,
+            queue_size=queue_size,
+            writers=writers,
+        )
+    finally:
+        await writer.close()
+    if writer.failed_batches:
+        raise BulkWriteFailed(endpoint, writer.failed_batches)
 
+    checkpointer.items, checkpointer.max_id = upserted, max_emp_id
+    new_state: Dict[str, Any] = {"checkpoint": checkpointer.as_state(done=True)}
     if max_emp_id is not None:
-        storage.set_state(endpoint, {"last_employee_id": max_emp_id})
+        new_state["last_employee_id"] = max_emp_id
+    if page_sizer is not None:
+        new_state["adaptive_per_page"] = page_sizer.per_page
+    await storage.set_state(endpoint, new_state)
 
-    return upserted, (max_emp_id or -1)
+    stats = pipeline_stats.as_dict()
+    if page_sizer is not None:
+        stats["page_size"] = page_sizer.as_dict()
+    return upserted, (max_emp_id or -1), stats
+
+
+async def ingest_employees_by_id(
+    client: PeakonClient,
+    storage: IngestStorage,
+    *,
+    employee_ids: Sequence[int],
+    run_id: str,
+    max_in_flight: int = 4,
+) -> int:
+    """Refresh the given employees via `/employees/<id>` instead of paging the whole list.
+
+    Ids Peakon does not know (404) are logged and skipped. The paging state of
+    `ingest_employees` in sync_state is left alone.
+    """
+    endpoint = "employees"
+    writer = storage.bulk_upserter(endpoint)
+
+    async def fetch_employee(employee_id: int) -> int:
+        path = f"/employees/{employee_id}"
+        try:
+            payload = await client.get_json_with_reauth_on_401(path)
+        except httpx.HTTPStatusError as e:
+            if e.response is not None and e.response.status_code == 404:
+                logger.warning("Employee %s not found; skipping", employee_id)
+                return 0
+            raise
+        item = payload.get("data") or {}
+        emp_id = _safe_int(item.get("id"))
+        doc = {
+            "_id": emp_id,
+            **item,
+            **_make_meta(endpoint, run_id, "/employees"),
+            "norm": employee_norm(item),
+            "content_hash": _content_hash(item),
+        }
+        await _refold_moved_employees(storage, [(emp_id, doc)])
+        await writer.add(emp_id, doc)
+        return 1
+
+    try:
+        counts = await bounded_gather(employee_ids, fetch_employee, max_in_flight=max_in_flight)
+    finally:
+        await writer.close()
+    return sum(counts)
+
+
+async def _revalidate(client: PeakonClient, storage: IngestStorage, endpoint: str, full_sync: bool) -> bool:
+    """Whether `endpoint` may skip responses the HTTP cache reports unchanged.
+
+    Not on a full sync, and not while its collection is empty (a new database
+    or a staged run's shadow collection), since skipped upserts would leave it empty.
+    """
+    if client.response_cache is None or full_sync:
+        return False
+    return await storage.has_documents(endpoint)
 
 
 async def ingest_drivers(
     client: PeakonClient,
-    storage: MongoStorage,
+    storage: IngestStorage,
     *,
     run_id: str,
+    full_sync: bool = False,
 ) -> List[str]:
     endpoint = "drivers"
     path = "/engagement/drivers"
-    payload = await client.get_json_with_reauth_on_401(path)
+    revalidate = await _revalidate(client, storage, endpoint, full_sync)
+    response = await client.get_json_conditional(path, scope=endpoint, revalidate=revalidate)
+    if response.unchanged:
+        logger.info("Drivers unchanged since last run; skipping upserts")
+        return list(response.extra.get("driver_ids") or [])
+    payload = response.payload or {}
 
     driver_ids: List[str] = []
+    docs: List[Tuple[Any, Dict[str, Any]]] = []
     for item in payload.get("data") or []:
         driver_id = item.get("id")
         if isinstance(driver_id, str):
@@ -147,9 +485,14 @@ async def ingest_drivers(
             "_id": driver_id,
             **item,
             **_make_meta(endpoint, run_id, path),
+            "content_hash": _content_hash(item),
         }
-        storage.upsert_doc(endpoint, driver_id, doc)
+        docs.append((driver_id, doc))
 
+    writer = storage.bulk_upserter(endpoint)
+    await writer.add_many(docs)
+    await writer.close()
+    await client.commit_cache(response, extra={"driver_ids": driver_ids})
     return driver_ids
 
 
@@ -160,50 +503,88 @@ def _score_doc_id(prefix: str, item: Dict[str, Any], time_key: str | None) -> st
     return f"{prefix}::{item_id}"
 
 
-async def ingest_contexts(
-    client: PeakonClient,
-    storage: MongoStorage,
+def _score_docs(
+    prefix: str,
+    payload: Dict[str, Any],
     *,
-    company_id: int,
-    engagement_group: str,
+    endpoint: str,
     run_id: str,
-) -> int:
-    endpoint = "scores_contexts"
-    path = f"/scores/contexts/company_{company_id}/group/{engagement_group}"
-    payload = await client.get_json_with_reauth_on_401(path)
-
-    upserted = 0
+    path: str,
+    extra: Optional[Dict[str, Any]] = None,
+) -> List[Tuple[Any, Dict[str, Any]]]:
+    docs: List[Tuple[Any, Dict[str, Any]]] = []
     for item in payload.get("data") or []:
         attrs = item.get("attributes") or {}
         scores = attrs.get("scores") or {}
         time_key = scores.get("time")
-        _id = _score_doc_id(engagement_group, item, time_key)
+        _id = _score_doc_id(prefix, item, time_key)
         doc = {
             "_id": _id,
+            **(extra or {}),
             **item,
             **_make_meta(endpoint, run_id, path),
+            "norm": score_norm(item, driver_id=(extra or {}).get("driver_id")),
+            "content_hash": _content_hash(item),
         }
-        storage.upsert_doc(endpoint, _id, doc)
-        upserted += 1
+        docs.append((_id, doc))
+    return docs
 
-    return upserted
+
+async def ingest_contexts(
+    client: PeakonClient,
+    storage: IngestStorage,
+    *,
+    company_id: int,
+    engagement_groups: Sequence[str],
+    run_id: str,
+    max_in_flight: int = 4,
+    full_sync: bool = False,
+) -> int:
+    endpoint = "scores_contexts"
+    revalidate = await _revalidate(client, storage, endpoint, full_sync)
+    writer = storage.bulk_upserter(endpoint)
+    changed: List[ConditionalResponse] = []
+
+    async def fetch_group(engagement_group: str) -> int:
+        path = f"/scores/contexts/company_{company_id}/group/{engagement_group}"
+        response = await client.get_json_conditional(path, scope=endpoint, revalidate=revalidate)
+        if response.unchanged:
+            return 0
+        docs = _score_docs(engagement_group, response.payload or {}, endpoint=endpoint, run_id=run_id, path=path)
+        await writer.add_many(docs)
+        changed.append(response)
+        return len(docs)
+
+    try:
+        counts = await bounded_gather(engagement_groups, fetch_group, max_in_flight=max_in_flight)
+    finally:
+        await writer.close()
+
+    # Only remember responses once their docs are flushed.
+    for response in changed:
+        await client.commit_cache(response)
+    return sum(counts)
 
 
 async def ingest_scores_by_driver(
     client: PeakonClient,
-    storage: MongoStorage,
+    storage: IngestStorage,
     *,
     company_id: int,
     driver_ids: List[str],
     run_id: str,
+    max_in_flight: int = 4,
+    full_sync: bool = False,
 ) -> int:
     endpoint = "scores_by_driver"
-    upserted = 0
+    revalidate = await _revalidate(client, storage, endpoint, full_sync)
+    writer = storage.bulk_upserter(endpoint)
+    changed: List[ConditionalResponse] = []
 
-    for driver_id in driver_ids:
+    async def fetch_driver(driver_id: str) -> int:
         path = f"/scores/contexts/company_{company_id}/group/{driver_id}"
         try:
-            payload = await client.get_json_with_reauth_on_401(path)
+            response = await client.get_json_conditional(path, scope=endpoint, revalidate=revalidate)
         except httpx.HTTPStatusError as e:
             if e.response is not None and e.response.status_code == 422:
                 logger.warning(
@@ -211,82 +592,318 @@ async def ingest_scores_by_driver(
                     driver_id,
                     e.response.text[:500],
                 )
-                continue
+                return 0
             raise
+        if response.unchanged:
+            return 0
+
+        docs = _score_docs(
+            driver_id,
+            response.payload or {},
+            endpoint=endpoint,
+            run_id=run_id,
+            path=path,
+            extra={"driver_id": driver_id},
+        )
+        await writer.add_many(docs)
+        changed.append(response)
+        return len(docs)
 
-        for item in payload.get("data") or []:
-            attrs = item.get("attributes") or {}
-            scores = attrs.get("scores") or {}
-            time_key = scores.get("time")
-            _id = _score_doc_id(driver_id, item, time_key)
-            doc = {
-                "_id": _id,
-                "driver_id": driver_id,
-                **item,
-                **_make_meta(endpoint, run_id, path),
-            }
-            storage.upsert_doc(endpoint, _id, doc)
-            upserted += 1
+    try:
+        counts = await bounded_gather(driver_ids, fetch_driver, max_in_flight=max_in_flight)
+    finally:
+        await writer.close()
+
+    for response in changed:
+        await client.commit_cache(response)
+    return sum(counts)
+
+
+# Names of the stages declared by `build_ingest_stages`, for --only/--skip.
+STAGE_NAMES = (
+    "drivers_catalog",
+    "answers_export",
+    "employees",
+    "drivers",
+    "scores_contexts",
+    "scores_by_driver",
+    "manager_question_agg",
+    "org_snapshot",
+)
 
-    return upserted
+# Stages derived from what is already stored; targeted refreshes run them after
+# the stage they narrow (see `select_stages(then=...)`).
+DERIVED_STAGES = ("manager_question_agg", "org_snapshot")
+
+
+def build_ingest_stages(
+    client: PeakonClient,
+    storage: IngestStorage,
+    *,
+    run_id: str,
+    company_id: int,
+    engagement_groups: Sequence[str],
+    per_page: int,
+    full_sync: bool,
+    queue_size: int = 4,
+    writers: int = 1,
+    max_in_flight: int = 4,
+    stream_chunk_size: Optional[int] = None,
+    page_size_bounds: Optional[PageSizeBounds] = None,
+    resume_run_id: Optional[str] = None,
+    employee_ids: Optional[Sequence[int]] = None,
+    answered_since: Optional[dt.datetime] = None,
+    staged: bool = False,
+) -> List[Stage]:
+    """Declare the ingest stages and their dependencies for `run_stages`.
+
+    Each stage returns a dict of flat counters that is merged into the run
+    stats. scores_by_driver depends on drivers (the driver ids), and
+    manager_question_agg on answers and employees (it folds the answers
+    written by this or an earlier run into the manager x question buckets),
+    and org_snapshot on employees (the org tree the API serves).
+    `employee_ids` turns the employees stage into a by-id refresh and
+    `answered_since` limits the answers written by answers_export. A `staged`
+    run leaves the org snapshot pointer to the generation publish.
+    """
+
+    async def drivers_catalog(_: Dict[str, Any]) -> Dict[str, Any]:
+        return {"drivers_catalog_seeded": await seed_drivers_catalog(storage)}
+
+    async def answers(_: Dict[str, Any]) -> Dict[str, Any]:
+        count, last_answer_id, pipeline = await ingest_answers_export(
+            client,
+            storage,
+            per_page=per_page,
+            full_sync=full_sync,
+            run_id=run_id,
+            queue_size=queue_size,
+            writers=writers,
+            stream_chunk_size=stream_chunk_size,
+            page_size_bounds=page_size_bounds,
+            resume_run_id=resume_run_id,
+            answered_since=answered_since,
+        )
+        return {
+            "answers_upserted": count,
+            "answers_last_answer_id": last_answer_id,
+            "answers_pipeline": pipeline,
+        }
+
+    async def employees(_: Dict[str, Any]) -> Dict[str, Any]:
+        if employee_ids:
+            count = await ingest_employees_by_id(
+                client, storage, employee_ids=employee_ids, run_id=run_id, max_in_flight=max_in_flight
+            )
+            return {"employees_upserted": count}
+        count, last_emp_id, pipeline = await ingest_employees(
+            client,
+            storage,
+            per_page=per_page,
+            full_sync=full_sync,
+            run_id=run_id,
+            queue_size=queue_size,
+            writers=writers,
+            stream_chunk_size=stream_chunk_size,
+            page_size_bounds=page_size_bounds,
+            resume_run_id=resume_run_id,
+        )
+        return {
+            "employees_upserted": count,
+            "employees_last_employee_id": last_emp_id,
+            "employees_pipeline": pipeline,
+        }
+
+    async def drivers(_: Dict[str, Any]) -> Dict[str, Any]:
+        driver_ids = await ingest_drivers(client, storage, run_id=run_id, full_sync=full_sync)
+        return {"drivers_count": len(driver_ids), "driver_ids": driver_ids}
+
+    async def contexts(_: Dict[str, Any]) -> Dict[str, Any]:
+        count = await ingest_contexts(
+            client,
+            storage,
+            company_id=company_id,
+            engagement_groups=engagement_groups,
+            run_id=run_id,
+            max_in_flight=max_in_flight,
+            full_sync=full_sync,
+        )
+        return {"contexts_upserted": count}
+
+    async def scores_by_driver(deps: Dict[str, Any]) -> Dict[str, Any]:
+        count = await ingest_scores_by_driver(
+            client,
+            storage,
+            company_id=company_id,
+            driver_ids=deps["drivers"]["driver_ids"],
+            run_id=run_id,
+            max_in_flight=max_in_flight,
+            full_sync=full_sync,
+        )
+        return {"scores_by_driver_upserted": count}
+
+    async def manager_question_agg(_: Dict[str, Any]) -> Dict[str, Any]:
+        stats = await storage.refresh_manager_question_agg()
+        return {f"manager_question_agg_{k}": v for k, v in stats.items()}
+
+    async def org_snapshot(_: Dict[str, Any]) -> Dict[str, Any]:
+        stats = await storage.write_org_snapshot(run_id, publish=not staged)
+        return {f"org_snapshot_{k}": v for k, v in stats.items()}
+
+    return [
+        Stage("drivers_catalog", drivers_catalog),
+        Stage("answers_export", answers),
+        Stage("employees", employees),
+        Stage("drivers", drivers),
+        Stage("scores_contexts", contexts),
+        Stage("scores_by_driver", scores_by_driver, depends_on=("drivers",)),
+        Stage("manager_question_agg", manager_question_agg, depends_on=("answers_export", "employees")),
+        Stage("org_snapshot", org_snapshot, depends_on=("employees",)),
+    ]
 
 
 async def ingest_all(
     client: PeakonClient,
-    storage: MongoStorage,
+    storage: IngestStorage,
     *,
     company_id: int,
-    engagement_group: str,
+    engagement_groups: Sequence[str],
     per_page: int,
     full_sync: bool,
+    queue_size: int = 4,
+    writers: int = 1,
+    max_in_flight: int = 4,
+    max_parallel_stages: int = 3,
+    stream_chunk_size: Optional[int] = None,
+    page_size_bounds: Optional[PageSizeBounds] = None,
+    resume_run_id: Optional[str] = None,
+    metrics: Optional[Telemetry] = None,
+    only: Optional[Sequence[str]] = None,
+    skip: Optional[Sequence[str]] = None,
+    then: Optional[Sequence[str]] = None,
+    employee_ids: Optional[Sequence[int]] = None,
+    answered_since: Optional[dt.datetime] = None,
+    staged: bool = False,
 ) -> Dict[str, Any]:
+    """Run the ingest stages and record the run in `ingestion_runs`.
+
+    With `resume_run_id`, answers/employees continue from the checkpoints that
+    failed run left in `sync_state` (or are skipped if they had completed);
+    the other stages are cheap and simply run again. `only`/`skip` select a
+    subset of stages (`then` adds stages run after them, see `select_stages`) and `employee_ids`/`answered_since`
+    narrow the employees/answers stages; partial runs record their selection
+    under `stats.selection`. Per-stage telemetry is
+    stored under `stats.telemetry` and also fed to `metrics` when given (the
+    daemon's process-wide registry behind its Prometheus endpoint).
+
+    A `staged` run is a full sync of every stage into shadow collections that
+    the API only reads once the run succeeded and its generation is published
+    (see generations.py); a failed staged run drops them again.
+    """
+    if staged and (resume_run_id or only or skip or employee_ids or answered_since):
+        raise ValueError("A staged ingest rebuilds every collection; it cannot be resumed or narrowed")
     run_id = str(uuid.uuid4())
-    storage.record_run_start(run_id)
+    await storage.record_run_start(run_id)
+    # The daemon reuses one client and storage: count this run's writes and requests only.
+    storage.write_stats.clear()
+    client.reset_stats()
 
     stats: Dict[str, Any] = {"run_id": run_id}
-
+    if resume_run_id:
+        stats["resumed_from"] = resume_run_id
+    selection = {
+        "only": list(only or []),
+        "skip": list(skip or []),
+        "then": list(then or []),
+        "employee_ids": list(employee_ids or []),
+        "answered_since": answered_since.isoformat() if answered_since else None,
+    }
+    if any(selection.values()):
+        stats["selection"] = selection
+
+    telemetry = Telemetry(parent=metrics)
+    telemetry_token = current_telemetry.set(telemetry)
+    started = time.monotonic()
+    generation: Optional[Dict[str, Any]] = None
+    saved_state: Dict[str, Dict[str, Any]] = {}
     try:
         # Token cache bootstrap (optional)
         cache_id = f"{client.base_url}::application"
-        cached = storage.get_cached_bearer(cache_id)
+        cached = await storage.get_cached_bearer(cache_id)
         if cached:
             client.set_bearer(cached)
         else:
             tok = await client.ensure_bearer()
-            storage.set_cached_bearer(cache_id, tok)
-
-        storage.ensure_indexes()
-
-        stats["drivers_catalog_seeded"] = await seed_drivers_catalog(storage)
+            await storage.set_cached_bearer(cache_id, tok)
 
-        ans_count, last_answer_id = await ingest_answers_export(
-            client, storage, per_page=per_page, full_sync=full_sync, run_id=run_id
-        )
-        stats["answers_upserted"] = ans_count
-        stats["answers_last_answer_id"] = last_answer_id
-
-        emp_count, last_emp_id = await ingest_employees(
-            client, storage, per_page=per_page, full_sync=full_sync, run_id=run_id
-        )
-        stats["employees_upserted"] = emp_count
-        stats["employees_last_employee_id"] = last_emp_id
-
-        driver_ids = await ingest_drivers(client, storage, run_id=run_id)
-        stats["drivers_count"] = len(driver_ids)
-
-        stats["contexts_upserted"] = await ingest_contexts(
-            client, storage, company_id=company_id, engagement_group=engagement_group, run_id=run_id
-        )
-
-        stats["scores_by_driver_upserted"] = await ingest_scores_by_driver(
-            client, storage, company_id=company_id, driver_ids=driver_ids, run_id=run_id
+        if staged:
+            generation, saved_state = await stage_generation(storage, run_id)
+            full_sync = True
+        else:
+            storage.use_generation(current_generation(await storage.get_state(GENERATION_STATE)))
+        await storage.ensure_indexes()
+
+        stages = build_ingest_stages(
+            client,
+            storage,
+            run_id=run_id,
+            company_id=company_id,
+            engagement_groups=engagement_groups,
+            per_page=per_page,
+            full_sync=full_sync,
+            queue_size=queue_size,
+            writers=writers,
+            max_in_flight=max_in_flight,
+            stream_chunk_size=stream_chunk_size,
+            page_size_bounds=page_size_bounds,
+            resume_run_id=resume_run_id,
+            employee_ids=employee_ids,
+            answered_since=answered_since,
+            staged=staged,
         )
-
-        storage.record_run_finish(run_id, "success", stats)
+        stages = select_stages(stages, only=only, skip=skip, then=then)
+        records = await run_stages(stages, max_concurrency=max_parallel_stages)
+        stats["stages"] = records
+        for record in records.values():
+            result = record.get("result")
+            if isinstance(result, dict):
+                stats.update({k: v for k, v in result.items() if k != "driver_ids"})
+
+        failed = [name for name, record in records.items() if record["status"] == "failure"]
+        if failed:
+            errors = "; ".join(f"{name}: {records[name].get('error')}" for name in failed)
+            raise RuntimeError(f"Ingest stages failed: {errors}")
+
+        if generation is not None:
+            published = {**generation, "org_snapshot": run_id}
+            # An empty shadow collection fails (and discards) the run before the pointer can move.
+            await check_generation(storage, published)
+            # Past this point the pointer may have moved: never discard what is being published.
+            generation = None
+            stats["generation"] = await publish_generation(storage, published)
+
+        stats["writes"] = copy.deepcopy(storage.write_stats)
+        stats["rate_limit"] = client.rate_limiter.snapshot()
+        stats["http_cache"] = dict(client.cache_stats)
+        stats["telemetry"] = telemetry.snapshot()
+        telemetry.finish_run(run_id, "success", round(time.monotonic() - started, 3))
+        await storage.record_run_finish(run_id, "success", stats)
         return stats
 
     except Exception as e:
         stats["error"] = str(e)
+        stats["writes"] = copy.deepcopy(storage.write_stats)
+        stats["rate_limit"] = client.rate_limiter.snapshot()
+        stats["http_cache"] = dict(client.cache_stats)
+        stats["telemetry"] = telemetry.snapshot()
+        telemetry.finish_run(run_id, "failure", round(time.monotonic() - started, 3))
         logger.exception("Ingestion failed: %s", e)
-        storage.record_run_finish(run_id, "failure", stats)
+        if generation is not None:
+            try:
+                await discard_generation(storage, generation, saved_state)
+            except Exception:
+                logger.exception("Discarding generation %s failed", generation["id"])
+        await storage.record_run_finish(run_id, "failure", stats)
         raise
+    finally:
+        current_telemetry.reset(telemetry_token)
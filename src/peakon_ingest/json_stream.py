@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, AsyncIterator, Optional, Tuple
+
+_WHITESPACE = " \t\n\r"
+# Drop consumed text once this much has accumulated at the front of the buffer.
+_COMPACT_AT = 64 * 1024
+
+
+class _Buffer:
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self._chunks = chunks.__aiter__()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    async def more(self) -> bool:
+        if self.eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self.eof = True
+            self.text += self._decoder.decode(b"", final=True)
+            return False
+        if self.pos >= _COMPACT_AT:
+            self.text = self.text[self.pos :]
+            self.pos = 0
+        self.text += self._decoder.decode(chunk)
+        return True
+
+    async def peek(self) -> str:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not await self.more():
+                raise ValueError("Unexpected end of JSON stream")
+
+    async def expect(self, char: str) -> None:
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}, found {found!r}")
+        self.pos += 1
+
+    async def value(self, decoder: json.JSONDecoder) -> Any:
+        await self.peek()
+        while True:
+            pending = len(self.text) - self.pos
+            try:
+                obj, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                obj, end = None, -1
+            # A value that ends exactly at the buffer edge may be truncated (e.g. a number).
+            if end != -1 and (end < len(self.text) or self.eof):
+                self.pos = end
+                return obj
+            # Read until the unparsed tail has at least doubled so large values
+            # are not re-decoded once per network chunk.
+            grew = False
+            while len(self.text) - self.pos < max(2 * pending, pending + 1):
+                if not await self.more():
+                    break
+                grew = True
+            if not grew:
+                if end != -1:
+                    self.pos = end
+                    return obj
+                raise ValueError(f"Invalid JSON value at offset {self.pos}")
+
+
+async def iter_json_page(
+    chunks: AsyncIterator[bytes],
+    *,
+    items_key: str = "data",
+) -> AsyncIterator[Tuple[Optional[str], Any]]:
+    """Incrementally parse a JSON:API page object from raw byte chunks.
+
+    Yields `(None, item)` for each element of the top-level `items_key` array
+    as soon as it is complete, and `(key, value)` for every other top-level
+    member (e.g. `links`, `meta`). Only one item is materialised at a time.
+    """
+    buf = _Buffer(chunks)
+    decoder = json.JSONDecoder()
+
+    await buf.expect("{")
+    first = True
+    while True:
+        char = await buf.peek()
+        if char == "}":
+            buf.pos += 1
+            return
+        if not first:
+            await buf.expect(",")
+        first = False
+
+        key = await buf.value(decoder)
+        if not isinstance(key, str):
+            raise ValueError(f"Expected an object key at offset {buf.pos}")
+        await buf.expect(":")
+
+        if key == items_key and await buf.peek() == "[":
+            buf.pos += 1
+            first_item = True
+            while True:
+                if await buf.peek() == "]":
+                    buf.pos += 1
+                    break
+                if not first_item:
+                    await buf.expect(",")
+                first_item = False
+                yield None, await buf.value(decoder)
+        else:
+            yield key, await buf.value(decoder)
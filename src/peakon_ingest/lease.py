@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Optional, Protocol, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Name of the lock document that serialises ingest runs across replicas.
+INGEST_LOCK = "ingest"
+
+
+class LeaseStore(Protocol):
+    """Lock documents in the `locks` collection; the storage backends implement this."""
+
+    async def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool: ...
+
+    async def renew_lock(self, name: str, owner: str, ttl_seconds: float) -> bool: ...
+
+    async def release_lock(self, name: str, owner: str) -> None: ...
+
+
+class LeaseLost(RuntimeError):
+    """The lease expired or was taken over while the guarded work was running."""
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseLock:
+    """A lease on one lock document, renewed while the guarded work runs.
+
+    The lease expires `ttl_seconds` after the last renewal, so a crashed
+    holder blocks others for at most that long. Expiry is compared with the
+    holders' clocks, which should be roughly in sync (NTP).
+    """
+
+    def __init__(
+        self,
+        store: LeaseStore,
+        name: str = INGEST_LOCK,
+        *,
+        owner: Optional[str] = None,
+        ttl_seconds: float = 300.0,
+        renew_every: Optional[float] = None,
+    ):
+        self.store = store
+        self.name = name
+        self.owner = owner or default_owner()
+        self.ttl_seconds = ttl_seconds
+        self.renew_every = renew_every if renew_every is not None else ttl_seconds / 3
+        self.held = False
+
+    async def acquire(self) -> bool:
+        self.held = await self.store.acquire_lock(self.name, self.owner, self.ttl_seconds)
+        return self.held
+
+    async def release(self) -> None:
+        if self.held:
+            self.held = False
+            await self.store.release_lock(self.name, self.owner)
+
+    async def _renew_until_lost(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_every)
+            try:
+                renewed = await self.store.renew_lock(self.name, self.owner, self.ttl_seconds)
+            except Exception as e:
+                # A transient Mongo error is not a lost lease; the next renewal may succeed before expiry.
+                logger.warning("Renewing lock %r failed: %s", self.name, e)
+                continue
+            if not renewed:
+                self.held = False
+                return
+
+    async def hold(self, work: Awaitable[T]) -> T:
+        """Await `work` while renewing the lease; cancel it and raise `LeaseLost` if the lease is lost."""
+        work_task: asyncio.Future[Any] = asyncio.ensure_future(work)
+        renew_task = asyncio.create_task(self._renew_until_lost())
+        try:
+            await asyncio.wait({work_task, renew_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not work_task.done():
+                logger.error("Lost lock %r (owner %s); cancelling the run", self.name, self.owner)
+                work_task.cancel()
+                await asyncio.gather(work_task, return_exceptions=True)
+                raise LeaseLost(f"Lease on {self.name!r} was lost")
+            return work_task.result()
+        finally:
+            renew_task.cancel()
+            work_task.cancel()
+            await asyncio.gather(renew_task, return_exceptions=True)
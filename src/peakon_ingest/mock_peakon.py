@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import datetime as dt
+import json
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+
+from .drivers_catalog import DRIVERS_CATALOG
+
+_DEPARTMENTS = ("Engineering", "Sales", "Finance", "Support", "Marketing", "People")
+_CONTEXTS_PATH = re.compile(r"^/scores/contexts/company_(\d+)/group/([^/]+)$")
+_EMPLOYEE_PATH = re.compile(r"^/employees/(\d+)$")
+
+
+@dataclass
+class FaultPlan:
+    """Latency and errors injected by `MockPeakonTransport`; rates are per request (0..1)."""
+
+    latency_seconds: float = 0.0
+    jitter_seconds: float = 0.0
+    rate_429: float = 0.0
+    retry_after_seconds: float = 0.0
+    rate_5xx: float = 0.0
+    # Expire each bearer token after this many API requests (0 = never), forcing a 401 + re-auth.
+    token_ttl_requests: int = 0
+    seed: int = 0
+
+
+@dataclass
+class SyntheticTenant:
+    company_id: int
+    employees: List[Dict[str, Any]]
+    answers: List[Dict[str, Any]]
+    drivers: List[Dict[str, Any]]
+    engagement_groups: List[str]
+    contexts_per_group: int = 10
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def generate_tenant(
+    *,
+    employees: int = 1000,
+    answers: int = 10000,
+    span: int = 8,
+    company_id: int = 1,
+    engagement_groups: Sequence[str] = ("engagement",),
+    seed: int = 0,
+) -> SyntheticTenant:
+    """Build a deterministic tenant shaped like the Peakon payloads the ingestor stores.
+
+    Employees form a tree in which every manager has up to `span` reports
+    (employee 1 is the root). Answers are spread over random employees and the
+    drivers of `DRIVERS_CATALOG`.
+    """
+    rng = random.Random(seed)
+    span = max(1, span)
+    start = dt.date(2020, 1, 1)
+
+    employee_docs: List[Dict[str, Any]] = []
+    for n in range(1, employees + 1):
+        doc: Dict[str, Any] = {
+            "type": "employees",
+            "id": str(n),
+            "attributes": {
+                "firstName": f"First{n}",
+                "lastName": f"Last{n}",
+                "accountEmail": f"employee{n}@example.com",
+                "Department": _DEPARTMENTS[n % len(_DEPARTMENTS)],
+                "Start date": (start + dt.timedelta(days=rng.randrange(0, 2000))).isoformat(),
+            },
+            "relationships": {},
+        }
+        if n > 1:
+            doc["relationships"]["Manager"] = {"data": {"type": "employees", "id": str((n - 2) // span + 1)}}
+        employee_docs.append(doc)
+
+    driver_names = list(dict.fromkeys(driver for _, driver, _ in DRIVERS_CATALOG))
+    drivers = [{"type": "drivers", "id": _slug(name), "attributes": {"name": name}} for name in driver_names]
+    questions = [(numeric_id, _slug(driver), driver) for numeric_id, driver, _ in DRIVERS_CATALOG]
+
+    answer_docs: List[Dict[str, Any]] = []
+    answered = dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+    for n in range(1, answers + 1):
+        question_id, driver_id, driver = questions[rng.randrange(len(questions))]
+        answer_docs.append(
+            {
+                "type": "answers",
+                "id": str(n),
+                "attributes": {
+                    "answerId": n,
+                    "employeeId": rng.randint(1, max(1, employees)),
+                    "questionId": question_id,
+                    "driverId": driver_id,
+                    "questionText": f"How do you feel about {driver.lower()}?",
+                    "answerScore": rng.randint(0, 10),
+                    "answerComment": "Synthetic comment" if rng.random() < 0.1 else None,
+                    "responseAnsweredAt": (answered + dt.timedelta(minutes=n)).isoformat(),
+                },
+            }
+        )
+
+    return SyntheticTenant(
+        company_id=company_id,
+        employees=employee_docs,
+        answers=answer_docs,
+        drivers=drivers,
+        engagement_groups=list(engagement_groups),
+    )
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    pages: int = 0
+    items: int = 0
+    auth: int = 0
+    injected_429: int = 0
+    injected_5xx: int = 0
+    injected_401: int = 0
+    by_path: Dict[str, int] = field(default_factory=dict)
+
+
+class MockPeakonTransport(httpx.AsyncBaseTransport):
+    """An in-process fake of the Peakon endpoints used by `ingest_all`.
+
+    Implements `/auth/application`, `/answers/export` and `/employees`
+    (continuation paging with `links.next`), `/employees/<id>`, `/engagement/drivers` and
+    `/scores/contexts/company_<id>/group/<group>` over a `SyntheticTenant`,
+    with the latency and faults of a `FaultPlan`.
+    """
+
+    def __init__(self, tenant: SyntheticTenant, faults: Optional[FaultPlan] = None, *, base_url: str):
+        self.tenant = tenant
+        self.faults = faults or FaultPlan()
+        self.base_url = base_url.rstrip("/")
+        self._base_path = urlsplit(self.base_url).path.rstrip("/")
+        self._rng = random.Random(self.faults.seed)
+        self._token: Optional[str] = None
+        self._token_uses = 0
+        self.stats = MockStats()
+        # Paged collections and their (ascending) continuation keys.
+        self._paged = {
+            "/answers/export": (tenant.answers, [doc["attributes"]["answerId"] for doc in tenant.answers]),
+            "/employees": (tenant.employees, [int(doc["id"]) for doc in tenant.employees]),
+        }
+
+    def _json(self, status: int, payload: Any, request: httpx.Request, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        hdrs = {"Content-Type": "application/json", **(headers or {})}
+        return httpx.Response(status, content=body, headers=hdrs, request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        faults = self.faults
+        self.stats.requests += 1
+        if faults.latency_seconds or faults.jitter_seconds:
+            await asyncio.sleep(faults.latency_seconds + self._rng.random() * faults.jitter_seconds)
+
+        path = request.url.path
+        if self._base_path and path.startswith(self._base_path):
+            path = path[len(self._base_path) :] or "/"
+        self.stats.by_path[path] = self.stats.by_path.get(path, 0) + 1
+
+        if request.method == "POST" and path == "/auth/application":
+            self.stats.auth += 1
+            self._token = f"mock-token-{self.stats.auth}"
+            self._token_uses = 0
+            return self._json(200, {"data": {"id": self._token}}, request)
+
+        if request.headers.get("Authorization") != f"Bearer {self._token}" or (
+            faults.token_ttl_requests and self._token_uses >= faults.token_ttl_requests
+        ):
+            self.stats.injected_401 += 1
+            return self._json(401, {"errors": [{"title": "Unauthorized"}]}, request)
+        self._token_uses += 1
+
+        if faults.rate_429 and self._rng.random() < faults.rate_429:
+            self.stats.injected_429 += 1
+            return self._json(429, {"errors": [{"title": "Too Many Requests"}]}, request, {"Retry-After": str(faults.retry_after_seconds)})
+        if faults.rate_5xx and self._rng.random() < faults.rate_5xx:
+            self.stats.injected_5xx += 1
+            return self._json(503, {"errors": [{"title": "Service Unavailable"}]}, request)
+
+        if path in self._paged:
+            return self._page(request, path)
+        if path == "/engagement/drivers":
+            return self._json(200, {"data": self.tenant.drivers}, request)
+        match = _EMPLOYEE_PATH.match(path)
+        if match:
+            n = int(match.group(1))
+            if not 1 <= n <= len(self.tenant.employees):
+                return self._json(404, {"errors": [{"title": f"Employee {n} not found"}]}, request)
+            return self._json(200, {"data": self.tenant.employees[n - 1]}, request)
+
+        match = _CONTEXTS_PATH.match(path)
+        if match and int(match.group(1)) == self.tenant.company_id:
+            group = match.group(2)
+            known = set(self.tenant.engagement_groups) | {d["id"] for d in self.tenant.drivers}
+            if group not in known:
+                return self._json(422, {"errors": [{"title": f"Unknown group {group}"}]}, request)
+            return self._json(200, {"data": self._contexts(group)}, request)
+
+        return self._json(404, {"errors": [{"title": f"No route for {path}"}]}, request)
+
+    def _page(self, request: httpx.Request, path: str) -> httpx.Response:
+        items, keys = self._paged[path]
+        params = request.url.params
+        per_page = max(1, int(params.get("per_page") or 100))
+        after = params.get("continuation")
+        start = bisect.bisect_right(keys, int(after)) if after else 0
+        page = items[start : start + per_page]
+        links: Dict[str, Any] = {}
+        if start + per_page < len(items):
+            links["next"] = f"{self.base_url}{path}?continuation={keys[start + per_page - 1]}&per_page={per_page}"
+        self.stats.pages += 1
+        self.stats.items += len(page)
+        return self._json(200, {"data": page, "links": links}, request)
+
+    def _contexts(self, group: str) -> List[Dict[str, Any]]:
+        rng = random.Random(f"{self.faults.seed}:{group}")
+        return [
+            {
+                "type": "contexts",
+                "id": f"company_{self.tenant.company_id}_segment_{n}",
+                "attributes": {"scores": {"time": "2025-01-01", "mean": round(rng.uniform(5, 9), 2)}},
+            }
+            for n in range(self.tenant.contexts_per_group)
+        ]
@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import logging
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the derivation below changes: it salts the content hash (so the
+# next ingest rewrites every doc) and `backfill_norm` recomputes older docs.
+NORM_VERSION = 1
+
+# Where Peakon (and older exports) put the same fact under different spellings.
+_NAME_FIRST = ("First name", "first_name", "firstName")
+_NAME_LAST = ("Last name", "last_name", "lastName")
+_NAME_FULL = ("Full name", "full_name", "fullName", "Name", "name", "Display name", "display_name", "displayName")
+_DEPARTMENT = ("Department", "department")
+_SUB_DEPARTMENT = ("Sub-Department", "sub_department", "sub-department")
+_TITLE = ("Title", "title", "Job title", "job_title")
+_SCORE_EMPLOYEE_ID = (
+    "attributes.employeeId",
+    "attributes.employee_id",
+    "employeeId",
+    "employee_id",
+    "attributes.respondentEmployeeId",
+    "attributes.respondent_employee_id",
+)
+_ANSWER_DRIVER_ID_ATTRS = ("driverId", "driverID", "engagementDriverId", "engagement_driver_id", "driver.id")
+_ANSWER_DRIVER_ID_RELS = (
+    "driver.data.id",
+    "Driver.data.id",
+    "engagementDriver.data.id",
+    "question.data.relationships.driver.data.id",
+)
+
+
+def canonical_id(value: Any) -> Any:
+    """Ids as stored in `_id`: an int when the value is numeric, else the stripped string."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def nested_value(data: Dict[str, Any], *paths: str) -> Any:
+    """First non-empty value found at one of the dotted `paths`."""
+    for path in paths:
+        current: Any = data
+        found = True
+        for part in path.split("."):
+            if isinstance(current, dict) and part in current:
+                current = current.get(part)
+            else:
+                found = False
+                break
+        if found and current not in (None, ""):
+            return current
+    return None
+
+
+def _first_text(attrs: Dict[str, Any], keys: Iterable[str]) -> Optional[str]:
+    for key in keys:
+        value = attrs.get(key)
+        if value is not None and str(value).strip() != "":
+            return str(value).strip()
+    return None
+
+
+def employee_manager_id(employee: Dict[str, Any]) -> Optional[str]:
+    relationships = employee.get("relationships") or {}
+    if isinstance(relationships, dict):
+        for key in ("Manager", "manager"):
+            rel = relationships.get(key) or {}
+            if isinstance(rel, dict):
+                data = rel.get("data") or {}
+                if isinstance(data, dict):
+                    mgr_id = data.get("id")
+                    if mgr_id is not None and str(mgr_id).strip() != "":
+                        return str(mgr_id)
+    attrs = employee.get("attributes") or {}
+    manager = attrs.get("manager")
+    if isinstance(manager, dict):
+        data = manager.get("data") or {}
+        if isinstance(data, dict):
+            mgr_id = data.get("id")
+            if mgr_id is not None and str(mgr_id).strip() != "":
+                return str(mgr_id)
+    return None
+
+
+def employee_name(attrs: Dict[str, Any]) -> Optional[str]:
+    first = _first_text(attrs, _NAME_FIRST)
+    last = _first_text(attrs, _NAME_LAST)
+    if first or last:
+        return f"{first or ''} {last or ''}".strip()
+    return _first_text(attrs, _NAME_FULL)
+
+
+def employee_norm(item: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = item.get("attributes") or {}
+    return {
+        "v": NORM_VERSION,
+        "id": canonical_id(item.get("_id", item.get("id"))),
+        "manager_id": canonical_id(employee_manager_id(item)),
+        "department": _first_text(attrs, _DEPARTMENT),
+        "sub_department": _first_text(attrs, _SUB_DEPARTMENT),
+        "name": employee_name(attrs),
+        "title": _first_text(attrs, _TITLE),
+    }
+
+
+def csv_values(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return []
+    return [part.strip() for part in str(raw).split(",") if part.strip()]
+
+
+def contains_any(values: List[str]) -> Dict[str, Any]:
+    """Case-insensitive substring match against any of `values`."""
+    return {"$in": [re.compile(re.escape(value), re.IGNORECASE) for value in values]}
+
+
+def employee_filter_query(
+    department: Optional[str],
+    sub_department: Optional[str],
+    manager_id: Optional[str],
+) -> Optional[Dict[str, Any]]:
+    """The employees filter behind the API's department/sub_department/manager_id parameters.
+
+    Shared with the index advisor so it explains the query the API really sends.
+    """
+    conditions = []
+
+    department_values = csv_values(department)
+    if department_values:
+        conditions.append({"norm.department": contains_any(department_values)})
+
+    sub_department_values = csv_values(sub_department)
+    if sub_department_values:
+        conditions.append({"norm.sub_department": contains_any(sub_department_values)})
+
+    if manager_id:
+        conditions.append({"norm.manager_id": canonical_id(manager_id)})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def answer_driver_id(answer: Dict[str, Any]) -> Any:
+    attrs = answer.get("attributes") or {}
+    rels = answer.get("relationships") or {}
+    return nested_value(attrs, *_ANSWER_DRIVER_ID_ATTRS) or nested_value(rels, *_ANSWER_DRIVER_ID_RELS)
+
+
+def answer_norm(item: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = item.get("attributes") or {}
+    return {
+        "v": NORM_VERSION,
+        "id": canonical_id(attrs.get("answerId") or item.get("_id", item.get("id"))),
+        "employee_id": canonical_id(attrs.get("employeeId") or attrs.get("employee_id")),
+        "question_id": canonical_id(attrs.get("questionId")),
+        "driver_id": canonical_id(answer_driver_id(item)),
+        "score": attrs.get("answerScore"),
+        "answered_at": attrs.get("responseAnsweredAt"),
+    }
+
+
+def score_norm(item: Dict[str, Any], *, driver_id: Optional[str] = None) -> Dict[str, Any]:
+    return {
+        "v": NORM_VERSION,
+        "employee_id": canonical_id(nested_value(item, *_SCORE_EMPLOYEE_ID)),
+        "driver_id": driver_id or item.get("driver_id"),
+        "time": nested_value(item, "attributes.scores.time", "scores.time", "time"),
+        "mean": nested_value(item, "attributes.scores.mean", "scores.mean", "attributes.mean", "mean"),
+    }
+
+
+# Collection -> how its `norm` subdocument is derived from a stored doc.
+NORMALIZERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "employees": employee_norm,
+    "answers_export": answer_norm,
+    "scores_contexts": score_norm,
+    "scores_by_driver": score_norm,
+}
+
+
+def backfill_norm(db: Any, *, collections: Optional[List[str]] = None, batch_size: int = 1000) -> Dict[str, int]:
+    """Write `norm` on stored docs that lack it or carry an older NORM_VERSION.
+
+    Only `norm` is set; the content hash is left as it was, so the next ingest
+    rewrites each doc once with the salted hash. Returns updated docs per collection.
+    """
+    updated: Dict[str, int] = {}
+    for name in collections or list(NORMALIZERS):
+        derive = NORMALIZERS[name]
+        coll = db[name]
+        ops: List[UpdateOne] = []
+        count = 0
+        for doc in coll.find({"norm.v": {"$ne": NORM_VERSION}}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"norm": derive(doc)}}))
+            if len(ops) >= batch_size:
+                count += coll.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            count += coll.bulk_write(ops, ordered=False).modified_count
+        updated[name] = count
+        logger.info("Backfilled norm on %s docs in %s", count, name)
+    return updated
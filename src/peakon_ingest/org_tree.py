@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import datetime as dt
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from math import cos, pi, sin
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .normalize import NORM_VERSION, employee_manager_id
+
+# The org tree of each successful run (see `snapshot_docs`): a header doc per
+# run in ORG_SNAPSHOTS, one doc per node in ORG_SNAPSHOT_NODES, and the
+# current run_id under this sync_state key.
+ORG_SNAPSHOTS = "org_snapshots"
+ORG_SNAPSHOT_NODES = "org_snapshot_nodes"
+ORG_SNAPSHOT_STATE = "org_snapshot"
+# Older snapshots are kept for comparison and rollback, then pruned.
+ORG_SNAPSHOTS_KEPT = 3
+EMPLOYEE_PROJECTION = {"_id": 1, "attributes": 1, "relationships": 1, "norm": 1}
+
+
+@dataclass
+class EmployeeNode:
+    id: str
+    name: str
+    email: Optional[str]
+    department: Optional[str]
+    sub_department: Optional[str]
+    country: Optional[str]
+    title: Optional[str]
+    manager_id: Optional[str]
+
+
+def _attr(attrs: Dict[str, Any], keys: Iterable[str]) -> Optional[str]:
+    for key in keys:
+        value = attrs.get(key)
+        if value is not None and str(value).strip() != "":
+            return str(value).strip()
+    return None
+
+
+def _employee_name(attrs: Dict[str, Any], fallback_id: str) -> str:
+    first = _attr(attrs, ["First name", "first_name", "firstName"])
+    last = _attr(attrs, ["Last name", "last_name", "lastName"])
+    if first or last:
+        return f"{first or ''} {last or ''}".strip()
+
+    return (
+        _attr(
+            attrs,
+            [
+                "Full name",
+                "full_name",
+                "fullName",
+                "Display name",
+                "display_name",
+                "displayName",
+                "Name",
+                "name",
+            ],
+        )
+        or fallback_id
+    )
+
+
+def _coerce_employee(employee: Dict[str, Any]) -> EmployeeNode:
+    raw_id = employee.get("_id", employee.get("id"))
+    node_id = str(raw_id)
+    attrs = employee.get("attributes") or {}
+
+    norm = employee.get("norm")
+    if isinstance(norm, dict) and norm.get("v") == NORM_VERSION:
+        manager_id = norm.get("manager_id")
+        return EmployeeNode(
+            id=node_id,
+            name=norm.get("name") or node_id,
+            email=_attr(attrs, ["Email", "email", "accountEmail"]),
+            department=norm.get("department"),
+            sub_department=norm.get("sub_department"),
+            country=_attr(attrs, ["Country", "country"]),
+            title=norm.get("title"),
+            manager_id=str(manager_id) if manager_id is not None else None,
+        )
+
+    return EmployeeNode(
+        id=node_id,
+        name=_employee_name(attrs, node_id),
+        email=_attr(attrs, ["Email", "email", "accountEmail"]),
+        department=_attr(attrs, ["Department", "department"]),
+        sub_department=_attr(attrs, ["Sub-Department", "sub_department", "sub-department"]),
+        country=_attr(attrs, ["Country", "country"]),
+        title=_attr(attrs, ["Title", "title", "Job title", "job_title"]),
+        manager_id=employee_manager_id(employee),
+    )
+
+
+def node_from_payload(node: Dict[str, Any]) -> EmployeeNode:
+    """The `EmployeeNode` behind a node of an org map payload (or snapshot)."""
+    return EmployeeNode(
+        id=node["id"],
+        name=node.get("label") or node["id"],
+        email=node.get("email"),
+        department=node.get("department"),
+        sub_department=node.get("subDepartment"),
+        country=node.get("country"),
+        title=node.get("title"),
+        manager_id=node.get("managerId"),
+    )
+
+
+def build_org_map_payload(employees: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return build_org_payload([_coerce_employee(doc) for doc in employees])
+
+
+def build_org_payload(nodes: Iterable[EmployeeNode]) -> Dict[str, Any]:
+    """Hierarchy, radial layout and anomalies for a set of employees."""
+    nodes_by_id: Dict[str, EmployeeNode] = {}
+    duplicates: List[str] = []
+
+    for node in nodes:
+        if node.id in nodes_by_id:
+            duplicates.append(node.id)
+            continue
+        nodes_by_id[node.id] = node
+
+    children: Dict[str, List[str]] = defaultdict(list)
+    roots: List[str] = []
+    orphans: List[Dict[str, str]] = []
+
+    for node in nodes_by_id.values():
+        manager_id = node.manager_id
+        if not manager_id:
+            roots.append(node.id)
+            continue
+        if manager_id not in nodes_by_id:
+            orphans.append({"id": node.id, "managerId": manager_id})
+            roots.append(node.id)
+            continue
+        children[manager_id].append(node.id)
+
+    # If no obvious root, pick deterministically.
+    if not roots and nodes_by_id:
+        roots = [sorted(nodes_by_id.keys())[0]]
+
+    # Build BFS layers from all roots.
+    depth_by_id: Dict[str, int] = {}
+    parent_by_id: Dict[str, Optional[str]] = {}
+    queue = deque([(root_id, 0, None) for root_id in roots])
+
+    while queue:
+        current, depth, parent = queue.popleft()
+        if current in depth_by_id:
+            continue
+        depth_by_id[current] = depth
+        parent_by_id[current] = parent
+        for child in children.get(current, []):
+            queue.append((child, depth + 1, current))
+
+    disconnected = [node_id for node_id in nodes_by_id if node_id not in depth_by_id]
+    for node_id in disconnected:
+        depth_by_id[node_id] = 0
+        parent_by_id[node_id] = None
+        roots.append(node_id)
+
+    # Compute subtree sizes with memoized DFS.
+    subtree_cache: Dict[str, int] = {}
+
+    def subtree_size(node_id: str, seen: Optional[set[str]] = None) -> int:
+        if node_id in subtree_cache:
+            return subtree_cache[node_id]
+        seen = seen or set()
+        if node_id in seen:
+            return 1
+        seen.add(node_id)
+        total = 1
+        for child in children.get(node_id, []):
+            total += subtree_size(child, seen.copy())
+        subtree_cache[node_id] = total
+        return total
+
+    layer_members: Dict[int, List[str]] = defaultdict(list)
+    for node_id, depth in depth_by_id.items():
+        layer_members[depth].append(node_id)
+
+    coords: Dict[str, Tuple[float, float]] = {}
+    layer_gap = 170.0
+    base_radius = 30.0
+    for depth, members in sorted(layer_members.items()):
+        members_sorted = sorted(members)
+        radius = base_radius + (depth * layer_gap)
+        count = len(members_sorted)
+        for idx, node_id in enumerate(members_sorted):
+            if depth == 0 and count == 1:
+                coords[node_id] = (0.0, 0.0)
+                continue
+            theta = (2 * pi * idx) / max(count, 1)
+            coords[node_id] = (radius * cos(theta), radius * sin(theta))
+
+    node_payloads: List[Dict[str, Any]] = []
+    for node_id, node in nodes_by_id.items():
+        x, y = coords.get(node_id, (0.0, 0.0))
+        node_payloads.append(
+            {
+                "id": node_id,
+                "label": node.name,
+                "email": node.email,
+                "department": node.department,
+                "subDepartment": node.sub_department,
+                "country": node.country,
+                "title": node.title,
+                "managerId": node.manager_id,
+                "parentId": parent_by_id.get(node_id),
+                "depth": depth_by_id.get(node_id, 0),
+                "directReports": len(children.get(node_id, [])),
+                "subtreeSize": subtree_size(node_id),
+                "x": round(x, 2),
+                "y": round(y, 2),
+            }
+        )
+
+    node_payloads.sort(key=lambda n: (n["depth"], n["label"]))
+    edge_payloads = payload_edges(node_payloads)
+    root_id = sorted(roots)[0] if roots else None
+
+    return {
+        "rootId": root_id,
+        "stats": {
+            "employees": len(nodes_by_id),
+            "renderedNodes": len(node_payloads),
+            "renderedEdges": len(edge_payloads),
+            "maxDepth": max(depth_by_id.values()) if depth_by_id else 0,
+            "orphans": len(orphans),
+            "duplicates": len(duplicates),
+        },
+        "anomalies": {
+            "orphans": payload_orphans(node_payloads),
+            "duplicates": sorted(set(duplicates)),
+        },
+        "nodes": node_payloads,
+        "edges": edge_payloads,
+    }
+
+
+def payload_edges(nodes: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Manager -> report edges of payload nodes, in node order: every node whose manager is in the map."""
+    ids = {node["id"] for node in nodes}
+    return [{"source": node["managerId"], "target": node["id"]} for node in nodes if node.get("managerId") in ids]
+
+
+def payload_orphans(nodes: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Payload nodes whose manager is not in the map, in node order."""
+    ids = {node["id"] for node in nodes}
+    return [
+        {"id": node["id"], "managerId": node["managerId"]}
+        for node in nodes
+        if node.get("managerId") and node["managerId"] not in ids
+    ]
+
+
+def snapshot_docs(
+    run_id: str, payload: Dict[str, Any], created_at: dt.datetime
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split an org map payload into the snapshot header and its node docs (in payload order).
+
+    The header keeps only scalars and the stats, so it stays small however big
+    the org is. Edges and orphans are derived from the nodes again, and
+    duplicate ids are flagged on their node docs.
+    """
+    header = {"_id": run_id, "created_at": created_at, "rootId": payload["rootId"], "stats": payload["stats"]}
+    duplicates = set(payload["anomalies"]["duplicates"])
+    nodes = [
+        {
+            "_id": f"{run_id}:{node['id']}",
+            "run_id": run_id,
+            "seq": seq,
+            "node": node,
+            **({"duplicate": True} if node["id"] in duplicates else {}),
+        }
+        for seq, node in enumerate(payload["nodes"])
+    ]
+    return header, nodes
+
+
+def org_snapshot_docs(run_id: str, employees: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """The snapshot header and node docs of `run_id`, built from the stored employees."""
+    return snapshot_docs(run_id, build_org_map_payload(employees), dt.datetime.utcnow())
+
+
+def stale_snapshot_ids(headers: Iterable[Dict[str, Any]], *, keep: int, served: Optional[str]) -> List[str]:
+    """Snapshots to prune: all but the newest `keep` (at least one), never the one `served`.
+
+    `headers` need `_id` and `created_at`; of equal timestamps, the later header counts as newer.
+    """
+    newest_first = sorted(headers, key=lambda doc: doc["created_at"])[::-1]
+    return [doc["_id"] for doc in newest_first[max(1, keep) :] if doc["_id"] != served]
+
+
+def payload_from_snapshot(header: Dict[str, Any], nodes: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Reassemble the org map payload stored by `snapshot_docs`."""
+    docs = sorted(nodes, key=lambda doc: doc["seq"])
+    payload_nodes = [doc["node"] for doc in docs]
+    return {
+        "rootId": header.get("rootId"),
+        "stats": header.get("stats") or {},
+        "anomalies": {
+            "orphans": payload_orphans(payload_nodes),
+            "duplicates": sorted(doc["node"]["id"] for doc in docs if doc.get("duplicate")),
+        },
+        "nodes": payload_nodes,
+        "edges": payload_edges(payload_nodes),
+        "snapshot": {"runId": header["_id"], "createdAt": header.get("created_at")},
+    }
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import logging
-from typing import Any, AsyncGenerator, Dict, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 from urllib.parse import urlparse, parse_qs
 
 from .http import PeakonClient
+from .telemetry import record_page
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +20,85 @@ def _get_next_link(payload: Dict[str, Any]) -> Optional[str]:
     return None
 
 
+@dataclass(frozen=True)
+class PageSizeBounds:
+    """Limits for adaptive paging: per_page range, target latency and page size cap."""
+
+    min_per_page: int = 500
+    max_per_page: int = 10000
+    target_seconds: float = 10.0
+    max_page_bytes: int = 64 * 1024 * 1024
+
+
+@dataclass
+class AdaptivePageSizer:
+    """Pick `per_page` for the next request from the latency and size of the last full page.
+
+    The next size scales the last page's length by `target_seconds / seconds`
+    (at most halving or doubling per page) and is capped so the projected body
+    stays under `max_page_bytes`. The short last page carries no signal and is
+    only recorded. A short page with more to follow means the server caps
+    `per_page`; that cap becomes the upper bound from then on.
+    """
+
+    per_page: int
+    bounds: PageSizeBounds = field(default_factory=PageSizeBounds)
+    pages: int = 0
+    adjustments: int = 0
+    sizes: List[int] = field(default_factory=list)
+    server_cap: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        self.per_page = self._clamp(self.per_page)
+        self.start_per_page = self.per_page
+
+    def _clamp(self, value: float) -> int:
+        upper = self.bounds.max_per_page
+        if self.server_cap is not None:
+            upper = min(upper, self.server_cap)
+        return int(max(min(self.bounds.min_per_page, upper), min(upper, value)))
+
+    def observe(self, items: int, seconds: float, nbytes: int, *, more: bool = False) -> int:
+        """Record a page of `items`; `more` tells whether another page follows it."""
+        self.pages += 1
+        self.sizes.append(self.per_page)
+        if items <= 0 or (items < self.per_page and not more):
+            return self.per_page
+        if items < self.per_page and (self.server_cap is None or items < self.server_cap):
+            logger.info("Adaptive paging: server returned %s of %s requested items; capping per_page", items, self.per_page)
+            self.server_cap = items
+
+        ratio = self.bounds.target_seconds / seconds if seconds > 0 else 2.0
+        proposed = items * max(0.5, min(2.0, ratio))
+        if nbytes > 0:
+            proposed = min(proposed, self.bounds.max_page_bytes / (nbytes / items))
+
+        new_size = self._clamp(proposed)
+        if new_size != self.per_page:
+            logger.info(
+                "Adaptive paging: %s items in %.2fs (%s bytes); per_page %s -> %s",
+                items,
+                seconds,
+                nbytes,
+                self.per_page,
+                new_size,
+            )
+            self.adjustments += 1
+            self.per_page = new_size
+        return self.per_page
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "start_per_page": self.start_per_page,
+            "final_per_page": self.per_page,
+            "pages": self.pages,
+            "adjustments": self.adjustments,
+            "min_used": min(self.sizes, default=self.per_page),
+            "max_used": max(self.sizes, default=self.per_page),
+            "server_cap": self.server_cap,
+        }
+
+
 def _split_url(full_url: str, base_url: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
     """Split a next-link URL into a path and params suitable for PeakonClient.
 
@@ -50,22 +131,85 @@ async def paginate_json(
     first_url: str,
     *,
     first_params: Optional[Dict[str, Any]] = None,
+    page_sizer: Optional[AdaptivePageSizer] = None,
 ) -> AsyncGenerator[Dict[str, Any], None]:
-    """Yield each page JSON by chasing links.next."""
+    """Yield each page JSON by chasing links.next.
+
+    With a `page_sizer`, `per_page` is set from the sizer on every request and
+    the sizer is fed each page's latency and body size.
+    """
     url = first_url
     params = dict(first_params or {})
 
     page_num = 0
     while True:
         page_num += 1
-        payload = await client.get_json_with_reauth_on_401(url, params=params)
+        response_stats: Dict[str, Any] = {}
+        if page_sizer is not None:
+            params["per_page"] = page_sizer.per_page
+        payload = await client.get_json_with_reauth_on_401(url, params=params, response_stats=response_stats)
         logger.info("Fetched page %s for %s", page_num, first_url)
+        record_page(len(payload.get("data") or []))
+        nxt = _get_next_link(payload)
+        if page_sizer is not None:
+            page_sizer.observe(
+                len(payload.get("data") or []), response_stats["seconds"], response_stats["bytes"], more=bool(nxt)
+            )
         yield payload
 
-        nxt = _get_next_link(payload)
         if not nxt:
             break
 
         # Normalize next links (absolute or relative) against the client's base URL
         # so that we don't duplicate the API prefix (e.g. `/api/v1`).
         url, params = _split_url(nxt, client.base_url)
+
+
+async def paginate_json_chunks(
+    client: PeakonClient,
+    first_url: str,
+    *,
+    first_params: Optional[Dict[str, Any]] = None,
+    chunk_size: int = 1000,
+    page_sizer: Optional[AdaptivePageSizer] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """Like `paginate_json`, but stream each page and yield it in slices of `data`.
+
+    Each yielded dict has at most `chunk_size` items under `data`. The last
+    slice of a page also carries the page's other top-level members
+    (`links`, `meta`, ...), so consumers can still see page boundaries. Memory
+    stays bounded by the chunk size rather than the page size. `page_sizer`
+    works as in `paginate_json`.
+    """
+    url = first_url
+    params = dict(first_params or {})
+    chunk_size = max(1, chunk_size)
+
+    page_num = 0
+    while True:
+        page_num += 1
+        chunk: List[Dict[str, Any]] = []
+        extras: Dict[str, Any] = {}
+        items = 0
+        response_stats: Dict[str, Any] = {}
+        if page_sizer is not None:
+            params["per_page"] = page_sizer.per_page
+        async for key, value in client.stream_json_page(url, params=params, response_stats=response_stats):
+            if key is not None:
+                extras[key] = value
+                continue
+            items += 1
+            chunk.append(value)
+            if len(chunk) >= chunk_size:
+                yield {"data": chunk}
+                chunk = []
+        logger.info("Fetched page %s for %s", page_num, first_url)
+        record_page(items)
+        nxt = _get_next_link(extras)
+        if page_sizer is not None:
+            page_sizer.observe(items, response_stats["seconds"], response_stats["bytes"], more=bool(nxt))
+        yield {**extras, "data": chunk}
+
+        if not nxt:
+            break
+        url, params = _split_url(nxt, client.base_url)
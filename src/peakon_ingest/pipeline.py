@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+@dataclass
+class PipelineStats:
+    pages: int = 0
+    fetch_seconds: float = 0.0
+    write_seconds: float = 0.0
+    # Producer blocked on a full queue, i.e. waiting on the writers.
+    producer_wait_seconds: float = 0.0
+    # Writers idle on an empty queue, i.e. waiting on the network.
+    writer_wait_seconds: float = 0.0
+    max_queue_depth: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: round(v, 3) if isinstance(v, float) else v for k, v in asdict(self).items()}
+
+
+async def run_pipeline(
+    pages: AsyncIterator[T],
+    consume: Callable[[T], Awaitable[None]],
+    *,
+    queue_size: int = 4,
+    writers: int = 1,
+) -> PipelineStats:
+    """Fetch pages and write them concurrently through a bounded queue.
+
+    One producer task drains `pages` into an `asyncio.Queue(maxsize=queue_size)`
+    while `writers` tasks call `consume` on each page. The queue bound caps how
+    many fetched-but-unwritten pages are held in memory. The first failure in
+    either stage cancels the other and is re-raised.
+    """
+    queue: asyncio.Queue[Any] = asyncio.Queue(maxsize=max(1, queue_size))
+    stats = PipelineStats()
+    writers = max(1, writers)
+
+    async def producer() -> None:
+        iterator = pages.__aiter__()
+        try:
+            while True:
+                started = time.monotonic()
+                try:
+                    page = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                stats.fetch_seconds += time.monotonic() - started
+
+                started = time.monotonic()
+                await queue.put(page)
+                stats.producer_wait_seconds += time.monotonic() - started
+                stats.pages += 1
+                stats.max_queue_depth = max(stats.max_queue_depth, queue.qsize())
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        for _ in range(writers):
+            await queue.put(_DONE)
+
+    async def writer() -> None:
+        while True:
+            started = time.monotonic()
+            page = await queue.get()
+            stats.writer_wait_seconds += time.monotonic() - started
+            if page is _DONE:
+                return
+            started = time.monotonic()
+            await consume(page)
+            stats.write_seconds += time.monotonic() - started
+
+    tasks = [asyncio.create_task(producer())] + [asyncio.create_task(writer()) for _ in range(writers)]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            exc = task.exception()
+            if exc is not None:
+                raise exc
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    logger.debug("Pipeline finished: %s", stats)
+    return stats
+
+
+async def bounded_gather(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    *,
+    max_in_flight: int,
+) -> List[R]:
+    """Run `worker` over `items` with at most `max_in_flight` running at once.
+
+    Results keep the order of `items`. The first failure cancels the
+    remaining workers and is re-raised.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_in_flight))
+
+    async def run(item: T) -> R:
+        async with semaphore:
+            return await worker(item)
+
+    tasks = [asyncio.create_task(run(item)) for item in items]
+    try:
+        return list(await asyncio.gather(*tasks))
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
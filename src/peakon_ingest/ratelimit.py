@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import email.utils
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for a single Retry-After pause, in case the header is nonsense.
+MAX_RETRY_AFTER_SECONDS = 300.0
+
+
+def parse_retry_after(value: Optional[str], *, now: Optional[dt.datetime] = None) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds to wait."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=dt.timezone.utc)
+        seconds = (when - (now or dt.datetime.now(dt.timezone.utc))).total_seconds()
+    return min(MAX_RETRY_AFTER_SECONDS, max(0.0, seconds))
+
+
+class TokenBucket:
+    """Token bucket shared by every request of one client.
+
+    `rate` tokens are added per second up to `burst`; each request takes one.
+    A rate of `None`/0 disables limiting but `pause` still applies, so a
+    Retry-After from the server holds back every request, not just the one
+    that was throttled. Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: Optional[float], burst: int = 1):
+        self.rate = rate if rate and rate > 0 else None
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.stats: Dict[str, Any] = {
+            "requests": 0,
+            "throttled_requests": 0,
+            "throttled_seconds": 0.0,
+            "retry_after_pauses": 0,
+            "retry_after_seconds": 0.0,
+        }
+
+    def _refill(self, now: float) -> None:
+        if self.rate is None:
+            self._tokens = float(self.burst)
+        elif now > self._updated:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = max(self._updated, now)
+
+    async def acquire(self) -> None:
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    delay = (1 - self._tokens) / self.rate  # type: ignore[operator]
+                await asyncio.sleep(delay)
+
+        self.stats["requests"] += 1
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.stats["throttled_requests"] += 1
+            self.stats["throttled_seconds"] += waited
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all requests for `seconds`; the bucket refills only after the pause."""
+        if seconds <= 0:
+            return
+        until = time.monotonic() + seconds
+        self.stats["retry_after_pauses"] += 1
+        if until > self._paused_until:
+            self.stats["retry_after_seconds"] += until - max(self._paused_until, time.monotonic())
+            self._paused_until = until
+            # No burst straight after the pause: start refilling from empty.
+            self._tokens = 0.0
+            self._updated = until
+        logger.warning("Rate limited by server; pausing requests for %.1fs", seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["throttled_seconds"] = round(stats["throttled_seconds"], 3)
+        stats["retry_after_seconds"] = round(stats["retry_after_seconds"], 3)
+        return stats
@@ -1,60 +1,187 @@
 from __future__ import annotations
 
 import asyncio
+import datetime as dt
 import logging
-from apscheduler.schedulers.background import BackgroundScheduler
+from typing import Any, Awaitable, Callable, Dict, Optional
+
 from apscheduler.triggers.cron import CronTrigger
 
 from .config import Settings
 from .http import PeakonClient
 from .ingest import ingest_all
-from .storage import MongoStorage
+from .async_storage import IngestStorage, open_storage
+from .lease import INGEST_LOCK, LeaseLock, LeaseStore
+from .telemetry import Telemetry, serve_metrics
+from .tenants import ingest_tenants, load_tenants
 
 logger = logging.getLogger(__name__)
 
+OVERLAP_POLICIES = ("skip", "queue")
 
-def _run_once(settings: Settings) -> None:
-    async def _main() -> None:
-        client = PeakonClient(
-            base_url=settings.peakon_base_url,
-            app_token=settings.peakon_app_token,
-            timeout_seconds=settings.http_timeout_seconds,
-        )
-        storage = MongoStorage(settings.mongo_uri, settings.mongo_db)
+
+class IngestScheduler:
+    """Fire `run` on a cron schedule from the event loop, one run at a time.
+
+    Each run first takes the cluster-wide lease in `locks`; when another
+    replica holds it the run is skipped, since that replica is doing the work.
+    A run that comes due while this process is still running one is skipped
+    with `overlap="skip"`, or with `overlap="queue"` run once the current one
+    finishes (at most one is queued).
+    """
+
+    def __init__(
+        self,
+        run: Callable[[], Awaitable[Any]],
+        lease_store: LeaseStore,
+        *,
+        trigger: CronTrigger,
+        overlap: str = "skip",
+        lock_ttl_seconds: float = 300.0,
+        lock_name: str = INGEST_LOCK,
+    ):
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy {overlap!r}; expected one of {OVERLAP_POLICIES}")
+        self.run = run
+        self.lease_store = lease_store
+        self.trigger = trigger
+        self.overlap = overlap
+        self.lock_ttl_seconds = lock_ttl_seconds
+        self.lock_name = lock_name
+        self.stats: Dict[str, int] = {"runs": 0, "failed": 0, "skipped_overlap": 0, "skipped_locked": 0, "queued": 0}
+        self._task: Optional[asyncio.Task[None]] = None
+        self._queued = False
+        self._stop = asyncio.Event()
+
+    def request_run(self, reason: str) -> None:
+        """Start a run now, or apply the overlap policy if one is in progress."""
+        if self._task is not None and not self._task.done():
+            if self.overlap == "queue" and not self._queued:
+                self._queued = True
+                self.stats["queued"] += 1
+                logger.info("Ingest still running; queued the %s run.", reason)
+            else:
+                self.stats["skipped_overlap"] += 1
+                logger.warning("Ingest still running; skipping the %s run.", reason)
+            return
+        logger.info("Starting %s ingest run.", reason)
+        self._task = asyncio.create_task(self._run_until_drained())
+
+    async def _run_until_drained(self) -> None:
+        while True:
+            await self._run_locked()
+            if not self._queued:
+                return
+            self._queued = False
+
+    async def _run_locked(self) -> None:
+        lease = LeaseLock(self.lease_store, self.lock_name, ttl_seconds=self.lock_ttl_seconds)
+        if not await lease.acquire():
+            self.stats["skipped_locked"] += 1
+            logger.warning("Lock %r is held by another process; skipping this run.", self.lock_name)
+            return
         try:
-            stats = await ingest_all(
-                client,
-                storage,
-                company_id=settings.peakon_company_id,
-                engagement_group=settings.peakon_engagement_group,
-                per_page=settings.peakon_per_page,
-                full_sync=settings.full_sync,
-            )
-            logger.info("Ingestion completed: %s", stats)
+            self.stats["runs"] += 1
+            await lease.hold(self.run())
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.exception("Scheduled ingest failed: %s", e)
         finally:
-            await client.aclose()
+            await lease.release()
 
-    asyncio.run(_main())
+    async def wait_idle(self) -> None:
+        while self._task is not None and not self._task.done():
+            await asyncio.shield(self._task)
 
+    def stop(self) -> None:
+        self._stop.set()
 
-def run_daemon(settings: Settings) -> None:
-    scheduler = BackgroundScheduler()
+    async def run_forever(self, *, run_on_start: bool = False) -> None:
+        if run_on_start:
+            self.request_run("startup")
+        previous: Optional[dt.datetime] = None
+        while not self._stop.is_set():
+            now = dt.datetime.now(self.trigger.timezone)
+            # Never fire the same slot twice if the sleep wakes up a little early.
+            after = max(now, previous + dt.timedelta(seconds=1)) if previous else now
+            next_fire = self.trigger.get_next_fire_time(previous, after)
+            if next_fire is None:
+                logger.info("Cron schedule has no further fire times; stopping.")
+                break
+            logger.info("Next ingest run at %s.", next_fire.isoformat())
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, (next_fire - now).total_seconds()))
+            except asyncio.TimeoutError:
+                previous = next_fire
+                self.request_run("scheduled")
+        await self.wait_idle()
 
-    trigger = CronTrigger.from_crontab(settings.schedule_cron)
-    scheduler.add_job(_run_once, trigger, args=[settings], id="weekly_ingest", replace_existing=True)
 
-    scheduler.start()
-    logger.info("Scheduler started with cron '%s'.", settings.schedule_cron)
+async def _run_daemon(settings: Settings) -> None:
+    # One storage backend and HTTP client (with their connection pools, token
+    # bucket and bearer token) for the life of the process.
+    storage: IngestStorage = open_storage(settings)
+    client = PeakonClient(
+        base_url=settings.peakon_base_url,
+        app_token=settings.peakon_app_token,
+        timeout_seconds=settings.http_timeout_seconds,
+        requests_per_second=settings.peakon_rate_limit_per_second,
+        burst=settings.peakon_rate_limit_burst,
+        response_cache=storage if settings.peakon_http_cache else None,
+    )
 
-    if settings.run_on_start:
-        logger.info("RUN_ON_START=true; running ingestion once immediately.")
-        _run_once(settings)
+    metrics = None
+    if settings.metrics_port:
+        metrics = Telemetry()
+        serve_metrics(metrics, settings.metrics_port)
 
+    async def run() -> None:
+        if settings.peakon_tenants_file:
+            # Tenant runs happen in worker processes with their own clients, locks and stats.
+            tenants = load_tenants(settings.peakon_tenants_file)
+            results = await asyncio.to_thread(
+                ingest_tenants, settings, tenants, processes=settings.ingest_tenant_processes
+            )
+            failed = [r["tenant"] for r in results if r["status"] == "failure"]
+            logger.info("Tenant ingestion completed: %s", results)
+            if failed:
+                raise RuntimeError(f"Ingest failed for tenants {failed}")
+            return
+        stats = await ingest_all(
+            client,
+            storage,
+            company_id=settings.peakon_company_id,
+            engagement_groups=settings.engagement_groups(),
+            per_page=settings.peakon_per_page,
+            full_sync=settings.full_sync,
+            queue_size=settings.ingest_queue_size,
+            writers=settings.ingest_writers,
+            max_in_flight=settings.peakon_max_in_flight,
+            max_parallel_stages=settings.ingest_max_parallel_stages,
+            stream_chunk_size=settings.stream_chunk_size(),
+            page_size_bounds=settings.page_size_bounds(),
+            metrics=metrics,
+            staged=settings.ingest_staged,
+        )
+        logger.info("Ingestion completed: %s", stats)
+
+    scheduler = IngestScheduler(
+        run,
+        storage,
+        trigger=CronTrigger.from_crontab(settings.schedule_cron),
+        overlap=settings.schedule_overlap,
+        lock_ttl_seconds=settings.schedule_lock_ttl_seconds,
+    )
+    logger.info("Scheduler started with cron '%s' (overlap=%s).", settings.schedule_cron, settings.schedule_overlap)
     try:
-        # Keep process alive
-        import time
-        while True:
-            time.sleep(60)
+        await scheduler.run_forever(run_on_start=settings.run_on_start)
+    finally:
+        await client.aclose()
+        await storage.aclose()
+
+
+def run_daemon(settings: Settings) -> None:
+    try:
+        asyncio.run(_run_daemon(settings))
     except KeyboardInterrupt:
         logger.info("Shutting down scheduler...")
-        scheduler.shutdown()
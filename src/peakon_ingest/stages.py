@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import datetime as dt
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .telemetry import current_stage, record_stage_end
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One ingest step. `run` receives the results of the stages it depends on."""
+
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    depends_on: Tuple[str, ...] = ()
+
+
+def _utc_iso() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat()
+
+
+def _validate(stages: Sequence[Stage]) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate stage names: {names}")
+    known = set(names)
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in known]
+        if missing:
+            raise ValueError(f"Stage {stage.name!r} depends on unknown stages {missing}")
+
+    deps = {stage.name: set(stage.depends_on) for stage in stages}
+    resolved: set[str] = set()
+    while len(resolved) < len(deps):
+        ready = [name for name, d in deps.items() if name not in resolved and d <= resolved]
+        if not ready:
+            cycle = sorted(name for name in deps if name not in resolved)
+            raise ValueError(f"Stage dependency cycle among {cycle}")
+        resolved.update(ready)
+
+
+def select_stages(
+    stages: Sequence[Stage],
+    *,
+    only: Optional[Sequence[str]] = None,
+    skip: Optional[Sequence[str]] = None,
+    then: Optional[Sequence[str]] = None,
+) -> List[Stage]:
+    """Narrow `stages` to a partial run, keeping declaration order.
+
+    `only` keeps the named stages plus whatever they depend on (scores_by_driver
+    still needs the driver ids). `then` adds the named stages that depend on a
+    kept one, waiting only on their kept dependencies: a targeted employees
+    refresh still rebuilds the org snapshot without refetching the answers.
+    `skip` then drops the named stages and, with a warning, every stage that
+    depends on a dropped one.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    unknown = [name for name in [*(only or ()), *(skip or ()), *(then or ())] if name not in by_name]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; choose from {list(by_name)}")
+
+    keep = set(by_name)
+    if only:
+        keep = set()
+        pending = list(only)
+        while pending:
+            name = pending.pop()
+            if name not in keep:
+                keep.add(name)
+                pending.extend(by_name[name].depends_on)
+    for name in then or ():
+        kept_deps = tuple(dep for dep in by_name[name].depends_on if dep in keep)
+        if name not in keep and kept_deps:
+            by_name[name] = replace(by_name[name], depends_on=kept_deps)
+            keep.add(name)
+
+    dropped = set(skip or ()) & keep
+    changed = True
+    while changed:
+        changed = False
+        for name in sorted(keep - dropped):
+            if any(dep in dropped for dep in by_name[name].depends_on):
+                logger.warning("Skipping stage %s as well; it depends on %s", name, list(by_name[name].depends_on))
+                dropped.add(name)
+                changed = True
+    return [by_name[stage.name] for stage in stages if stage.name in keep - dropped]
+
+
+async def run_stages(stages: Sequence[Stage], *, max_concurrency: int = 3) -> Dict[str, Dict[str, Any]]:
+    """Run stages as a dependency DAG and return one record per stage.
+
+    A stage starts once all of its dependencies succeeded; independent stages
+    run concurrently, at most `max_concurrency` at a time. When a stage fails,
+    its dependents are recorded as skipped and everything else still runs.
+    Records hold status, start/finish times, duration, result and error.
+    """
+    _validate(stages)
+    by_name = {stage.name: stage for stage in stages}
+    records: Dict[str, Dict[str, Any]] = {stage.name: {"status": "pending"} for stage in stages}
+    results: Dict[str, Any] = {}
+    done_events = {stage.name: asyncio.Event() for stage in stages}
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def execute(stage: Stage) -> None:
+        record = records[stage.name]
+        try:
+            for dep in stage.depends_on:
+                await done_events[dep].wait()
+            failed_deps = [dep for dep in stage.depends_on if records[dep]["status"] != "success"]
+            if failed_deps:
+                record.update({"status": "skipped", "reason": f"dependencies not satisfied: {failed_deps}"})
+                logger.warning("Skipping stage %s; dependencies not satisfied: %s", stage.name, failed_deps)
+                return
+
+            async with semaphore:
+                record["started_at"] = _utc_iso()
+                started = time.monotonic()
+                logger.info("Stage %s started.", stage.name)
+                # Requests and writes made by this stage (and tasks it spawns) are attributed to it.
+                current_stage.set(stage.name)
+                try:
+                    result = await stage.run({dep: results[dep] for dep in stage.depends_on})
+                except Exception as e:
+                    record.update({"status": "failure", "error": str(e)})
+                    logger.exception("Stage %s failed: %s", stage.name, e)
+                else:
+                    results[stage.name] = result
+                    record.update({"status": "success", "result": result})
+                finally:
+                    record["finished_at"] = _utc_iso()
+                    record["duration_s"] = round(time.monotonic() - started, 3)
+                    record_stage_end(stage.name, record["duration_s"])
+                    logger.info("Stage %s %s in %.1fs.", stage.name, record["status"], record["duration_s"])
+        finally:
+            done_events[stage.name].set()
+
+    await asyncio.gather(*(execute(by_name[name]) for name in by_name))
+    return records
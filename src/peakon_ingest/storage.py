@@ -2,21 +2,281 @@ from __future__ import annotations
 
 import datetime as dt
 import logging
-import os
-import uuid
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from pymongo import MongoClient, ASCENDING
+import bson
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne
 from pymongo.collection import Collection
 from pymongo.database import Database
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from .aggregates import (
+    AGG_COLLECTION,
+    AGG_EMPLOYEE_PROJECTION,
+    AGG_STATE,
+    ANSWER_PROJECTION,
+    PENDING_ANSWERS,
+    REFOLD_ANSWERS,
+    REQUEUE_ANSWERS,
+    AggRefresh,
+    moved_employee_ids,
+)
+from .generations import GenerationDb, base_generation
+from .indexes import INDEXES
+from .org_tree import (
+    EMPLOYEE_PROJECTION,
+    ORG_SNAPSHOT_NODES,
+    ORG_SNAPSHOT_STATE,
+    ORG_SNAPSHOTS,
+    ORG_SNAPSHOTS_KEPT,
+    org_snapshot_docs,
+    stale_snapshot_ids,
+)
+from .telemetry import record_write
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_BULK_BATCH_SIZE = 1000
+# Stay well below the 48MB bulk message limit; a batch is flushed once its
+# encoded documents reach this size even if batch_size has not been reached.
+DEFAULT_BULK_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _empty_write_stats() -> Dict[str, Any]:
+    return {
+        "docs": 0,
+        "batches": 0,
+        "upserted": 0,
+        "modified": 0,
+        "matched": 0,
+        "failed": 0,
+        "inserted": 0,
+        "changed": 0,
+        "unchanged": 0,
+        "errors": [],
+    }
+
+
+def _plan_bulk_ops(
+    pending: List[Tuple[Any, Dict[str, Any]]],
+    existing_hashes: Dict[Any, Any],
+    stats: Dict[str, Any],
+    *,
+    touch_unchanged: bool,
+) -> List[UpdateOne]:
+    """Turn buffered docs into UpdateOne ops, skipping docs whose content_hash is stored already.
+
+    Docs without a `content_hash` are always written. Unchanged docs either get
+    only `last_seen_run` bumped (`touch_unchanged`) or no write at all.
+    """
+    ops: List[UpdateOne] = []
+    for _id, doc in pending:
+        new_hash = doc.get("content_hash")
+        if new_hash is not None:
+            if _id not in existing_hashes:
+                stats["inserted"] += 1
+            elif existing_hashes[_id] == new_hash:
+                stats["unchanged"] += 1
+                if touch_unchanged and doc.get("run_id") is not None:
+                    ops.append(UpdateOne({"_id": _id}, {"$set": {"last_seen_run": doc["run_id"]}}))
+                continue
+            else:
+                stats["changed"] += 1
+            if doc.get("run_id") is not None:
+                doc = {**doc, "last_seen_run": doc["run_id"]}
+        ops.append(UpdateOne({"_id": _id}, {"$set": doc}, upsert=True))
+    return ops
+
+
+def _hashed_ids(pending: List[Tuple[Any, Dict[str, Any]]]) -> List[Any]:
+    return [_id for _id, doc in pending if doc.get("content_hash") is not None]
+
+
+def _lock_filter(name: str, owner: str, now: dt.datetime) -> Dict[str, Any]:
+    """Match the lock if it is free to take: expired, or already ours."""
+    return {"_id": name, "$or": [{"owner": owner}, {"expires_at": {"$lte": now}}]}
+
+
+def _lock_update(owner: str, now: dt.datetime, ttl_seconds: float) -> Dict[str, Any]:
+    return {
+        "$set": {"owner": owner, "renewed_at": now, "expires_at": now + dt.timedelta(seconds=ttl_seconds)},
+        "$setOnInsert": {"acquired_at": now},
+    }
+
+
+def _record_bulk_result(stats: Dict[str, Any], result: Any) -> None:
+    stats["upserted"] += result.upserted_count
+    stats["modified"] += result.modified_count
+    stats["matched"] += result.matched_count
+
+
+def _record_bulk_error(stats: Dict[str, Any], collection_name: str, batch_num: int, size: int, error: BulkWriteError) -> None:
+    details = error.details or {}
+    write_errors = details.get("writeErrors") or []
+    stats["upserted"] += int(details.get("nUpserted") or 0)
+    stats["modified"] += int(details.get("nModified") or 0)
+    stats["matched"] += int(details.get("nMatched") or 0)
+    stats["failed"] += len(write_errors)
+    first = write_errors[0].get("errmsg") if write_errors else str(error)
+    stats["errors"].append({"batch": batch_num, "size": size, "failed": len(write_errors), "error": first})
+    logger.warning(
+        "Bulk upsert batch %s into %s: %s/%s writes failed (first error: %s)",
+        batch_num,
+        collection_name,
+        len(write_errors),
+        size,
+        first,
+    )
+
+
+class BulkWriteFailed(RuntimeError):
+    """Some bulk_write batches of an endpoint failed; its paging checkpoint stops before them."""
+
+    def __init__(self, collection: str, batches: int):
+        super().__init__(f"{batches} bulk write batch(es) into {collection} failed; resume to refetch them")
+        self.collection = collection
+        self.batches = batches
+
+
+class _BulkBuffer:
+    """Buffering, hash-skip planning and accounting shared by `BulkUpserter` and
+    `AsyncBulkUpserter`; the subclasses only read hashes and run `bulk_write`."""
+
+    def __init__(
+        self,
+        collection: Any,
+        *,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+        max_bytes: int = DEFAULT_BULK_MAX_BYTES,
+        stats: Optional[Dict[str, Any]] = None,
+        touch_unchanged: bool = True,
+    ):
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.max_bytes = max(1, max_bytes)
+        self.stats = stats if stats is not None else _empty_write_stats()
+        self.touch_unchanged = touch_unchanged
+        self._pending: List[Tuple[Any, Dict[str, Any]]] = []
+        self._bytes = 0
+        # Batches of this upserter with write errors; checkpoints must not move past them.
+        self.failed_batches = 0
+
+    def _buffer(self, _id: Any, doc: Dict[str, Any]) -> bool:
+        """Queue one doc; True once the batch is full and should be flushed."""
+        self._pending.append((_id, doc))
+        self._bytes += len(bson.encode(doc))
+        self.stats["docs"] += 1
+        return len(self._pending) >= self.batch_size or self._bytes >= self.max_bytes
+
+    def _take(self) -> List[Tuple[Any, Dict[str, Any]]]:
+        pending, self._pending, self._bytes = self._pending, [], 0
+        return pending
+
+    def _plan(self, pending: List[Tuple[Any, Dict[str, Any]]], existing: Dict[Any, Any]) -> Tuple[List[UpdateOne], int]:
+        """The batch's ops and batch number (0 when there is nothing to write)."""
+        ops = _plan_bulk_ops(pending, existing, self.stats, touch_unchanged=self.touch_unchanged)
+        if not ops:
+            return ops, 0
+        self.stats["batches"] += 1
+        return ops, self.stats["batches"]
+
+    def _record_error(self, batch_num: int, size: int, error: BulkWriteError) -> None:
+        self.failed_batches += 1
+        _record_bulk_error(self.stats, self.collection.name, batch_num, size, error)
+
+
+class BulkUpserter(_BulkBuffer):
+    """Buffer `$set` upserts for one collection and flush them via unordered bulk_write.
+
+    A batch is flushed when it reaches `batch_size` documents or `max_bytes` of
+    BSON. Failures are reported per batch (in `stats["errors"]`) instead of
+    aborting the run, since an unordered bulk write still applies the rest.
+    Docs carrying a `content_hash` are compared with the stored hash first and
+    skipped when unchanged. Safe to share between writer threads.
+    """
+
+    def __init__(self, collection: Collection, **kwargs: Any):
+        super().__init__(collection, **kwargs)
+        self._lock = threading.RLock()
+
+    def add(self, _id: Any, doc: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._buffer(_id, doc):
+                self.flush()
+
+    def add_many(self, docs: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        for _id, doc in docs:
+            self.add(_id, doc)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._pending:
+            return
+        pending = self._take()
+        started = time.monotonic()
+        existing: Dict[Any, Any] = {}
+        hashed_ids = _hashed_ids(pending)
+        if hashed_ids:
+            cursor = self.collection.find({"_id": {"$in": hashed_ids}}, {"content_hash": 1})
+            existing = {doc["_id"]: doc.get("content_hash") for doc in cursor}
+        ops, batch_num = self._plan(pending, existing)
+        if not ops:
+            record_write(0, time.monotonic() - started)
+            return
+        try:
+            result = self.collection.bulk_write(ops, ordered=False)
+            _record_bulk_result(self.stats, result)
+        except BulkWriteError as e:
+            self._record_error(batch_num, len(ops), e)
+        finally:
+            record_write(len(ops), time.monotonic() - started)
+
+    def close(self) -> Dict[str, Any]:
+        self.flush()
+        return self.stats
+
+    def __enter__(self) -> "BulkUpserter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # Flush what we have even on failure; the docs are already fetched.
+        self.close()
+
 
 class MongoStorage:
-    def __init__(self, mongo_uri: str, db_name: str):
+    def __init__(
+        self,
+        mongo_uri: str,
+        db_name: str,
+        *,
+        bulk_batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+        bulk_max_bytes: int = DEFAULT_BULK_MAX_BYTES,
+        touch_unchanged: bool = True,
+    ):
         self.client = MongoClient(mongo_uri)
-        self.db: Database = self.client[db_name]
+        self.base_db: Database = self.client[db_name]
+        # Staged collections resolve to the generation set by `use_generation`.
+        self.db = GenerationDb(self.base_db, base_generation()["collections"])
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_max_bytes = bulk_max_bytes
+        self.touch_unchanged = touch_unchanged
+        self.write_stats: Dict[str, Dict[str, Any]] = {}
+
+    def close(self) -> None:
+        self.client.close()
+
+    # --- generations (see generations.py) ---
+    def use_generation(self, generation: Dict[str, Any]) -> None:
+        self.db = GenerationDb(self.base_db, generation["collections"])
+
+    def drop_collections(self, names: List[str]) -> None:
+        for name in names:
+            self.base_db.drop_collection(name)
 
     def ensure_indexes(self) -> None:
         # auth_tokens
@@ -35,6 +295,11 @@ class MongoStorage:
         self.db.scores_by_driver.create_index([("_id", ASCENDING)])
 
         self.db.ingestion_runs.create_index([("_id", ASCENDING)])
+        self.db.http_cache.create_index([("_id", ASCENDING)])
+        self.db.locks.create_index([("_id", ASCENDING)])
+
+        for name, keys in INDEXES:
+            self.db[name].create_index(list(keys))
 
     # --- auth token cache ---
     def get_cached_bearer(self, cache_id: str) -> Optional[str]:
@@ -60,7 +325,107 @@ class MongoStorage:
         state["updated_at"] = dt.datetime.utcnow()
         self.db.sync_state.update_one({"_id": key}, {"$set": state}, upsert=True)
 
+    # --- http response cache ---
+    def get_http_cache(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.db.http_cache.find_one({"_id": key})
+
+    def set_http_cache(self, key: str, entry: Dict[str, Any]) -> None:
+        entry = dict(entry)
+        entry["_id"] = key
+        entry["updated_at"] = dt.datetime.utcnow()
+        self.db.http_cache.update_one({"_id": key}, {"$set": entry}, upsert=True)
+
+    # --- lease locks ---
+    def acquire_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = dt.datetime.utcnow()
+        try:
+            doc = self.db.locks.find_one_and_update(
+                _lock_filter(name, owner, now),
+                _lock_update(owner, now, ttl_seconds),
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            # Held by someone else: the filter did not match, so the upsert collided on _id.
+            return False
+        return bool(doc) and doc.get("owner") == owner
+
+    def renew_lock(self, name: str, owner: str, ttl_seconds: float) -> bool:
+        now = dt.datetime.utcnow()
+        result = self.db.locks.update_one(
+            {"_id": name, "owner": owner},
+            {"$set": {"renewed_at": now, "expires_at": now + dt.timedelta(seconds=ttl_seconds)}},
+        )
+        return result.matched_count == 1
+
+    def release_lock(self, name: str, owner: str) -> None:
+        self.db.locks.delete_one({"_id": name, "owner": owner})
+
+    # --- manager x question aggregates ---
+    def refresh_manager_question_agg(self, *, rebuild: bool = False) -> Dict[str, int]:
+        """Fold answers marked `agg_pending` into the daily buckets (see aggregates.py).
+
+        With `rebuild`, or before the first build, the buckets are dropped and
+        every stored answer is aggregated again.
+        """
+        refresh = AggRefresh(self.get_state(AGG_STATE), rebuild=rebuild)
+        if refresh.rebuild:
+            self.db[AGG_COLLECTION].delete_many({})
+            self.db.answers_export.update_many({}, REQUEUE_ANSWERS)
+        while True:
+            answers = list(self.db.answers_export.find(PENDING_ANSWERS, ANSWER_PROJECTION).limit(self.bulk_batch_size))
+            if not answers:
+                break
+            employees = self.db.employees.find(refresh.employee_filter(answers), AGG_EMPLOYEE_PROJECTION)
+            bucket_ops, answer_ops = refresh.writes(answers, employees)
+            if bucket_ops:
+                self.db[AGG_COLLECTION].bulk_write(bucket_ops, ordered=False)
+            self.db.answers_export.bulk_write(answer_ops, ordered=False)
+        self.set_state(AGG_STATE, refresh.finished_state(dt.datetime.utcnow()))
+        return refresh.stats
+
+    def refold_moved_employees(self, managers: Dict[Any, Optional[str]]) -> int:
+        """Queue the answers of employees whose manager differs from the stored one (see `moved_employee_ids`).
+
+        Called with a page of employees before it is upserted; returns how many
+        answers were queued for the next manager_question_agg refresh.
+        """
+        if not managers:
+            return 0
+        stored = self.db.employees.find({"_id": {"$in": list(managers)}}, AGG_EMPLOYEE_PROJECTION)
+        moved = moved_employee_ids(stored, managers)
+        if not moved:
+            return 0
+        return self.db.answers_export.update_many({"norm.employee_id": {"$in": moved}}, REFOLD_ANSWERS).modified_count
+
+    # --- org snapshots ---
+    def write_org_snapshot(self, run_id: str, *, keep: int = ORG_SNAPSHOTS_KEPT, publish: bool = True) -> Dict[str, int]:
+        """Build the org tree from the stored employees and store it as the snapshot of `run_id`.
+
+        The sync_state pointer moves to the new snapshot only once all of it is
+        written (a staged run passes `publish=False` and moves it when its
+        generation is published); snapshots older than the newest `keep` are
+        deleted, except the one the pointer names.
+        """
+        header, nodes = org_snapshot_docs(run_id, list(self.db.employees.find({}, EMPLOYEE_PROJECTION)))
+        self.db[ORG_SNAPSHOT_NODES].delete_many({"run_id": run_id})
+        for start in range(0, len(nodes), self.bulk_batch_size):
+            self.db[ORG_SNAPSHOT_NODES].insert_many(nodes[start : start + self.bulk_batch_size], ordered=False)
+        self.db[ORG_SNAPSHOTS].replace_one({"_id": run_id}, header, upsert=True)
+        if publish:
+            self.set_state(ORG_SNAPSHOT_STATE, {"run_id": run_id})
+
+        headers = self.db[ORG_SNAPSHOTS].find({}, {"_id": 1, "created_at": 1})
+        stale = stale_snapshot_ids(headers, keep=keep, served=self.get_state(ORG_SNAPSHOT_STATE).get("run_id"))
+        if stale:
+            self.db[ORG_SNAPSHOT_NODES].delete_many({"run_id": {"$in": stale}})
+            self.db[ORG_SNAPSHOTS].delete_many({"_id": {"$in": stale}})
+        return {"nodes": len(nodes), "pruned": len(stale)}
+
     # --- upserts ---
+    def has_documents(self, collection: str) -> bool:
+        return self.db[collection].find_one({}, {"_id": 1}) is not None
+
     def upsert_doc(self, collection: str, _id: Any, doc: Dict[str, Any]) -> None:
         self.db[collection].update_one(
             {"_id": _id},
@@ -68,6 +433,17 @@ class MongoStorage:
             upsert=True,
         )
 
+    def bulk_upserter(self, collection: str) -> BulkUpserter:
+        """Return a buffered upserter; counts accumulate in `write_stats[collection]`."""
+        stats = self.write_stats.setdefault(collection, _empty_write_stats())
+        return BulkUpserter(
+            self.db[collection],
+            batch_size=self.bulk_batch_size,
+            max_bytes=self.bulk_max_bytes,
+            stats=stats,
+            touch_unchanged=self.touch_unchanged,
+        )
+
     def record_run_start(self, run_id: str) -> None:
         self.db.ingestion_runs.update_one(
             {"_id": run_id},
@@ -81,3 +457,6 @@ class MongoStorage:
             {"$set": {"finished_at": dt.datetime.utcnow(), "status": status, "stats": stats}},
             upsert=True,
         )
+
+    def get_latest_run(self) -> Optional[Dict[str, Any]]:
+        return self.db.ingestion_runs.find_one({}, {"stats": 0}, sort=[("started_at", DESCENDING)])
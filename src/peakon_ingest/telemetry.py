@@ -0,0 +1,337 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the request latency histogram; +Inf is implicit.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage the current task works for; set by `run_stages` and inherited by the tasks it spawns.
+current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("peakon_ingest_stage", default="run")
+# Telemetry of the ingest run in progress; the record_* helpers are no-ops without one.
+current_telemetry: contextvars.ContextVar[Optional["Telemetry"]] = contextvars.ContextVar(
+    "peakon_ingest_telemetry", default=None
+)
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water mark of the process RSS (ru_maxrss is KiB on Linux)."""
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class Histogram:
+    buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    counts: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    total: float = 0.0
+    count: int = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.count += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        return {"buckets": dict(zip(labels, self.counts)), "sum": round(self.total, 3), "count": self.count}
+
+
+@dataclass
+class StageMetrics:
+    requests: int = 0
+    bytes: int = 0
+    status: Dict[str, int] = field(default_factory=dict)
+    retries: int = 0
+    unauthorized: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    latency: Histogram = field(default_factory=Histogram)
+    pages: int = 0
+    items: int = 0
+    write_batches: int = 0
+    write_ops: int = 0
+    mongo_seconds: float = 0.0
+    duration_s: Optional[float] = None
+    peak_rss_bytes: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "bytes": self.bytes,
+            "status": dict(self.status),
+            "retries": self.retries,
+            "unauthorized": self.unauthorized,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "latency_s": self.latency.as_dict(),
+            "pages": self.pages,
+            "items": self.items,
+            "write_batches": self.write_batches,
+            "write_ops": self.write_ops,
+            "mongo_seconds": round(self.mongo_seconds, 3),
+            "duration_s": self.duration_s,
+            "peak_rss_bytes": self.peak_rss_bytes,
+        }
+
+
+class Telemetry:
+    """Per-stage request, paging and Mongo write metrics for one ingest run.
+
+    Observations are attributed to `current_stage`. When `parent` is given
+    (the daemon's process-wide registry) every observation is forwarded to it,
+    so the Prometheus endpoint sees totals across runs. Thread-safe, since the
+    sync storage backend writes from worker threads.
+    """
+
+    def __init__(self, parent: Optional["Telemetry"] = None):
+        self.parent = parent
+        self.stages: Dict[str, StageMetrics] = {}
+        self._lock = threading.Lock()
+        self.last_run: Dict[str, Any] = {}
+
+    def _stage(self, name: str) -> StageMetrics:
+        metrics = self.stages.get(name)
+        if metrics is None:
+            metrics = self.stages[name] = StageMetrics()
+        return metrics
+
+    def observe_request(self, stage: str, status: int, seconds: float, nbytes: int) -> None:
+        with self._lock:
+            m = self._stage(stage)
+            m.requests += 1
+            m.bytes += nbytes
+            m.status[str(status)] = m.status.get(str(status), 0) + 1
+            m.latency.observe(seconds)
+            if status == 401:
+                m.unauthorized += 1
+            elif status == 429:
+                m.throttled += 1
+            elif status >= 500:
+                m.server_errors += 1
+        if self.parent is not None:
+            self.parent.observe_request(stage, status, seconds, nbytes)
+
+    def observe_retry(self, stage: str) -> None:
+        with self._lock:
+            self._stage(stage).retries += 1
+        if self.parent is not None:
+            self.parent.observe_retry(stage)
+
+    def observe_page(self, stage: str, items: int) -> None:
+        with self._lock:
+            m = self._stage(stage)
+            m.pages += 1
+            m.items += items
+        if self.parent is not None:
+            self.parent.observe_page(stage, items)
+
+    def observe_write(self, stage: str, ops: int, seconds: float) -> None:
+        with self._lock:
+            m = self._stage(stage)
+            m.write_batches += 1
+            m.write_ops += ops
+            m.mongo_seconds += seconds
+        if self.parent is not None:
+            self.parent.observe_write(stage, ops, seconds)
+
+    def observe_stage_end(self, stage: str, duration_s: float) -> None:
+        with self._lock:
+            m = self._stage(stage)
+            m.duration_s = duration_s
+            # Process-wide high-water mark when the stage ended; stages overlap, so this bounds their peak.
+            m.peak_rss_bytes = peak_rss_bytes()
+        if self.parent is not None:
+            self.parent.observe_stage_end(stage, duration_s)
+
+    def finish_run(self, run_id: str, status: str, duration_s: float) -> None:
+        self.last_run = {"run_id": run_id, "status": status, "duration_s": duration_s, "finished_at": time.time()}
+        if self.parent is not None:
+            self.parent.finish_run(run_id, status, duration_s)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {name: m.as_dict() for name, m in self.stages.items()},
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
+
+
+def record_request(status: int, seconds: float, nbytes: int) -> None:
+    telemetry = current_telemetry.get()
+    if telemetry is not None:
+        telemetry.observe_request(current_stage.get(), status, seconds, nbytes)
+
+
+def record_retry() -> None:
+    telemetry = current_telemetry.get()
+    if telemetry is not None:
+        telemetry.observe_retry(current_stage.get())
+
+
+def record_page(items: int) -> None:
+    telemetry = current_telemetry.get()
+    if telemetry is not None:
+        telemetry.observe_page(current_stage.get(), items)
+
+
+def record_write(ops: int, seconds: float) -> None:
+    telemetry = current_telemetry.get()
+    if telemetry is not None:
+        telemetry.observe_write(current_stage.get(), ops, seconds)
+
+
+def record_stage_end(stage: str, duration_s: float) -> None:
+    telemetry = current_telemetry.get()
+    if telemetry is not None:
+        telemetry.observe_stage_end(stage, duration_s)
+
+
+# --- Prometheus text exposition ---
+
+def _labels(**labels: str) -> str:
+    inner = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    return "{" + inner + "}" if inner else ""
+
+
+def render_prometheus(telemetry: Telemetry) -> str:
+    """Render `telemetry` in the Prometheus text format (version 0.0.4)."""
+    lines: List[str] = []
+
+    def metric(name: str, kind: str, help_text: str, samples: List[Tuple[str, Any]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix_labels, value in samples:
+            lines.append(f"{name}{suffix_labels} {value}")
+
+    with telemetry._lock:
+        stages = dict(telemetry.stages)
+        last_run = dict(telemetry.last_run)
+
+    metric(
+        "peakon_ingest_http_requests_total",
+        "counter",
+        "Peakon API responses by stage and status code.",
+        [(_labels(stage=s, status=code), n) for s, m in stages.items() for code, n in sorted(m.status.items())],
+    )
+    metric(
+        "peakon_ingest_http_response_bytes_total",
+        "counter",
+        "Peakon API response body bytes.",
+        [(_labels(stage=s), m.bytes) for s, m in stages.items()],
+    )
+    metric(
+        "peakon_ingest_http_retries_total",
+        "counter",
+        "Peakon API requests retried after an error.",
+        [(_labels(stage=s), m.retries) for s, m in stages.items()],
+    )
+    histogram: List[Tuple[str, Any]] = []
+    for s, m in stages.items():
+        cumulative = 0
+        for bound, count in zip([str(b) for b in m.latency.buckets] + ["+Inf"], m.latency.counts):
+            cumulative += count
+            histogram.append((_labels(stage=s, le=bound), cumulative))
+    lines.append("# HELP peakon_ingest_http_request_duration_seconds Peakon API request latency.")
+    lines.append("# TYPE peakon_ingest_http_request_duration_seconds histogram")
+    for labels, value in histogram:
+        lines.append(f"peakon_ingest_http_request_duration_seconds_bucket{labels} {value}")
+    for s, m in stages.items():
+        lines.append(f"peakon_ingest_http_request_duration_seconds_sum{_labels(stage=s)} {round(m.latency.total, 6)}")
+        lines.append(f"peakon_ingest_http_request_duration_seconds_count{_labels(stage=s)} {m.latency.count}")
+    metric(
+        "peakon_ingest_pages_total",
+        "counter",
+        "Paginated pages fetched.",
+        [(_labels(stage=s), m.pages) for s, m in stages.items()],
+    )
+    metric(
+        "peakon_ingest_mongo_write_batches_total",
+        "counter",
+        "Mongo bulk_write batches.",
+        [(_labels(stage=s), m.write_batches) for s, m in stages.items()],
+    )
+    metric(
+        "peakon_ingest_mongo_write_ops_total",
+        "counter",
+        "Mongo write operations sent in bulk batches.",
+        [(_labels(stage=s), m.write_ops) for s, m in stages.items()],
+    )
+    metric(
+        "peakon_ingest_mongo_seconds_total",
+        "counter",
+        "Time spent in Mongo hash lookups and bulk writes.",
+        [(_labels(stage=s), round(m.mongo_seconds, 6)) for s, m in stages.items()],
+    )
+    metric(
+        "peakon_ingest_stage_duration_seconds",
+        "gauge",
+        "Duration of each stage in the last run.",
+        [(_labels(stage=s), m.duration_s) for s, m in stages.items() if m.duration_s is not None],
+    )
+    rss = peak_rss_bytes()
+    if rss is not None:
+        metric("peakon_ingest_peak_rss_bytes", "gauge", "Peak resident set size of the process.", [("", rss)])
+    if last_run:
+        metric(
+            "peakon_ingest_last_run_success",
+            "gauge",
+            "1 if the last ingest run succeeded.",
+            [("", 1 if last_run["status"] == "success" else 0)],
+        )
+        metric(
+            "peakon_ingest_last_run_duration_seconds",
+            "gauge",
+            "Duration of the last ingest run.",
+            [("", last_run["duration_s"])],
+        )
+        metric(
+            "peakon_ingest_last_run_timestamp_seconds",
+            "gauge",
+            "Unix time the last ingest run finished.",
+            [("", round(last_run["finished_at"], 3))],
+        )
+    return "\n".join(lines) + "\n"
+
+
+def serve_metrics(telemetry: Telemetry, port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve `/metrics` for `telemetry` from a daemon thread; returns the server (call `shutdown()` to stop)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus(telemetry).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("metrics: " + format, *args)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    logger.info("Serving Prometheus metrics on %s:%s/metrics", host, server.server_address[1])
+    return server
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field, field_validator
+
+from .async_storage import open_storage
+from .config import Settings
+from .http import PeakonClient
+from .ingest import ingest_all
+from .lease import LeaseLock
+from .logging_utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+class TenantConfig(BaseModel):
+    """One Peakon company in PEAKON_TENANTS_FILE; unset fields fall back to the environment settings."""
+
+    name: str
+    company_id: int
+    base_url: Optional[str] = None
+    app_token: Optional[str] = None
+    # Read the application token from this environment variable instead of the file.
+    app_token_env: Optional[str] = None
+    # Defaults to peakon_<name>; every tenant gets its own database.
+    mongo_db: Optional[str] = None
+    engagement_groups: Optional[List[str]] = None
+    # Per-tenant concurrency limits
+    max_in_flight: Optional[int] = None
+    max_parallel_stages: Optional[int] = None
+    rate_limit_per_second: Optional[float] = None
+    rate_limit_burst: Optional[int] = None
+    full_sync: Optional[bool] = None
+
+    @field_validator("name")
+    @classmethod
+    def _name_is_db_safe(cls, value: str) -> str:
+        if not value or any(c in value for c in '/\\. "$'):
+            raise ValueError(f"Tenant name {value!r} must be non-empty and usable in a database name")
+        return value
+
+    @property
+    def database(self) -> str:
+        return self.mongo_db or f"peakon_{self.name}"
+
+    def apply(self, settings: Settings) -> Settings:
+        """Return a copy of `settings` for this tenant.
+
+        Raises ValueError when `app_token_env` names an unset variable rather
+        than authenticating as another company with the shared token.
+        """
+        app_token = self.app_token
+        if self.app_token_env:
+            app_token = os.environ.get(self.app_token_env)
+            if not app_token:
+                raise ValueError(f"Tenant {self.name!r}: environment variable {self.app_token_env} is not set")
+        update: Dict[str, Any] = {
+            "peakon_company_id": self.company_id,
+            "mongo_db": self.database,
+            "peakon_app_token": app_token or settings.peakon_app_token,
+        }
+        if self.base_url:
+            update["peakon_base_url"] = self.base_url
+        if self.engagement_groups:
+            update["peakon_engagement_groups"] = ",".join(self.engagement_groups)
+        optional = {
+            "peakon_max_in_flight": self.max_in_flight,
+            "ingest_max_parallel_stages": self.max_parallel_stages,
+            "peakon_rate_limit_per_second": self.rate_limit_per_second,
+            "peakon_rate_limit_burst": self.rate_limit_burst,
+            "full_sync": self.full_sync,
+        }
+        update.update({k: v for k, v in optional.items() if v is not None})
+        return settings.model_copy(update=update)
+
+
+class TenantsFile(BaseModel):
+    tenants: List[TenantConfig] = Field(default_factory=list)
+
+
+def load_tenants(path: str | Path) -> List[TenantConfig]:
+    """Read tenant configs from a JSON file: `{"tenants": [{"name": ..., "company_id": ...}, ...]}`."""
+    tenants = TenantsFile.model_validate(json.loads(Path(path).read_text(encoding="utf-8"))).tenants
+    names = [t.name for t in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate tenant names in {path}: {names}")
+    databases = [t.database for t in tenants]
+    if len(set(databases)) != len(databases):
+        raise ValueError(f"Tenants in {path} must not share a database: {databases}")
+    return tenants
+
+
+def _summary(stats: Dict[str, Any]) -> Dict[str, Any]:
+    """The flat counters of a run's stats (the full stats stay in the tenant's ingestion_runs)."""
+    return {k: v for k, v in stats.items() if isinstance(v, (int, float, str)) and not isinstance(v, bool)}
+
+
+async def _ingest_tenant(settings: Settings) -> Dict[str, Any]:
+    storage = open_storage(settings)
+    client = PeakonClient(
+        base_url=settings.peakon_base_url,
+        app_token=settings.peakon_app_token,
+        timeout_seconds=settings.http_timeout_seconds,
+        requests_per_second=settings.peakon_rate_limit_per_second,
+        burst=settings.peakon_rate_limit_burst,
+        response_cache=storage if settings.peakon_http_cache else None,
+    )
+    lease = LeaseLock(storage, ttl_seconds=settings.schedule_lock_ttl_seconds)
+    try:
+        if not await lease.acquire():
+            return {"status": "skipped", "error": "another ingest holds the lock"}
+        stats = await lease.hold(
+            ingest_all(
+                client,
+                storage,
+                company_id=settings.peakon_company_id,
+                engagement_groups=settings.engagement_groups(),
+                per_page=settings.peakon_per_page,
+                full_sync=settings.full_sync,
+                queue_size=settings.ingest_queue_size,
+                writers=settings.ingest_writers,
+                max_in_flight=settings.peakon_max_in_flight,
+                max_parallel_stages=settings.ingest_max_parallel_stages,
+                stream_chunk_size=settings.stream_chunk_size(),
+                page_size_bounds=settings.page_size_bounds(),
+                staged=settings.ingest_staged,
+            )
+        )
+        return {"status": "success", "error": None, "stats": _summary(stats)}
+    finally:
+        await lease.release()
+        await client.aclose()
+        await storage.aclose()
+
+
+def ingest_tenant(settings: Settings, tenant: TenantConfig) -> Dict[str, Any]:
+    """Ingest one tenant into its own database; runs in a pool worker process.
+
+    Never raises: a failure is returned as `status: failure` so it cannot
+    affect the other tenants.
+    """
+    setup_logging(settings.log_level)
+    result: Dict[str, Any] = {"tenant": tenant.name, "company_id": tenant.company_id, "mongo_db": tenant.database}
+    started = time.monotonic()
+    try:
+        result.update(asyncio.run(_ingest_tenant(tenant.apply(settings))))
+    except Exception as e:
+        logger.exception("Ingest for tenant %s failed: %s", tenant.name, e)
+        result.update({"status": "failure", "error": str(e)})
+    result["duration_s"] = round(time.monotonic() - started, 3)
+    return result
+
+
+def ingest_tenants(
+    settings: Settings,
+    tenants: Sequence[TenantConfig],
+    *,
+    processes: int = 4,
+    runner: Callable[[Settings, TenantConfig], Dict[str, Any]] = ingest_tenant,
+) -> List[Dict[str, Any]]:
+    """Ingest every tenant, at most `processes` at a time, each in its own worker process.
+
+    Workers are spawned rather than forked so they start without the parent's
+    event loop, Mongo clients or threads. Results come back in tenant order.
+    A tenant that fails is reported as such and the others carry on; a worker
+    process that dies outright breaks the pool, so the tenants still pending
+    are reported as failed instead of raising.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(processes, len(tenants) or 1)), mp_context=context) as pool:
+        futures = {pool.submit(runner, settings, tenant): tenant for tenant in tenants}
+        for future in as_completed(futures):
+            tenant = futures[future]
+            try:
+                results[tenant.name] = future.result()
+            except Exception as e:
+                logger.error("Worker for tenant %s crashed: %s", tenant.name, e)
+                results[tenant.name] = {
+                    "tenant": tenant.name,
+                    "company_id": tenant.company_id,
+                    "status": "failure",
+                    "error": str(e),
+                }
+            logger.info("Tenant %s finished: %s", tenant.name, results[tenant.name]["status"])
+    return [results[tenant.name] for tenant in tenants]
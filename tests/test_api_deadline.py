@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from pymongo.errors import ExecutionTimeout, OperationFailure
+
+from peakon_api import main
+
+
+def _failing_db(error):
+    async def get_db():
+        raise error
+
+    return get_db
+
+
+def test_query_timeout_is_reported_as_gateway_timeout(monkeypatch):
+    monkeypatch.setattr(main, "get_db", _failing_db(ExecutionTimeout("operation exceeded time limit", 50)))
+
+    response = TestClient(main.app).get("/employees/facets")
+
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Database query timed out"}
+
+
+def test_other_database_errors_are_not_masked(monkeypatch):
+    monkeypatch.setattr(main, "get_db", _failing_db(OperationFailure("bad query", 2)))
+
+    response = TestClient(main.app, raise_server_exceptions=False).get("/employees/facets")
+
+    assert response.status_code == 500
+
+
+async def test_sync_client_is_shared_and_closed_with_the_app():
+    from peakon_api import db
+
+    db._sync_client.cache_clear()
+    client = db._sync_client()
+    assert db._sync_client() is client
+
+    await db.close_client()
+
+    assert db._sync_client.cache_info().currsize == 0
@@ -0,0 +1,65 @@
+import gzip
+
+import httpx
+import pytest
+import respx
+
+from peakon_ingest.cassette import CassetteRecorder, RecordingTransport, ReplayTransport
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.pagination import paginate_json, paginate_json_chunks
+
+BASE = "https://example.com/api/v1"
+
+
+def _pages(request: httpx.Request) -> httpx.Response:
+    if request.url.params.get("continuation") == "2":
+        return httpx.Response(200, json={"data": [{"id": "3"}], "links": {}})
+    return httpx.Response(
+        200,
+        json={"data": [{"id": "1"}, {"id": "2"}], "links": {"next": f"{BASE}/answers/export?continuation=2&per_page=2"}},
+    )
+
+
+@pytest.mark.asyncio
+async def test_recorded_pages_replay_offline_without_the_bearer_token(tmp_path):
+    recorder = CassetteRecorder(tmp_path, segment_max_bytes=1)
+    client = PeakonClient(BASE, app_token="app-secret", timeout_seconds=2, transport=RecordingTransport(recorder))
+    with respx.mock() as mock:
+        mock.post(f"{BASE}/auth/application").mock(return_value=httpx.Response(200, json={"data": {"id": "live-bearer"}}))
+        mock.get(url__startswith=f"{BASE}/answers/export").mock(side_effect=_pages)
+        recorded = [page async for page in paginate_json(client, "/answers/export", first_params={"per_page": 2})]
+    await client.aclose()
+
+    segments = sorted(tmp_path.glob("segment-*.ndjson.gz"))
+    assert recorder.records == 3 and len(segments) == 3  # tiny segment size: one record each
+    raw = b"".join(gzip.open(path).read() for path in segments)
+    assert b"live-bearer" not in raw and b"app-secret" not in raw
+
+    replay = ReplayTransport(tmp_path)
+    client = PeakonClient(BASE, app_token="replay", timeout_seconds=2, transport=replay)
+    # A different page size still replays the recorded pages.
+    replayed = [page async for page in paginate_json(client, "/answers/export", first_params={"per_page": 500})]
+    streamed = [page async for page in paginate_json_chunks(client, "/answers/export", first_params={"per_page": 2})]
+    await client.aclose()
+
+    assert replayed == recorded
+    assert [item["id"] for page in streamed for item in page["data"]] == ["1", "2", "3"]
+    assert replay.stats["missing"] == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_reports_unrecorded_requests_as_404(tmp_path):
+    recorder = CassetteRecorder(tmp_path)
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2, transport=RecordingTransport(recorder))
+    client.set_bearer("bearer")
+    with respx.mock() as mock:
+        mock.get(f"{BASE}/engagement/drivers").mock(return_value=httpx.Response(200, json={"data": []}))
+        await client.get_json("/engagement/drivers")
+    await client.aclose()
+
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2, transport=ReplayTransport(tmp_path))
+    client.set_bearer("bearer")
+    with pytest.raises(httpx.HTTPStatusError) as exc:
+        await client.get_json("/employees")
+    assert exc.value.response.status_code == 404
+    await client.aclose()
@@ -0,0 +1,122 @@
+import pytest
+
+from peakon_ingest.bench import MemoryStorage, run_benchmark
+from peakon_ingest.generations import (
+    GENERATION_STATE,
+    GenerationDb,
+    base_generation,
+    published_pointer,
+    rolled_back_pointer,
+    shadow_generation,
+)
+from peakon_ingest.mock_peakon import generate_tenant
+from peakon_ingest.org_tree import ORG_SNAPSHOT_STATE
+
+
+def _generation(gen_id):
+    return {"id": gen_id, "collections": {"employees": f"employees__{gen_id}"}}
+
+
+def test_publish_keeps_previous_generations_and_drops_only_unreferenced_collections():
+    pointer, dropped = published_pointer(None, _generation("a"), keep=1)
+    assert pointer["previous"] == [base_generation()] and dropped == []
+
+    pointer, dropped = published_pointer(pointer, _generation("b"), keep=1)
+    assert [g["id"] for g in pointer["previous"]] == ["a"]
+    assert "employees" in dropped and "answers_export" in dropped
+
+    # A generation still using a collection protects it.
+    shared = {"id": "c", "collections": {"employees": "employees__a"}}
+    pointer, dropped = published_pointer(pointer, shared, keep=1)
+    assert dropped == []
+
+
+def test_rollback_swaps_current_and_previous():
+    pointer, _ = published_pointer(None, _generation("a"))
+    pointer, _ = published_pointer(pointer, _generation("b"))
+
+    rolled = rolled_back_pointer(pointer)
+
+    assert rolled["current"]["id"] == "a"
+    assert [g["id"] for g in rolled["previous"]] == ["b", "base"]
+    assert rolled_back_pointer(rolled)["current"]["id"] == "b"
+    with pytest.raises(ValueError):
+        rolled_back_pointer({"current": _generation("a")})
+
+
+def test_generation_db_maps_staged_collections_only():
+    raw = {"employees__x": "shadow employees", "sync_state": "sync state"}
+
+    class _Db:
+        def __getitem__(self, name):
+            return raw[name]
+
+        def __getattr__(self, name):
+            return raw[name]
+
+    db = GenerationDb(_Db(), _generation("x")["collections"])
+
+    assert db.employees == db["employees"] == "shadow employees"
+    assert db.sync_state == db["sync_state"] == "sync state"
+
+
+@pytest.mark.asyncio
+async def test_staged_run_swaps_generation_on_success():
+    tenant = generate_tenant(employees=12, answers=40, span=3, seed=5)
+    storage = MemoryStorage()
+    await run_benchmark(tenant, storage=storage, per_page=20)
+
+    report = await run_benchmark(tenant, storage=storage, per_page=20, staged=True)
+
+    assert report["status"] == "success", report["error"]
+    pointer = storage.collections["sync_state"][GENERATION_STATE]
+    current = pointer["current"]
+    assert current["collections"]["answers_export"] == f"answers_export__{current['id']}"
+    assert len(storage.collections[current["collections"]["answers_export"]]) == 40
+    assert len(storage.collections[current["collections"]["manager_question_daily"]]) > 0
+    assert storage.collections["sync_state"][ORG_SNAPSHOT_STATE]["run_id"] == current["run_id"]
+    # The in-place generation is kept for rollback.
+    assert pointer["previous"][0]["id"] == "base"
+    assert len(storage.collections["answers_export"]) == 40
+
+
+class _FailingSnapshotStorage(MemoryStorage):
+    async def write_org_snapshot(self, run_id, *, keep=3, publish=True):
+        raise RuntimeError("snapshot failed")
+
+
+@pytest.mark.asyncio
+async def test_failed_staged_run_drops_shadows_and_restores_state():
+    tenant = generate_tenant(employees=12, answers=40, span=3, seed=5)
+    storage = _FailingSnapshotStorage()
+
+    report = await run_benchmark(tenant, storage=storage, per_page=20, staged=True)
+
+    assert report["status"] == "failure"
+    assert GENERATION_STATE not in storage.collections.get("sync_state", {})
+    assert not [name for name in storage.collections if "__" in name]
+    assert storage.collections["sync_state"]["answers_export"].get("last_answer_id") is None
+
+
+@pytest.mark.asyncio
+async def test_staged_run_with_an_empty_collection_is_not_published():
+    tenant = generate_tenant(employees=12, answers=40, span=3, seed=5)
+    storage = MemoryStorage()
+    await run_benchmark(tenant, storage=storage, per_page=20)
+    # Peakon (or a cache short-circuit) returns no drivers: the shadow copies stay empty.
+    tenant.drivers = []
+
+    report = await run_benchmark(tenant, storage=storage, per_page=20, staged=True)
+
+    assert report["status"] == "failure"
+    assert "['drivers', 'scores_by_driver']" in report["error"]
+    assert GENERATION_STATE not in storage.collections["sync_state"]
+    assert not [name for name in storage.collections if "__" in name]
+    assert len(storage.collections["drivers"]) > 0
+
+
+def test_shadow_generation_names_are_run_scoped():
+    generation = shadow_generation("1234-abcd")
+
+    assert generation["id"] == "1234abcd"
+    assert generation["collections"]["employees"] == "employees__1234abcd"
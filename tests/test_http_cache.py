@@ -0,0 +1,110 @@
+import httpx
+import pytest
+import respx
+
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ingest import ingest_contexts, ingest_drivers, ingest_scores_by_driver
+
+BASE = "https://example.com/api/v1"
+
+
+class FakeWriter:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def add_many(self, docs):
+        self.docs.extend(_id for _id, _ in docs)
+
+    async def close(self):
+        return {}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.written = {}
+        self.http_cache = {}
+
+    def bulk_upserter(self, collection):
+        return FakeWriter(self.written.setdefault(collection, []))
+
+    async def has_documents(self, collection):
+        return bool(self.written.get(collection))
+
+    async def get_http_cache(self, key):
+        return self.http_cache.get(key)
+
+    async def set_http_cache(self, key, entry):
+        self.http_cache[key] = dict(entry)
+
+
+@pytest.mark.asyncio
+async def test_drivers_are_revalidated_with_etag_and_unchanged_runs_skip_upserts():
+    storage = FakeStorage()
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2, response_cache=storage)
+    client.set_bearer("bearer")
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, headers={"ETag": '"v1"'}, json={"data": [{"id": "d1"}, {"id": "d2"}]})
+
+    with respx.mock() as mock:
+        mock.get(f"{BASE}/engagement/drivers").mock(side_effect=responder)
+        first = await ingest_drivers(client, storage, run_id="r1")
+        second = await ingest_drivers(client, storage, run_id="r2")
+
+    assert first == second == ["d1", "d2"]
+    assert storage.written["drivers"] == ["d1", "d2"]
+    assert client.cache_stats == {"requests": 2, "hits": 1, "not_modified": 1, "unchanged_body": 0, "misses": 1}
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_contexts_fall_back_to_body_hash_and_only_cache_after_write():
+    storage = FakeStorage()
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2, response_cache=storage)
+    client.set_bearer("bearer")
+    bodies = {"engagement": {"data": [{"id": "c1", "attributes": {"scores": {"time": "t", "mean": 7}}}]}}
+
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/scores/contexts/").mock(
+            side_effect=lambda request: httpx.Response(200, json=bodies["engagement"])
+        )
+        assert await ingest_contexts(client, storage, company_id=1, engagement_groups=["engagement"], run_id="r1") == 1
+        assert len(storage.http_cache) == 1
+        assert await ingest_contexts(client, storage, company_id=1, engagement_groups=["engagement"], run_id="r2") == 0
+
+        bodies["engagement"]["data"][0]["attributes"]["scores"]["mean"] = 8
+        assert await ingest_contexts(client, storage, company_id=1, engagement_groups=["engagement"], run_id="r3") == 1
+
+    assert client.cache_stats["unchanged_body"] == 1
+    assert client.cache_stats["misses"] == 2
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cache_is_kept_per_collection_and_bypassed_on_full_sync_or_empty_collection():
+    storage = FakeStorage()
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2, response_cache=storage)
+    client.set_bearer("bearer")
+    body = {"data": [{"id": "c1", "attributes": {"scores": {"time": "t", "mean": 7}}}]}
+
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/scores/contexts/").mock(
+            side_effect=lambda request: httpx.Response(200, headers={"ETag": '"v1"'}, json=body)
+        )
+        # The same URL feeds scores_contexts (group) and scores_by_driver (driver): both write.
+        assert await ingest_contexts(client, storage, company_id=1, engagement_groups=["engagement"], run_id="r1") == 1
+        assert await ingest_scores_by_driver(client, storage, company_id=1, driver_ids=["engagement"], run_id="r1") == 1
+        assert len(storage.http_cache) == 2
+
+        # Unchanged, but a full sync writes anyway...
+        assert await ingest_contexts(
+            client, storage, company_id=1, engagement_groups=["engagement"], run_id="r2", full_sync=True
+        ) == 1
+        # ...and so does a run whose collection is empty (e.g. dropped).
+        storage.written["scores_by_driver"] = []
+        assert await ingest_scores_by_driver(client, storage, company_id=1, driver_ids=["engagement"], run_id="r3") == 1
+        assert await ingest_scores_by_driver(client, storage, company_id=1, driver_ids=["engagement"], run_id="r4") == 0
+
+    await client.aclose()
@@ -0,0 +1,86 @@
+import re
+
+from peakon_ingest.indexes import INDEXES, advise, representative_queries, summarize_explain
+from peakon_ingest.normalize import employee_filter_query
+
+
+class _Collection:
+    def __init__(self, name):
+        self.name = name
+
+    def find_one(self, query=None, projection=None):
+        return None
+
+
+class _Db:
+    def __init__(self, explains=None):
+        self.explains = explains or {}
+        self.commands = []
+
+    def __getitem__(self, name):
+        return _Collection(name)
+
+    def __getattr__(self, name):
+        return _Collection(name)
+
+    def command(self, name, command, verbosity=None):
+        self.commands.append((name, command, verbosity))
+        collection = command.get("find") or command.get("distinct")
+        if collection not in self.explains:
+            raise RuntimeError("no explain")
+        return self.explains[collection]
+
+
+def _range_or_equality_fields(filter_query):
+    return [field for field in filter_query if not field.startswith("$")]
+
+
+def test_every_representative_query_has_an_index_prefix():
+    declared = {(collection, tuple(field for field, _ in keys)) for collection, keys in INDEXES}
+
+    for query in representative_queries(_Db()):
+        fields = tuple(_range_or_equality_fields(query["filter"])) or tuple(f for f, _ in query.get("sort", []))
+        assert any(
+            collection == query["collection"] and keys[: len(fields)] == fields for collection, keys in declared
+        ), query["endpoint"]
+
+
+def test_employee_probes_are_the_queries_the_api_sends():
+    probes = {query["endpoint"]: query["filter"] for query in representative_queries(_Db())}
+
+    # The API matches departments case-insensitively by substring, not exactly.
+    assert probes["/employees?department"] == employee_filter_query("-", None, None)
+    assert probes["/employees?department"]["norm.department"]["$in"][0].flags & re.IGNORECASE
+    assert probes["/employees?sub_department"] == employee_filter_query(None, "-", None)
+
+
+def test_summarize_explain_flags_collscan_and_ratio():
+    summary = summarize_explain(
+        {
+            "queryPlanner": {"winningPlan": {"queryPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}},
+            "executionStats": {"nReturned": 4, "totalDocsExamined": 400, "totalKeysExamined": 0},
+        }
+    )
+
+    assert summary["stages"] == ["SORT", "COLLSCAN"]
+    assert summary["collscan"] is True
+    assert summary["examined_ratio"] == 100.0
+
+
+def test_advise_reports_index_use_and_explain_errors():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "norm.manager_id_1"}}
+        },
+        "executionStats": {"nReturned": 3, "totalDocsExamined": 3, "totalKeysExamined": 3},
+    }
+    db = _Db({"employees": explain})
+    queries = [q for q in representative_queries(db) if q["collection"] in ("employees", "ingestion_runs")]
+
+    report = advise(db, queries)
+
+    employees = [row for row in report if row["collection"] == "employees"]
+    assert all(not row["collscan"] and row["examined_ratio"] == 1.0 for row in employees)
+    assert employees[0]["indexes"] == ["norm.manager_id_1"]
+    assert "error" in [row for row in report if row["collection"] == "ingestion_runs"][0]
+    assert all(verbosity == "executionStats" for _, _, verbosity in db.commands)
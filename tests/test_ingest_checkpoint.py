@@ -0,0 +1,175 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from peakon_ingest.async_storage import AsyncBulkUpserter
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ingest import ingest_answers_export
+from peakon_ingest.storage import BulkWriteFailed
+
+BASE = "https://example.com/api/v1"
+
+
+class FakeWriter:
+    def __init__(self, docs, flushed, fail_ids=()):
+        self.docs = docs
+        self.flushed = flushed
+        self.buffer = {}
+        self.fail_ids = set(fail_ids)
+        self.failed_batches = 0
+
+    async def add_many(self, docs):
+        self.buffer.update(docs)
+        if self.fail_ids & set(self.buffer):
+            self.failed_batches += 1
+            self.buffer = {k: v for k, v in self.buffer.items() if k not in self.fail_ids}
+
+    async def flush(self):
+        self.flushed.update(self.buffer)
+        self.docs.update(self.buffer)
+        self.buffer = {}
+
+    async def close(self):
+        await self.flush()
+        return {}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.docs = {}
+        self.flushed = {}
+        self.state = {}
+        self.checkpoints = []
+        self.fail_ids = set()
+
+    def bulk_upserter(self, collection):
+        return FakeWriter(self.docs, self.flushed, self.fail_ids)
+
+    async def get_state(self, key):
+        return dict(self.state.get(key, {"_id": key}))
+
+    async def set_state(self, key, state):
+        if "checkpoint" in state and not state["checkpoint"]["done"]:
+            # Everything the checkpoint claims must already be flushed.
+            assert len(self.flushed) >= state["checkpoint"]["items"]
+            self.checkpoints.append(state["checkpoint"]["next_url"])
+        self.state.setdefault(key, {"_id": key}).update(state)
+
+
+def _answers(page):
+    return [{"id": str(page * 10 + i), "attributes": {"answerId": page * 10 + i}} for i in range(2)]
+
+
+def _responder(fail_page=None):
+    requested = []
+
+    def respond(request: httpx.Request) -> httpx.Response:
+        page = int(request.url.params.get("page", "1"))
+        requested.append(page)
+        if page == fail_page:
+            return httpx.Response(400, json={"error": "boom"})
+        links = {"next": f"{BASE}/answers/export?page={page + 1}&per_page=2"} if page < 3 else {}
+        return httpx.Response(200, json={"data": _answers(page), "links": links})
+
+    return respond, requested
+
+
+@pytest.mark.asyncio
+async def test_answers_export_checkpoints_pages_and_resumes_failed_run():
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+    storage = FakeStorage()
+
+    respond, requested = _responder(fail_page=3)
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/answers/export").mock(side_effect=respond)
+        with pytest.raises(httpx.HTTPStatusError):
+            await ingest_answers_export(
+                client, storage, per_page=2, full_sync=True, run_id="run-1", stream_chunk_size=1
+            )
+
+    checkpoint = storage.state["answers_export"]["checkpoint"]
+    assert checkpoint["run_id"] == "run-1"
+    assert checkpoint["next_url"].endswith("page=3&per_page=2")
+    assert (checkpoint["pages"], checkpoint["items"], checkpoint["max_id"]) == (2, 4, 21)
+    assert storage.checkpoints == [f"{BASE}/answers/export?page=2&per_page=2", f"{BASE}/answers/export?page=3&per_page=2"]
+
+    respond, requested = _responder()
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/answers/export").mock(side_effect=respond)
+        count, last_id, _ = await ingest_answers_export(
+            client, storage, per_page=2, full_sync=True, run_id="run-2", resume_run_id="run-1"
+        )
+
+    assert requested == [3]
+    assert (count, last_id) == (6, 31)
+    assert set(storage.docs) == {10, 11, 20, 21, 30, 31}
+    state = storage.state["answers_export"]
+    assert state["last_answer_id"] == 31
+    assert state["checkpoint"]["done"] is True
+    assert state["checkpoint"]["run_id"] == "run-2"
+
+    # Resuming a run whose endpoint had completed skips it.
+    count, _, pipeline = await ingest_answers_export(
+        client, storage, per_page=2, full_sync=True, run_id="run-3", resume_run_id="run-2"
+    )
+    assert (count, pipeline) == (6, {"resumed": "done"})
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_failed_write_batch_blocks_the_checkpoint_and_fails_the_stage():
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+    storage = FakeStorage()
+    storage.fail_ids.add(20)
+
+    respond, _ = _responder()
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/answers/export").mock(side_effect=respond)
+        with pytest.raises(BulkWriteFailed):
+            await ingest_answers_export(client, storage, per_page=2, full_sync=True, run_id="run-1")
+
+    # Page 1 was written cleanly; page 2 had a failed doc, so nothing after it is checkpointed.
+    assert storage.checkpoints == [f"{BASE}/answers/export?page=2&per_page=2"]
+    assert "last_answer_id" not in storage.state["answers_export"]
+    await client.aclose()
+
+
+class SlowBulkCollection:
+    name = "answers_export"
+
+    def __init__(self):
+        self.written = []
+        self.release = asyncio.Event()
+
+    async def bulk_write(self, ops, ordered=True):
+        ids = [op._filter["_id"] for op in ops]
+        if 1 in ids:
+            await self.release.wait()  # the first batch is slow
+        self.written.append(ids)
+
+        class Result:
+            upserted_count = len(ops)
+            modified_count = matched_count = 0
+
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_async_flush_waits_for_batches_other_writers_started():
+    coll = SlowBulkCollection()
+    writer = AsyncBulkUpserter(coll, batch_size=2)
+
+    first = asyncio.create_task(writer.add_many([(1, {"_id": 1}), (2, {"_id": 2})]))
+    await asyncio.sleep(0)
+    await writer.add(3, {"_id": 3})
+    flushed = asyncio.create_task(writer.flush())
+    await asyncio.sleep(0.01)
+
+    assert not flushed.done()  # batch [1, 2] is still in bulk_write
+    coll.release.set()
+    await asyncio.gather(first, flushed)
+    assert sorted(coll.written) == [[1, 2], [3]]
@@ -0,0 +1,100 @@
+import asyncio
+
+import httpx
+import pytest
+import respx
+
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ingest import ingest_contexts, ingest_scores_by_driver
+
+BASE = "https://example.com/api/v1"
+
+
+class FakeWriter:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def add_many(self, docs):
+        for _id, doc in docs:
+            self.docs[_id] = doc
+
+    async def close(self):
+        return {}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.collections = {}
+
+    def bulk_upserter(self, collection):
+        return FakeWriter(self.collections.setdefault(collection, {}))
+
+
+def _score_payload(group):
+    return {"data": [{"id": f"ctx-{group}", "attributes": {"scores": {"time": "2026-01-01", "mean": 7}}}]}
+
+
+@pytest.mark.asyncio
+async def test_scores_by_driver_fans_out_with_concurrency_limit_and_skips_422():
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+    storage = FakeStorage()
+    in_flight = 0
+    peak = 0
+
+    async def responder(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        driver_id = request.url.path.rsplit("/", 1)[-1]
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        if driver_id == "bad":
+            return httpx.Response(422, json={"error": "unsupported"})
+        return httpx.Response(200, json=_score_payload(driver_id))
+
+    with respx.mock() as mock:
+        mock.route(method="GET", url__startswith=f"{BASE}/scores/contexts/company_1/group/").mock(side_effect=responder)
+        count = await ingest_scores_by_driver(
+            client,
+            storage,
+            company_id=1,
+            driver_ids=["d1", "d2", "bad", "d3", "d4", "d5"],
+            run_id="run",
+            max_in_flight=2,
+        )
+
+    assert count == 5
+    assert peak == 2
+    assert set(storage.collections["scores_by_driver"]) == {f"d{i}::ctx-d{i}::2026-01-01" for i in range(1, 6)}
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_contexts_reauthenticate_once_for_concurrent_401s():
+    client = PeakonClient(BASE, app_token="app", timeout_seconds=2)
+    client.set_bearer("stale")
+    storage = FakeStorage()
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        if request.headers["Authorization"] == "Bearer stale":
+            return httpx.Response(401)
+        group = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json=_score_payload(group))
+
+    with respx.mock() as mock:
+        auth = mock.post(f"{BASE}/auth/application").mock(return_value=httpx.Response(200, json={"data": {"id": "fresh"}}))
+        mock.route(method="GET", url__startswith=f"{BASE}/scores/contexts/company_1/group/").mock(side_effect=responder)
+        count = await ingest_contexts(
+            client,
+            storage,
+            company_id=1,
+            engagement_groups=["engagement", "autonomy", "growth"],
+            run_id="run",
+            max_in_flight=3,
+        )
+
+    assert count == 3
+    assert auth.call_count == 1
+    assert "autonomy::ctx-autonomy::2026-01-01" in storage.collections["scores_contexts"]
+    await client.aclose()
@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from peakon_ingest.json_stream import iter_json_page
+
+
+async def _chunks(raw: bytes, size: int):
+    for i in range(0, len(raw), size):
+        yield raw[i : i + size]
+
+
+async def _collect(raw: bytes, size: int):
+    return [event async for event in iter_json_page(_chunks(raw, size))]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 4096])
+async def test_iter_json_page_yields_items_and_other_members(chunk_size):
+    payload = {
+        "meta": {"count": 12345},
+        "data": [{"id": "1", "attributes": {"answerScore": 10, "comment": "naïve ✓"}}, {"id": "2"}, 3.25],
+        "links": {"next": "https://example.com/api/v1/answers/export?continuation=2"},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, indent=1).encode("utf-8")
+
+    events = await _collect(raw, chunk_size)
+
+    assert events == [
+        ("meta", payload["meta"]),
+        (None, payload["data"][0]),
+        (None, payload["data"][1]),
+        (None, 3.25),
+        ("links", payload["links"]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_iter_json_page_handles_empty_data_and_trailing_number():
+    raw = b'{"data": [], "total": 120}'
+    assert await _collect(raw, 2) == [("total", 120)]
+
+
+@pytest.mark.asyncio
+async def test_iter_json_page_rejects_truncated_body():
+    with pytest.raises(ValueError):
+        await _collect(b'{"data": [{"id": "1"}, {"id"', 4)
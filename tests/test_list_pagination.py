@@ -0,0 +1,171 @@
+import pytest
+from fastapi import HTTPException
+
+from peakon_api import main
+
+
+def _type(value):
+    return "number" if isinstance(value, int) else "string"
+
+
+def _sort_key(value):
+    # Mongo sorts numbers below strings.
+    return (_type(value) == "string", value)
+
+
+class FakeFind:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, key, direction):
+        self.docs = sorted(self.docs, key=lambda doc: _sort_key(doc[key]), reverse=direction < 0)
+        return self
+
+    def skip(self, n):
+        self.docs = self.docs[n:]
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+def _matches(doc, query):
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(_matches(doc, part) for part in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, part) for part in cond):
+                return False
+        elif isinstance(cond, dict) and "$lt" in cond:
+            # $lt only compares values of the same type.
+            if _type(doc.get(key)) != _type(cond["$lt"]) or not doc.get(key) < cond["$lt"]:
+                return False
+        elif isinstance(cond, dict) and "$type" in cond:
+            if _type(doc.get(key)) not in cond["$type"]:
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self, docs, name="answers_export"):
+        self.docs = docs
+        self.name = name
+        self.queries = []
+        self.pipelines = []
+
+    def find(self, query):
+        self.queries.append(query)
+        return FakeFind([doc for doc in self.docs if _matches(doc, query)])
+
+    async def count_documents(self, query):
+        return len([doc for doc in self.docs if _matches(doc, query)])
+
+    async def aggregate(self, pipeline, **kwargs):
+        # Only the /answers_export shape: $match, then $facet with both counts.
+        self.pipelines.append(pipeline)
+        assert set(pipeline[1]["$facet"]) == {"total", "unique_employees"}
+        matched = [doc for doc in self.docs if _matches(doc, pipeline[0]["$match"])]
+        employees = {doc["norm"]["employee_id"] for doc in matched}
+        return FakeFind([{"total": [{"n": len(matched)}], "unique_employees": [{"n": len(employees)}]}])
+
+
+class FakeSyncState:
+    def __init__(self):
+        self.updated_at = 1
+
+    async def find_one(self, query, projection=None):
+        return {"_id": query["_id"], "updated_at": self.updated_at}
+
+
+class FakeAnswersDb:
+    def __init__(self, docs):
+        self.answers_export = FakeCollection(docs)
+        self.sync_state = FakeSyncState()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+async def test_cursor_pages_walk_the_collection_without_skipping():
+    coll = FakeCollection([{"_id": i, "grade": "a" if i % 2 else "b"} for i in range(1, 12)])
+    db = {"scores_contexts": coll}
+
+    seen, cursor = [], None
+    while True:
+        page = await main._list_collection(
+            db, "scores_contexts", limit=2, skip=0, filter_query={"grade": "a"}, cursor=cursor
+        )
+        seen += [item["_id"] for item in page["items"]]
+        assert page["total"] == 6
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [11, 9, 7, 5, 3, 1]
+    assert coll.queries[-1] == {"$and": [{"grade": "a"}, {"_id": {"$lt": 5}}]}
+
+
+async def test_cursor_pages_walk_mixed_numeric_and_string_ids():
+    coll = FakeCollection([{"_id": i} for i in (1, 2, 3, "a", "b")])
+    db = {"scores_contexts": coll}
+
+    seen, cursor = [], None
+    while True:
+        page = await main._list_collection(db, "scores_contexts", limit=2, skip=0, cursor=cursor)
+        seen += [item["_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    # The page after the last string id carries on with the numeric ids.
+    assert seen == ["b", "a", 3, 2, 1]
+    assert coll.queries[1] == {"$or": [{"_id": {"$lt": "a"}}, {"_id": {"$type": ["number"]}}]}
+
+
+async def test_skip_is_still_honoured_without_a_cursor():
+    db = {"scores_by_driver": FakeCollection([{"_id": i} for i in range(5)])}
+
+    page = await main._list_collection(db, "scores_by_driver", limit=2, skip=2)
+
+    assert [item["_id"] for item in page["items"]] == [2, 1]
+    assert main._decode_cursor(page["next_cursor"], 1) == [1]
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as exc:
+        main._decode_cursor("not-a-cursor", 1)
+    assert exc.value.status_code == 400
+    with pytest.raises(HTTPException):
+        main._decode_cursor(main._encode_cursor([1, 2]), 1)
+
+
+async def test_answers_totals_come_from_one_facet_and_are_cached_per_data_version(monkeypatch):
+    monkeypatch.setattr(main, "_answers_totals", main.OrderedDict())
+    db = FakeAnswersDb([{"_id": i, "grade": "a", "norm": {"employee_id": i % 3}} for i in range(1, 8)])
+    query = {"grade": "a"}
+
+    first = await main._list_answers_export(db, query, limit=3, skip=0, cursor=None)
+    second = await main._list_answers_export(db, query, limit=3, skip=3, cursor=first["next_cursor"])
+
+    assert [item["_id"] for item in first["items"] + second["items"]] == [7, 6, 5, 4, 3, 2]
+    assert first["total"] == second["total"] == 7
+    assert first["unique_employees"] == second["unique_employees"] == 3
+    assert len(db.answers_export.pipelines) == 1
+    # Pages are always read by the indexed find, never inside the $facet.
+    assert len(db.answers_export.queries) == 2
+
+    # New data (an ingest checkpoint) recounts.
+    db.answers_export.docs.append({"_id": 8, "grade": "a", "norm": {"employee_id": 9}})
+    db.sync_state.updated_at = 2
+    third = await main._list_answers_export(db, query, limit=3, skip=0, cursor=None)
+
+    assert third["total"] == 8 and third["unique_employees"] == 4
+    assert len(db.answers_export.pipelines) == 2
@@ -2,6 +2,15 @@ import csv
 import io
 
 from peakon_api import main
+from peakon_ingest.bench import MemoryStorage
+
+
+class FakeCursor(list):
+    """A list that async-iterates like pymongo's AsyncCursor."""
+
+    async def __aiter__(self):
+        for doc in self:
+            yield doc
 
 
 class FakeCollection:
@@ -25,7 +34,7 @@ class FakeCollection:
                 if answered_at > attr_date.get("$lte", answered_at):
                     continue
             out.append(doc)
-        return out
+        return FakeCursor(out)
 
 
 class FakeDb:
@@ -65,7 +74,7 @@ def answer(answer_id, emp_id, question_id, score, text, driver_id=1527181):
     }
 
 
-def test_manager_question_csv_groups_by_manager_question_and_suppresses_small_groups(monkeypatch):
+async def test_manager_question_csv_groups_by_manager_question_and_suppresses_small_groups(monkeypatch):
     answers = [
         answer(100 + i, i, 9001, score, "My manager supports me")
         for i, score in enumerate([8, 9, 7, 10, 6], start=1)
@@ -80,9 +89,9 @@ def test_manager_question_csv_groups_by_manager_question_and_suppresses_small_gr
         + [employee_doc(500, "MGR-500-IDENTIFIER"), employee_doc(501, "MGR-501-IDENTIFIER")]
     )
     catalog = [{"_id": 1527181, "category": "Engagement", "driver": "Management Support", "subdriver": "Coaching"}]
-    monkeypatch.setattr(main, "get_db", lambda: FakeDb(answers, employees, catalog))
+    monkeypatch.setattr(main, "get_db", serve(FakeDb(answers, employees, catalog)))
 
-    response = main.export_manager_question_csv(start_date="2026-01-01", end_date="2026-01-31", min_respondents=5)
+    response = await main.export_manager_question_csv(start_date="2026-01-01", end_date="2026-01-31", min_respondents=5)
     rows = list(csv.DictReader(io.StringIO(response.body.decode())))
 
     assert len(rows) == 1
@@ -94,3 +103,106 @@ def test_manager_question_csv_groups_by_manager_question_and_suppresses_small_gr
     assert rows[0]["category"] == "Engagement"
     assert rows[0]["driver"] == "Management Support"
     assert rows[0]["subDriver"] == "Coaching"
+
+
+class FakeBuckets:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+        day = query["day"]
+        return FakeCursor(
+            b
+            for b in self.buckets
+            if day["$gte"] <= b["day"] <= day["$lte"] and query.get("manager_id", b["manager_id"]) == b["manager_id"]
+        )
+
+
+class FakeAggDb(FakeDb):
+    """FakeDb plus the daily buckets and sync_state that MemoryStorage maintains."""
+
+    def __init__(self, answers, employees, catalog, storage):
+        super().__init__(answers, employees, catalog)
+        self.storage = storage
+        self.sync_state = self
+        self.buckets = FakeBuckets(list(storage.collections["manager_question_daily"].values()))
+        self.answers_export.find_one = self._pending_answer
+
+    async def _pending_answer(self, query, projection=None):
+        return next((doc for doc in self.storage.collections["answers_export"].values() if doc.get("agg_pending")), None)
+
+    async def find_one(self, query, projection=None):
+        return self.storage.collections.get("sync_state", {}).get(query["_id"])
+
+    def __getitem__(self, name):
+        assert name == "manager_question_daily"
+        return self.buckets
+
+
+def serve(db):
+    async def get_db():
+        return db
+
+    return get_db
+
+
+async def aggregated(answers, employees):
+    storage = MemoryStorage()
+    storage.collections["answers_export"] = {a["_id"]: a for a in answers}
+    storage.collections["employees"] = {e["_id"]: e for e in employees}
+    stats = await storage.refresh_manager_question_agg()
+    return storage, stats
+
+
+async def test_manager_question_csv_from_daily_buckets_matches_raw_export(monkeypatch):
+    answers = [answer(100 + i, i, 9001, score, "My manager supports me") for i, score in enumerate([8, 9, 7, 10, 6], 1)]
+    # Respondent 1 answering again on another day is still one respondent.
+    late = answer(199, 1, 9001, 4, "My manager supports me")
+    late["attributes"]["responseAnsweredAt"] = "2026-01-20T09:00:00Z"
+    answers.append(late)
+    employees = [manager_employee(i, 500) for i in range(1, 6)] + [employee_doc(500, "MGR-500-IDENTIFIER")]
+    catalog = [{"_id": 1527181, "category": "Engagement", "driver": "Management Support", "subdriver": "Coaching"}]
+
+    monkeypatch.setattr(main, "get_db", serve(FakeDb(answers, employees, catalog)))
+    raw = await main.export_manager_question_csv(start_date="2026-01-01", end_date="2026-01-31", min_respondents=5)
+
+    storage, stats = await aggregated(answers, employees)
+    db = FakeAggDb(answers, employees, catalog, storage)
+    monkeypatch.setattr(main, "get_db", serve(db))
+    from_buckets = await main.export_manager_question_csv(start_date="2026-01-01", end_date="2026-01-31", min_respondents=5)
+
+    assert stats == {"rebuilt": 1, "answers": 6, "buckets": 2}
+    assert db.buckets.queries == [{"day": {"$gte": "2026-01-01", "$lte": "2026-01-31"}}]
+    assert from_buckets.body == raw.body
+    rows = list(csv.DictReader(io.StringIO(from_buckets.body.decode())))
+    assert (rows[0]["respondentCount"], rows[0]["score"]) == ("5", "7.33")
+
+
+async def test_changed_answer_replaces_its_bucket_contribution():
+    answers = [answer(100 + i, i, 9001, 8, "Q") for i in range(1, 3)]
+    storage, _ = await aggregated(answers, [manager_employee(i, 500) for i in range(1, 3)])
+
+    storage.collections["answers_export"][101].update(answer(101, 1, 9001, 2, "Q"), agg_pending=True)
+    stats = await storage.refresh_manager_question_agg()
+
+    (bucket,) = storage.collections["manager_question_daily"].values()
+    assert (stats["rebuilt"], stats["answers"]) == (0, 1)
+    assert (bucket["score_sum"], bucket["score_count"]) == (10.0, 2)
+    assert bucket["respondents"] == {"1": 1, "2": 1}
+
+
+async def test_employee_with_a_new_manager_moves_their_answers_to_the_new_managers_bucket():
+    answers = [{**answer(100 + i, i, 9001, 8, "Q"), "norm": {"employee_id": i}} for i in range(1, 3)]
+    storage, _ = await aggregated(answers, [manager_employee(i, 500) for i in range(1, 3)])
+
+    # The employees upsert checks each page against the stored managers before writing it.
+    assert await storage.refold_moved_employees({1: "600", 2: "500"}) == 1
+    storage.collections["employees"][1] = manager_employee(1, 600)
+    stats = await storage.refresh_manager_question_agg()
+
+    buckets = {b["manager_id"]: b for b in storage.collections["manager_question_daily"].values()}
+    assert stats["answers"] == 1
+    assert (buckets["500"]["score_count"], buckets["500"]["respondents"]) == (1, {"1": 0, "2": 1})
+    assert (buckets["600"]["score_count"], buckets["600"]["respondents"]) == (1, {"1": 1})
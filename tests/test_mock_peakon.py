@@ -0,0 +1,106 @@
+import datetime as dt
+
+import pytest
+
+from peakon_ingest.bench import BENCH_BASE_URL, MemoryStorage, run_benchmark
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ingest import ingest_all
+from peakon_ingest.mock_peakon import FaultPlan, MockPeakonTransport, generate_tenant
+
+
+def test_generate_tenant_builds_manager_tree_with_span():
+    tenant = generate_tenant(employees=20, answers=5, span=3, seed=1)
+
+    managers = {e["id"]: e["relationships"].get("Manager", {}).get("data", {}).get("id") for e in tenant.employees}
+    assert managers["1"] is None
+    assert [managers[str(n)] for n in (2, 3, 4, 5)] == ["1", "1", "1", "2"]
+    assert [a["attributes"]["answerId"] for a in tenant.answers] == [1, 2, 3, 4, 5]
+    assert generate_tenant(employees=20, answers=5, span=3, seed=1).answers == tenant.answers
+
+
+@pytest.mark.asyncio
+async def test_benchmark_ingests_everything_through_injected_429s_and_401s():
+    tenant = generate_tenant(employees=120, answers=450, span=4, seed=2)
+    storage = MemoryStorage()
+
+    report = await run_benchmark(
+        tenant,
+        FaultPlan(rate_429=0.2, retry_after_seconds=0, token_ttl_requests=7, seed=3),
+        storage=storage,
+        per_page=100,
+        stream_chunk_size=40,
+        writers=2,
+    )
+
+    assert report["status"] == "success", report["error"]
+    assert len(storage.collections["answers_export"]) == 450
+    assert len(storage.collections["employees"]) == 120
+    assert len(storage.collections["scores_by_driver"]) == len(tenant.drivers) * tenant.contexts_per_group
+    assert report["pages"] >= 5 + 2
+    assert report["requests"]["injected_429"] > 0
+    assert report["requests"]["injected_401"] > 0
+    assert set(report["stages"]) >= {"answers_export", "employees", "scores_by_driver"}
+    assert report["docs_per_s"] > 0
+
+
+@pytest.mark.asyncio
+async def test_targeted_ingest_refreshes_only_selected_employees_and_recent_answers():
+    tenant = generate_tenant(employees=30, answers=200, seed=4)
+    storage = MemoryStorage()
+    transport = MockPeakonTransport(tenant, base_url=BENCH_BASE_URL)
+    client = PeakonClient(BENCH_BASE_URL, app_token="bench", timeout_seconds=10, transport=transport)
+    # Answer n is given n minutes after 2025-01-01.
+    since = dt.datetime(2025, 1, 1, 2, 30, tzinfo=dt.timezone.utc)
+
+    try:
+        stats = await ingest_all(
+            client,
+            storage,
+            company_id=tenant.company_id,
+            engagement_groups=tenant.engagement_groups,
+            per_page=50,
+            full_sync=False,
+            only=["employees", "answers_export"],
+            employee_ids=[3, 7, 999],
+            answered_since=since,
+        )
+    finally:
+        await client.aclose()
+
+    assert set(stats["stages"]) == {"employees", "answers_export"}
+    assert sorted(storage.collections["employees"]) == [3, 7]
+    assert sorted(storage.collections["answers_export"]) == list(range(150, 201))
+    assert storage.collections["sync_state"]["answers_export"]["last_answer_id"] == 200
+    assert "last_employee_id" not in storage.collections["sync_state"].get("employees", {})
+    assert stats["selection"]["employee_ids"] == [3, 7, 999]
+    assert "/engagement/drivers" not in transport.stats.by_path
+
+
+@pytest.mark.asyncio
+async def test_run_stats_count_only_that_run_when_client_and_storage_are_reused():
+    tenant = generate_tenant(employees=20, answers=60, seed=5)
+    storage = MemoryStorage()
+    transport = MockPeakonTransport(tenant, base_url=BENCH_BASE_URL)
+    client = PeakonClient(BENCH_BASE_URL, app_token="bench", timeout_seconds=10, transport=transport)
+
+    try:
+        runs = [
+            await ingest_all(
+                client,
+                storage,
+                company_id=tenant.company_id,
+                engagement_groups=tenant.engagement_groups,
+                per_page=50,
+                full_sync=True,
+                only=["employees"],
+            )
+            for _ in range(2)
+        ]
+    finally:
+        await client.aclose()
+
+    first, second = runs
+    assert first["writes"] is not storage.write_stats
+    assert first["writes"]["employees"]["docs"] == second["writes"]["employees"]["docs"] == 20
+    assert first["rate_limit"]["requests"] == second["rate_limit"]["requests"] > 0
+    assert first["http_cache"] == second["http_cache"]
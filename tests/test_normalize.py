@@ -0,0 +1,86 @@
+import pytest
+
+from peakon_ingest.bench import MemoryStorage, run_benchmark
+from peakon_ingest.mock_peakon import generate_tenant
+from peakon_ingest.normalize import NORM_VERSION, answer_norm, backfill_norm, employee_norm, score_norm
+
+
+def test_employee_norm_collapses_spellings():
+    norm = employee_norm(
+        {
+            "_id": 7,
+            "attributes": {"first_name": "Ada", "lastName": "Lovelace", "department": " Ops ", "Sub-Department": "People"},
+            "relationships": {"manager": {"data": {"id": "3"}}},
+        }
+    )
+
+    assert norm == {
+        "v": NORM_VERSION,
+        "id": 7,
+        "manager_id": 3,
+        "department": "Ops",
+        "sub_department": "People",
+        "name": "Ada Lovelace",
+        "title": None,
+    }
+
+
+def test_answer_and_score_norm_use_canonical_ids():
+    answer = answer_norm(
+        {
+            "_id": "a1",
+            "attributes": {"answerId": "11", "employee_id": "42", "questionId": 5, "answerScore": 8},
+            "relationships": {"driver": {"data": {"id": "autonomy"}}},
+        }
+    )
+    score = score_norm({"attributes": {"employeeId": "42", "scores": {"mean": 7.5, "time": "2026-02"}}}, driver_id="d1")
+
+    assert (answer["id"], answer["employee_id"], answer["question_id"], answer["driver_id"]) == (11, 42, 5, "autonomy")
+    assert score == {"v": NORM_VERSION, "employee_id": 42, "driver_id": "d1", "time": "2026-02", "mean": 7.5}
+
+
+@pytest.mark.asyncio
+async def test_ingested_docs_carry_norm():
+    tenant = generate_tenant(employees=10, answers=20, span=3, seed=4)
+    storage = MemoryStorage()
+
+    report = await run_benchmark(tenant, storage=storage, per_page=50)
+
+    assert report["status"] == "success", report["error"]
+    assert storage.collections["employees"][5]["norm"]["manager_id"] == 2
+    assert all(doc["norm"]["v"] == NORM_VERSION for doc in storage.collections["answers_export"].values())
+
+
+class _Result:
+    def __init__(self, modified_count):
+        self.modified_count = modified_count
+
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    def find(self, query):
+        version = query["norm.v"]["$ne"]
+        return [doc for doc in self.docs.values() if (doc.get("norm") or {}).get("v") != version]
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.docs[op._filter["_id"]].update(op._doc["$set"])
+        return _Result(len(ops))
+
+
+def test_backfill_norm_only_updates_stale_docs():
+    employees = _Collection(
+        [
+            {"_id": 1, "attributes": {"Department": "Ops"}},
+            {"_id": 2, "attributes": {"Department": "Ops"}, "norm": {"v": NORM_VERSION, "department": "Ops"}},
+            {"_id": 3, "attributes": {"Department": "Exec"}, "norm": {"v": NORM_VERSION - 1}},
+        ]
+    )
+
+    counts = backfill_norm({"employees": employees}, collections=["employees"], batch_size=1)
+
+    assert counts == {"employees": 2}
+    assert employees.docs[1]["norm"]["department"] == "Ops"
+    assert employees.docs[3]["norm"]["department"] == "Exec"
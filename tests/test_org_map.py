@@ -1,4 +1,6 @@
+from peakon_api import org_map
 from peakon_api.org_map import build_org_map_payload
+from peakon_ingest.bench import MemoryStorage
 
 
 def test_build_org_map_payload_basic_hierarchy():
@@ -47,13 +49,21 @@ def test_build_org_map_payload_orphan_detection():
 
 
 def test_org_map_filter_query_accepts_people_subdepartment():
-    from peakon_api.main import _employee_filter_query
+    from peakon_ingest.normalize import employee_filter_query
 
-    query = _employee_filter_query("General and Administrative", "People", None)
+    query = employee_filter_query("General and Administrative", "People", None)
 
     assert "$and" in query
-    assert any("attributes.Department" in option for option in query["$and"][0]["$or"])
-    assert any("attributes.Sub-Department" in option for option in query["$and"][1]["$or"])
+    assert query["$and"][0]["norm.department"]["$in"][0].search("General and Administrative")
+    assert query["$and"][1]["norm.sub_department"]["$in"][0].search("People")
+
+
+class AsyncList(list):
+    """A list that async-iterates like pymongo's AsyncCursor."""
+
+    async def __aiter__(self):
+        for doc in self:
+            yield doc
 
 
 class ScoreCollection:
@@ -62,19 +72,16 @@ class ScoreCollection:
 
     def find(self, query=None, projection=None):
         query = query or {}
-        allowed = set()
-        for clause in query.get("$or", []):
-            for _field, condition in clause.items():
-                allowed.update(str(v) for v in condition.get("$in", []))
+        allowed = {str(v) for v in (query.get("norm.employee_id") or {}).get("$in", [])}
         if not allowed:
-            return list(self.docs)
+            return AsyncList(self.docs)
         out = []
         for doc in self.docs:
             attrs = doc.get("attributes") or {}
             emp_id = attrs.get("employeeId") or attrs.get("employee_id") or doc.get("employeeId") or doc.get("employee_id")
             if str(emp_id) in allowed:
                 out.append(doc)
-        return out
+        return AsyncList(out)
 
 
 class ScoreDb:
@@ -83,7 +90,7 @@ class ScoreDb:
         self.answers_export = ScoreCollection(answers or [])
 
 
-def test_engagement_scores_by_employee_uses_latest_mean():
+async def test_engagement_scores_by_employee_uses_latest_mean():
     from peakon_api.main import _engagement_scores_by_employee
 
     db = ScoreDb([
@@ -92,13 +99,13 @@ def test_engagement_scores_by_employee_uses_latest_mean():
         {"_id": "missing", "attributes": {"employeeId": 2, "scores": {"time": "2026-02"}}},
     ])
 
-    scores = _engagement_scores_by_employee(db, [1, 2])
+    scores = await _engagement_scores_by_employee(db, [1, 2])
 
     assert scores["1"] == {"engagement": 7.6, "time": "2026-02", "source": "scores_contexts"}
     assert "2" not in scores
 
 
-def test_engagement_scores_by_employee_falls_back_to_answer_scores():
+async def test_engagement_scores_by_employee_falls_back_to_answer_scores():
     from peakon_api.main import _engagement_scores_by_employee
 
     db = ScoreDb([], [
@@ -107,7 +114,7 @@ def test_engagement_scores_by_employee_falls_back_to_answer_scores():
         {"_id": "a3", "attributes": {"employeeId": 2, "answerScore": "", "responseAnsweredAt": "2026-02-01"}},
     ])
 
-    scores = _engagement_scores_by_employee(db, [1, 2])
+    scores = await _engagement_scores_by_employee(db, [1, 2])
 
     assert scores["1"] == {
         "engagement": 7.0,
@@ -118,7 +125,7 @@ def test_engagement_scores_by_employee_falls_back_to_answer_scores():
     assert "2" not in scores
 
 
-def test_autonomy_scores_by_employee_falls_back_to_matching_answer_hierarchy():
+async def test_autonomy_scores_by_employee_falls_back_to_matching_answer_hierarchy():
     from peakon_api.main import _autonomy_scores_by_employee
 
     db = ScoreDb([], [
@@ -151,7 +158,7 @@ def test_autonomy_scores_by_employee_falls_back_to_matching_answer_hierarchy():
         },
     ])
 
-    scores = _autonomy_scores_by_employee(db, [1])
+    scores = await _autonomy_scores_by_employee(db, [1])
 
     assert scores["1"] == {
         "autonomy": 7.0,
@@ -159,3 +166,107 @@ def test_autonomy_scores_by_employee_falls_back_to_matching_answer_hierarchy():
         "source": "answers_export",
         "responseCount": 2,
     }
+
+
+class SnapshotCollection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one(self, query, projection=None):
+        return next((doc for doc in self.docs if doc["_id"] == query["_id"]), None)
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        docs = [doc for doc in self.docs if all(doc.get(k) == v for k, v in query.items() if not k.startswith("norm."))]
+        if "norm.department" in query:
+            docs = [doc for doc in docs if doc["attributes"].get("Department") == query["norm.department"]]
+        return SnapshotCursor(docs)
+
+
+class SnapshotCursor(AsyncList):
+    def sort(self, key, direction):
+        return SnapshotCursor(sorted(self, key=lambda doc: doc[key]))
+
+
+class SnapshotDb:
+    def __init__(self, storage, employees):
+        self.collections = {
+            name: SnapshotCollection(list(docs.values())) for name, docs in storage.collections.items()
+        }
+        self.employees = SnapshotCollection(employees)
+        self.sync_state = self.collections["sync_state"]
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+
+def _org_employees():
+    return [
+        {"_id": 1, "attributes": {"First name": "CEO", "Department": "Exec"}, "relationships": {}},
+        {
+            "_id": 2,
+            "attributes": {"First name": "Mgr", "Department": "Ops"},
+            "relationships": {"Manager": {"data": {"id": "1"}}},
+        },
+        {
+            "_id": 3,
+            "attributes": {"First name": "IC", "Department": "Ops"},
+            "relationships": {"Manager": {"data": {"id": "2"}}},
+        },
+    ]
+
+
+async def _snapshot_storage(employees, runs):
+    storage = MemoryStorage()
+    storage.collections["employees"] = {doc["_id"]: doc for doc in employees}
+    for run_id in runs:
+        await storage.write_org_snapshot(run_id, keep=2)
+    return storage
+
+
+async def test_org_snapshot_serves_stored_payload_and_prunes_old_runs():
+    employees = _org_employees()
+    storage = await _snapshot_storage(employees, ["run-1", "run-2", "run-3"])
+
+    assert sorted(storage.collections["org_snapshots"]) == ["run-2", "run-3"]
+    assert {doc["run_id"] for doc in storage.collections["org_snapshot_nodes"].values()} == {"run-2", "run-3"}
+
+    db = SnapshotDb(storage, employees)
+    payload = await org_map.org_payload(db, None)
+    payload["nodes"][0]["metrics"] = {"engagement": 9}
+
+    expected = build_org_map_payload(employees)
+    again = await org_map.org_payload(db, None)
+    assert again["snapshot"]["runId"] == "run-3"
+    assert again["nodes"] == expected["nodes"]
+    assert again["stats"] == expected["stats"]
+
+
+async def test_org_snapshot_header_stays_small_and_payload_matches_live_build():
+    employees = _org_employees() + [
+        {"_id": 2, "attributes": {"First name": "Copy"}, "relationships": {}},
+        {"_id": 4, "attributes": {"First name": "Orphan"}, "relationships": {"Manager": {"data": {"id": "99"}}}},
+    ]
+    storage = MemoryStorage()
+    storage.collections["employees"] = dict(enumerate(employees))
+    await storage.write_org_snapshot("run-anomalies")
+
+    (header,) = storage.collections["org_snapshots"].values()
+    assert set(header) == {"_id", "created_at", "rootId", "stats"}
+    payload = await org_map.org_payload(SnapshotDb(storage, employees), None)
+    live = build_org_map_payload(employees)
+    assert (payload["edges"], payload["anomalies"]) == (live["edges"], live["anomalies"])
+    assert payload["anomalies"] == {"orphans": [{"id": "4", "managerId": "99"}], "duplicates": ["2"]}
+    assert len(payload["edges"]) == payload["stats"]["renderedEdges"] == 2
+
+
+async def test_org_snapshot_filtered_view_matches_live_build():
+    employees = _org_employees()
+    db = SnapshotDb(await _snapshot_storage(employees, ["run-1"]), employees)
+
+    payload = await org_map.org_payload(db, {"norm.department": "Ops"})
+
+    live = build_org_map_payload([doc for doc in employees if doc["attributes"]["Department"] == "Ops"])
+    assert payload["nodes"] == live["nodes"]
+    assert payload["anomalies"] == live["anomalies"]
+    assert payload["rootId"] == "2"
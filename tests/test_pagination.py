@@ -45,3 +45,91 @@ async def test_paginate_chases_links_next():
         assert route.call_count == 2
 
     await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_paginate_json_chunks_streams_pages_in_slices():
+    from peakon_ingest.pagination import paginate_json_chunks
+
+    client = PeakonClient("https://example.com/api/v1", app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+
+    with respx.mock(assert_all_called=True) as mock:
+        def responder(request: httpx.Request) -> httpx.Response:
+            if request.url.params.get("continuation") == "2":
+                return httpx.Response(200, json={"data": [{"id": "4"}], "links": {}})
+            return httpx.Response(
+                200,
+                json={
+                    "data": [{"id": "1"}, {"id": "2"}, {"id": "3"}],
+                    "links": {"next": "/api/v1/answers/export?continuation=2"},
+                },
+            )
+
+        mock.route(method="GET", url="https://example.com/api/v1/answers/export").mock(side_effect=responder)
+
+        chunks = [chunk async for chunk in paginate_json_chunks(client, "/answers/export", chunk_size=2)]
+
+    assert [[item["id"] for item in chunk["data"]] for chunk in chunks] == [["1", "2"], ["3"], ["4"]]
+    assert "links" not in chunks[0]
+    assert chunks[1]["links"]["next"].endswith("continuation=2")
+    await client.aclose()
+
+
+def test_adaptive_page_sizer_tracks_target_latency_within_bounds():
+    from peakon_ingest.pagination import AdaptivePageSizer, PageSizeBounds
+
+    sizer = AdaptivePageSizer(1000, PageSizeBounds(min_per_page=200, max_per_page=4000, target_seconds=10))
+
+    assert sizer.observe(1000, 40.0, 1_000_000) == 500  # at most halves per page
+    assert sizer.observe(500, 5.0, 500_000) == 1000
+    assert sizer.observe(1000, 1.0, 1_000_000) == 2000  # at most doubles per page
+    assert sizer.observe(2000, 1.0, 2_000_000) == 4000
+    assert sizer.observe(4000, 1.0, 4_000_000) == 4000  # clamped to max
+    assert sizer.observe(10, 30.0, 10_000) == 4000  # short last page: no signal
+    assert sizer.as_dict()["adjustments"] == 4
+
+
+def test_adaptive_page_sizer_caps_projected_page_bytes():
+    from peakon_ingest.pagination import AdaptivePageSizer, PageSizeBounds
+
+    sizer = AdaptivePageSizer(1000, PageSizeBounds(min_per_page=100, max_per_page=10000, max_page_bytes=1_000_000))
+
+    assert sizer.observe(1000, 1.0, 2_000_000) == 500
+
+
+def test_adaptive_page_sizer_adopts_server_per_page_cap():
+    from peakon_ingest.pagination import AdaptivePageSizer, PageSizeBounds
+
+    sizer = AdaptivePageSizer(2000, PageSizeBounds(min_per_page=100, max_per_page=8000, target_seconds=10))
+
+    # The server returns 500 with more to come: it caps per_page.
+    assert sizer.observe(500, 10.0, 500_000, more=True) == 500
+    assert sizer.observe(500, 1.0, 500_000, more=True) == 500  # fast, but never above the cap
+    assert sizer.observe(500, 40.0, 500_000, more=True) == 250
+    assert sizer.as_dict()["server_cap"] == 500
+
+
+@pytest.mark.asyncio
+async def test_paginate_json_applies_page_sizer_to_next_requests():
+    from peakon_ingest.pagination import AdaptivePageSizer, PageSizeBounds
+
+    client = PeakonClient("https://example.com/api/v1", app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+    requested = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        per_page = int(request.url.params["per_page"])
+        requested.append(per_page)
+        links = {"next": "/api/v1/answers/export?continuation=2&per_page=2"} if len(requested) < 3 else {}
+        return httpx.Response(200, json={"data": [{"id": str(i)} for i in range(per_page)], "links": links})
+
+    sizer = AdaptivePageSizer(2, PageSizeBounds(min_per_page=1, max_per_page=8, target_seconds=60))
+    with respx.mock() as mock:
+        mock.route(method="GET", url__startswith="https://example.com/api/v1/answers/export").mock(side_effect=responder)
+        pages = [page async for page in paginate_json(client, "/answers/export", first_params={"per_page": 2}, page_sizer=sizer)]
+
+    # Fast pages: the size doubles each time, overriding per_page from the next link.
+    assert requested == [2, 4, 8]
+    assert [len(p["data"]) for p in pages] == [2, 4, 8]
+    await client.aclose()
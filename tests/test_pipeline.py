@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+from peakon_ingest.pipeline import run_pipeline
+
+
+async def _pages(count, delay=0.0):
+    for i in range(count):
+        if delay:
+            await asyncio.sleep(delay)
+        yield {"page": i}
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_writes_every_page_in_order():
+    written = []
+
+    async def consume(page):
+        written.append(page["page"])
+
+    stats = await run_pipeline(_pages(5), consume, queue_size=2)
+
+    assert written == [0, 1, 2, 3, 4]
+    assert stats.pages == 5
+    assert stats.max_queue_depth <= 2
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_overlaps_fetch_and_write():
+    async def consume(page):
+        await asyncio.sleep(0.05)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stats = await run_pipeline(_pages(4, delay=0.05), consume, queue_size=2)
+    elapsed = loop.time() - started
+
+    # Sequential would be ~0.4s; overlapped is ~0.25s.
+    assert elapsed < 0.35
+    assert stats.fetch_seconds > 0
+    assert stats.write_seconds > 0
+
+
+@pytest.mark.asyncio
+async def test_run_pipeline_propagates_writer_failure():
+    async def consume(page):
+        raise ValueError("write failed")
+
+    with pytest.raises(ValueError, match="write failed"):
+        await run_pipeline(_pages(10), consume, queue_size=1)
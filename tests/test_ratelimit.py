@@ -0,0 +1,65 @@
+import asyncio
+import datetime as dt
+
+import httpx
+import pytest
+import respx
+
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ratelimit import TokenBucket, parse_retry_after
+
+BASE = "https://example.com/api/v1"
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    now = dt.datetime(2026, 1, 1, 12, 0, 0, tzinfo=dt.timezone.utc)
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Thu, 01 Jan 2026 12:00:05 GMT", now=now) == 5.0
+    assert parse_retry_after("Thu, 01 Jan 2026 11:00:00 GMT", now=now) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_spaces_requests():
+    bucket = TokenBucket(rate=50, burst=2)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await asyncio.gather(*(bucket.acquire() for _ in range(5)))
+    elapsed = loop.time() - started
+
+    # Two from the burst, three more at 50/s.
+    assert 0.055 <= elapsed < 0.2
+    assert bucket.stats["requests"] == 5
+    assert bucket.stats["throttled_requests"] == 3
+    assert bucket.stats["throttled_seconds"] > 0
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_all_requests_instead_of_blind_backoff():
+    client = PeakonClient(BASE, app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+    calls = []
+
+    def responder(request: httpx.Request) -> httpx.Response:
+        calls.append(asyncio.get_running_loop().time())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, json={"data": []})
+
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{BASE}/engagement/drivers").mock(side_effect=responder)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(
+            client.get_json_with_reauth_on_401("/engagement/drivers"),
+            client.get_json_with_reauth_on_401("/engagement/drivers?x=2"),
+        )
+        elapsed = loop.time() - started
+
+    # The retry waited out Retry-After instead of the 1s exponential backoff.
+    assert 0.18 <= elapsed < 0.9
+    assert len(calls) == 3
+    assert calls[-1] - calls[0] >= 0.18
+    assert client.rate_limiter.stats["retry_after_pauses"] == 1
+    await client.aclose()
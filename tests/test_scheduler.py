@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+
+from peakon_ingest.bench import MemoryStorage
+from peakon_ingest.lease import LeaseLock, LeaseLost
+from peakon_ingest.scheduler import IngestScheduler
+
+
+@pytest.mark.asyncio
+async def test_lease_is_exclusive_until_released_or_expired():
+    storage = MemoryStorage()
+    first = LeaseLock(storage, owner="a", ttl_seconds=60)
+    second = LeaseLock(storage, owner="b", ttl_seconds=60)
+
+    assert await first.acquire()
+    assert not await second.acquire()
+    await first.release()
+    assert await second.acquire()
+
+    storage.collections["locks"]["ingest"]["expires_at"] = storage.collections["locks"]["ingest"]["expires_at"].replace(
+        year=2000
+    )
+    assert await first.acquire()
+    assert not await storage.renew_lock("ingest", "b", 60)
+
+
+@pytest.mark.asyncio
+async def test_hold_cancels_the_work_when_the_lease_is_taken_over():
+    storage = MemoryStorage()
+    lease = LeaseLock(storage, owner="a", ttl_seconds=60, renew_every=0.01)
+    assert await lease.acquire()
+    cancelled = asyncio.Event()
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def steal():
+        await asyncio.sleep(0.02)
+        storage.collections["locks"]["ingest"]["owner"] = "b"
+
+    stealer = asyncio.create_task(steal())
+    with pytest.raises(LeaseLost):
+        await lease.hold(work())
+    await stealer
+    assert cancelled.is_set()
+
+
+def _scheduler(run, storage, overlap):
+    return IngestScheduler(run, storage, trigger=CronTrigger.from_crontab("0 3 * * 1"), overlap=overlap)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("overlap,expected_runs", [("skip", 1), ("queue", 2)])
+async def test_overlapping_requests_are_skipped_or_queued(overlap, expected_runs):
+    storage = MemoryStorage()
+    release = asyncio.Event()
+    runs = []
+
+    async def run():
+        runs.append(storage.collections["locks"]["ingest"]["owner"])
+        await release.wait()
+
+    scheduler = _scheduler(run, storage, overlap)
+    scheduler.request_run("startup")
+    await asyncio.sleep(0)
+    scheduler.request_run("scheduled")
+    scheduler.request_run("scheduled")
+    release.set()
+    await scheduler.wait_idle()
+
+    assert len(runs) == expected_runs
+    assert scheduler.stats["skipped_overlap"] == (2 if overlap == "skip" else 1)
+    assert "ingest" not in storage.collections["locks"]
+
+
+@pytest.mark.asyncio
+async def test_run_is_skipped_while_another_replica_holds_the_lock():
+    storage = MemoryStorage()
+    assert await storage.acquire_lock("ingest", "other-replica", 60)
+    runs = []
+
+    async def run():
+        runs.append(1)
+
+    scheduler = _scheduler(run, storage, "skip")
+    scheduler.request_run("scheduled")
+    await scheduler.wait_idle()
+
+    assert runs == []
+    assert scheduler.stats["skipped_locked"] == 1
+    assert storage.collections["locks"]["ingest"]["owner"] == "other-replica"
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+
+from peakon_ingest.stages import Stage, run_stages, select_stages
+
+
+def _sleeper(name, log, delay=0.05, result=None):
+    async def run(deps):
+        log.append(("start", name, sorted(deps)))
+        await asyncio.sleep(delay)
+        log.append(("end", name))
+        return result if result is not None else {name: True}
+
+    return run
+
+
+@pytest.mark.asyncio
+async def test_run_stages_runs_independent_stages_concurrently_and_respects_dependencies():
+    log = []
+    stages = [
+        Stage("a", _sleeper("a", log)),
+        Stage("b", _sleeper("b", log)),
+        Stage("c", _sleeper("c", log), depends_on=("a",)),
+    ]
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    records = await run_stages(stages, max_concurrency=3)
+    elapsed = loop.time() - started
+
+    # a and b overlap; c waits on a only: longest chain is two sleeps.
+    assert elapsed < 0.14
+    assert log.index(("start", "c", ["a"])) > log.index(("end", "a"))
+    assert {name: r["status"] for name, r in records.items()} == {"a": "success", "b": "success", "c": "success"}
+    assert records["c"]["result"] == {"c": True}
+    assert records["a"]["duration_s"] >= 0.04
+    assert records["a"]["started_at"] <= records["a"]["finished_at"]
+
+
+@pytest.mark.asyncio
+async def test_run_stages_applies_concurrency_budget():
+    log = []
+    stages = [Stage(name, _sleeper(name, log)) for name in ("a", "b", "c")]
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    await run_stages(stages, max_concurrency=1)
+
+    assert loop.time() - started >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_run_stages_skips_dependents_of_failed_stage():
+    async def boom(_deps):
+        raise RuntimeError("drivers down")
+
+    log = []
+    stages = [
+        Stage("drivers", boom),
+        Stage("scores", _sleeper("scores", log), depends_on=("drivers",)),
+        Stage("answers", _sleeper("answers", log)),
+    ]
+
+    records = await run_stages(stages)
+
+    assert records["drivers"] == {**records["drivers"], "status": "failure", "error": "drivers down"}
+    assert records["scores"]["status"] == "skipped"
+    assert records["answers"]["status"] == "success"
+
+
+@pytest.mark.asyncio
+async def test_run_stages_rejects_cycles():
+    log = []
+    stages = [
+        Stage("a", _sleeper("a", log), depends_on=("b",)),
+        Stage("b", _sleeper("b", log), depends_on=("a",)),
+    ]
+    with pytest.raises(ValueError, match="cycle"):
+        await run_stages(stages)
+
+
+def _noop_stages():
+    async def run(_):
+        return {}
+
+    return [
+        Stage("drivers_catalog", run),
+        Stage("answers_export", run),
+        Stage("drivers", run),
+        Stage("scores_by_driver", run, depends_on=("drivers",)),
+    ]
+
+
+def test_select_stages_only_adds_dependencies_and_keeps_order():
+    selected = select_stages(_noop_stages(), only=["scores_by_driver", "drivers_catalog"])
+
+    assert [s.name for s in selected] == ["drivers_catalog", "drivers", "scores_by_driver"]
+
+
+def test_select_stages_skip_drops_dependents():
+    selected = select_stages(_noop_stages(), skip=["drivers"])
+
+    assert [s.name for s in selected] == ["drivers_catalog", "answers_export"]
+
+
+def test_select_stages_rejects_unknown_names():
+    with pytest.raises(ValueError, match="Unknown stages"):
+        select_stages(_noop_stages(), only=["nope"])
+
+
+def test_select_stages_then_adds_dependents_without_their_other_dependencies():
+    async def run(_):
+        return {}
+
+    stages = _noop_stages() + [Stage("agg", run, depends_on=("answers_export", "drivers"))]
+
+    selected = select_stages(stages, only=["drivers"], then=["scores_by_driver", "agg"])
+
+    assert [s.name for s in selected] == ["drivers", "scores_by_driver", "agg"]
+    assert selected[-1].depends_on == ("drivers",)
+    # A stage none of whose dependencies run is left out.
+    assert [s.name for s in select_stages(stages, only=["answers_export"], then=["scores_by_driver"])] == [
+        "answers_export"
+    ]
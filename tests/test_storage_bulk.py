@@ -0,0 +1,230 @@
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import respx
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult
+
+from peakon_ingest.async_storage import AsyncBulkUpserter, AsyncMongoStorage
+from peakon_ingest.generations import base_generation
+from peakon_ingest.http import PeakonClient
+from peakon_ingest.ingest import ingest_employees
+from peakon_ingest.normalize import employee_norm
+from peakon_ingest.storage import BulkUpserter
+
+
+class FakeBulkCollection:
+    name = "answers_export"
+
+    def __init__(self, fail_ids=(), stored=None):
+        self.batches = []
+        self.ops = []
+        self.fail_ids = set(fail_ids)
+        self.stored = stored or {}
+
+    def find(self, query, projection=None):
+        ids = query["_id"]["$in"]
+        return [{"_id": _id, "content_hash": self.stored[_id]} for _id in ids if _id in self.stored]
+
+    def bulk_write(self, ops, ordered=True):
+        assert ordered is False
+        ids = [op._filter["_id"] for op in ops]
+        self.batches.append(ids)
+        self.ops.extend(ops)
+        failed = [i for i, _id in enumerate(ids) if _id in self.fail_ids]
+        if failed:
+            raise BulkWriteError(
+                {
+                    "writeErrors": [{"index": i, "errmsg": "boom"} for i in failed],
+                    "nUpserted": len(ids) - len(failed),
+                    "nModified": 0,
+                    "nMatched": 0,
+                }
+            )
+        raw = {"nUpserted": len(ids), "nModified": 0, "nMatched": 0, "upserted": [{"index": i, "_id": _id} for i, _id in enumerate(ids)]}
+        return BulkWriteResult(raw, acknowledged=True)
+
+
+def test_bulk_upserter_flushes_by_count_and_on_close():
+    coll = FakeBulkCollection()
+    with BulkUpserter(coll, batch_size=2) as writer:
+        for i in range(5):
+            writer.add(i, {"_id": i, "v": i})
+        assert coll.batches == [[0, 1], [2, 3]]
+
+    assert coll.batches[-1] == [4]
+    assert writer.stats["docs"] == 5
+    assert writer.stats["batches"] == 3
+    assert writer.stats["upserted"] == 5
+
+
+def test_bulk_upserter_flushes_by_bytes():
+    coll = FakeBulkCollection()
+    writer = BulkUpserter(coll, batch_size=1000, max_bytes=100)
+    writer.add(1, {"_id": 1, "blob": "x" * 200})
+    writer.add(2, {"_id": 2, "v": 1})
+    assert coll.batches == [[1]]
+    writer.close()
+    assert coll.batches == [[1], [2]]
+
+
+def test_bulk_upserter_reports_errors_per_batch():
+    coll = FakeBulkCollection(fail_ids={3})
+    writer = BulkUpserter(coll, batch_size=2)
+    for i in range(4):
+        writer.add(i, {"_id": i})
+    stats = writer.close()
+
+    assert stats["failed"] == 1
+    assert stats["upserted"] == 3
+    assert stats["errors"] == [{"batch": 2, "size": 2, "failed": 1, "error": "boom"}]
+
+
+def test_bulk_upserter_skips_unchanged_content_hash():
+    coll = FakeBulkCollection(stored={1: "same", 2: "old"})
+    writer = BulkUpserter(coll, batch_size=10)
+    writer.add(1, {"_id": 1, "run_id": "r2", "content_hash": "same"})
+    writer.add(2, {"_id": 2, "run_id": "r2", "content_hash": "new"})
+    writer.add(3, {"_id": 3, "run_id": "r2", "content_hash": "new"})
+    stats = writer.close()
+
+    assert (stats["inserted"], stats["changed"], stats["unchanged"]) == (1, 1, 1)
+    updates = {op._filter["_id"]: op._doc["$set"] for op in coll.ops}
+    assert updates[1] == {"last_seen_run": "r2"}
+    assert updates[2]["content_hash"] == "new"
+    assert updates[3]["last_seen_run"] == "r2"
+
+
+def test_bulk_upserter_can_skip_unchanged_without_touching():
+    coll = FakeBulkCollection(stored={1: "same"})
+    writer = BulkUpserter(coll, touch_unchanged=False)
+    writer.add(1, {"_id": 1, "run_id": "r2", "content_hash": "same"})
+    stats = writer.close()
+
+    assert coll.batches == []
+    assert stats["unchanged"] == 1
+
+
+class FakeAsyncBulkCollection(FakeBulkCollection):
+    async def bulk_write(self, ops, ordered=True):
+        return FakeBulkCollection.bulk_write(self, ops, ordered=ordered)
+
+
+@pytest.mark.asyncio
+async def test_async_bulk_upserter_matches_sync_batching_and_errors():
+    coll = FakeAsyncBulkCollection(fail_ids={1})
+    writer = AsyncBulkUpserter(coll, batch_size=2)
+    await writer.add_many([(i, {"_id": i}) for i in range(3)])
+    stats = await writer.close()
+
+    assert coll.batches == [[0, 1], [2]]
+    assert stats["batches"] == 2
+    assert stats["upserted"] == 2
+    assert stats["errors"][0]["batch"] == 1
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        doc = (doc or {}).get(part) if isinstance(doc, dict) else None
+    return doc
+
+
+def _matches(doc, query):
+    for path, cond in query.items():
+        value = _get(doc, path)
+        if isinstance(cond, dict) and "$in" in cond:
+            if value not in cond["$in"]:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeAsyncCursor(list):
+    def limit(self, n):
+        return FakeAsyncCursor(self[:n])
+
+    async def __aiter__(self):
+        for doc in self:
+            yield doc
+
+
+class FakeAsyncMongoCollection:
+    """Just the pymongo async calls the employees ingest makes through AsyncMongoStorage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.docs = {}
+
+    def find(self, query=None, projection=None):
+        return FakeAsyncCursor(dict(doc) for doc in self.docs.values() if _matches(doc, query or {}))
+
+    async def find_one(self, query=None, projection=None, **kwargs):
+        return next(iter(self.find(query)), None)
+
+    def _update(self, query, update, upsert):
+        matched = [doc for doc in self.docs.values() if _matches(doc, query)]
+        if not matched and upsert:
+            matched = [self.docs.setdefault(query["_id"], {"_id": query["_id"]})]
+        for doc in matched:
+            doc.update(update.get("$set", {}))
+            for key in update.get("$unset", {}):
+                doc.pop(key, None)
+        return SimpleNamespace(matched_count=len(matched), modified_count=len(matched), upserted_count=0)
+
+    async def update_one(self, query, update, upsert=False):
+        return self._update(query, update, upsert)
+
+    async def update_many(self, query, update):
+        return self._update(query, update, False)
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self._update(op._filter, op._doc, op._upsert)
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_count=len(ops))
+
+
+class FakeAsyncMongoDb(dict):
+    def __missing__(self, name):
+        return self.setdefault(name, FakeAsyncMongoCollection(name))
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def _employee(emp_id, manager_id):
+    return {"id": str(emp_id), "type": "employees", "relationships": {"Manager": {"data": {"id": str(manager_id)}}}}
+
+
+@pytest.mark.asyncio
+async def test_async_storage_employees_ingest_requeues_answers_of_moved_and_new_employees():
+    base = "https://example.com/api/v1"
+    storage = AsyncMongoStorage("mongodb://localhost:1", "test", bulk_batch_size=2)
+    storage.base_db = FakeAsyncMongoDb()
+    storage.use_generation(base_generation())
+    for emp_id in (1, 2):
+        item = _employee(emp_id, 500)
+        storage.db.employees.docs[emp_id] = {"_id": emp_id, **item, "norm": employee_norm(item)}
+    for answer_id, emp_id in ((10, 1), (20, 2)):
+        storage.db.answers_export.docs[answer_id] = {"_id": answer_id, "norm": {"employee_id": emp_id}, "agg": {"score": 8}}
+    # Refreshed before employee 3 was stored, so it is in no bucket.
+    storage.db.answers_export.docs[30] = {"_id": 30, "norm": {"employee_id": 3}, "agg": None}
+    client = PeakonClient(base, app_token="x", timeout_seconds=2)
+    client.set_bearer("bearer")
+
+    with respx.mock() as mock:
+        mock.get(url__startswith=f"{base}/employees").mock(
+            return_value=httpx.Response(200, json={"data": [_employee(1, 600), _employee(2, 500), _employee(3, 500)], "links": {}})
+        )
+        count, _, _ = await ingest_employees(client, storage, per_page=10, full_sync=True, run_id="run-1")
+    await client.aclose()
+    await storage.aclose()
+
+    answers = storage.db.answers_export.docs
+    assert count == 3
+    assert storage.db.employees.docs[1]["norm"]["manager_id"] == 600
+    # Employee 1's answer is refolded with its old contribution kept for subtraction.
+    assert (answers[10].get("agg_pending"), answers[10]["agg"]) == (True, {"score": 8})
+    assert "agg_pending" not in answers[20]
+    assert answers[30].get("agg_pending") is True
@@ -0,0 +1,69 @@
+import urllib.request
+
+import pytest
+from pymongo.results import BulkWriteResult
+
+from peakon_ingest.bench import MemoryStorage, run_benchmark
+from peakon_ingest.mock_peakon import FaultPlan, generate_tenant
+from peakon_ingest.storage import BulkUpserter
+from peakon_ingest.telemetry import Telemetry, current_stage, current_telemetry, render_prometheus, serve_metrics
+
+
+class FakeCollection:
+    name = "employees"
+
+    def find(self, query, projection=None):
+        return []
+
+    def bulk_write(self, ops, ordered=True):
+        return BulkWriteResult({"nUpserted": len(ops), "nModified": 0, "nMatched": 0, "upserted": []}, acknowledged=True)
+
+
+@pytest.mark.asyncio
+async def test_ingest_run_records_per_stage_request_and_paging_telemetry():
+    tenant = generate_tenant(employees=50, answers=120, seed=1)
+
+    report = await run_benchmark(
+        tenant, FaultPlan(token_ttl_requests=4, seed=1), storage=MemoryStorage(), per_page=50, stream_chunk_size=20
+    )
+
+    stages = report["telemetry"]["stages"]
+    assert stages["answers_export"]["pages"] == 3
+    assert stages["answers_export"]["items"] == 120
+    assert stages["answers_export"]["bytes"] > 0
+    assert stages["answers_export"]["latency_s"]["count"] == stages["answers_export"]["requests"]
+    assert sum(s["unauthorized"] for s in stages.values()) > 0
+    assert sum(s["retries"] for s in stages.values()) >= sum(s["unauthorized"] for s in stages.values())
+    assert stages["scores_by_driver"]["duration_s"] is not None
+
+
+def test_bulk_writes_are_attributed_to_the_current_stage_and_exported():
+    registry = Telemetry()
+    run = Telemetry(parent=registry)
+    telemetry_token = current_telemetry.set(run)
+    stage_token = current_stage.set("employees")
+    try:
+        writer = BulkUpserter(FakeCollection(), batch_size=2)
+        writer.add_many([(i, {"_id": i}) for i in range(3)])
+        writer.close()
+        run.observe_request("employees", 429, 0.2, 10)
+        run.finish_run("r1", "success", 1.5)
+    finally:
+        current_stage.reset(stage_token)
+        current_telemetry.reset(telemetry_token)
+
+    assert run.stages["employees"].write_batches == 2
+    assert registry.stages["employees"].write_ops == 3
+
+    server = serve_metrics(registry, 0, host="127.0.0.1")
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+    finally:
+        server.shutdown()
+
+    assert body == render_prometheus(registry)
+    assert 'peakon_ingest_mongo_write_batches_total{stage="employees"} 2' in body
+    assert 'peakon_ingest_http_requests_total{stage="employees",status="429"} 1' in body
+    assert 'peakon_ingest_http_request_duration_seconds_bucket{stage="employees",le="0.25"} 1' in body
+    assert "peakon_ingest_last_run_success 1" in body
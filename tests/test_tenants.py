@@ -0,0 +1,71 @@
+import json
+import os
+
+import pytest
+
+from peakon_ingest.config import Settings
+from peakon_ingest.tenants import TenantConfig, ingest_tenant, ingest_tenants, load_tenants
+
+
+def _write(tmp_path, tenants):
+    path = tmp_path / "tenants.json"
+    path.write_text(json.dumps({"tenants": tenants}))
+    return path
+
+
+def test_tenant_config_overrides_settings_and_gets_its_own_database(tmp_path, monkeypatch):
+    monkeypatch.setenv("ACME_PEAKON_TOKEN", "acme-secret")
+    path = _write(
+        tmp_path,
+        [
+            {"name": "acme", "company_id": 7, "app_token_env": "ACME_PEAKON_TOKEN", "max_in_flight": 2},
+            {"name": "globex", "company_id": 8, "mongo_db": "globex_peakon", "engagement_groups": ["a", "b"]},
+        ],
+    )
+    base = Settings(PEAKON_APP_TOKEN="shared", PEAKON_MAX_IN_FLIGHT=4)
+
+    acme, globex = (tenant.apply(base) for tenant in load_tenants(path))
+
+    assert (acme.peakon_company_id, acme.mongo_db, acme.peakon_app_token, acme.peakon_max_in_flight) == (
+        7,
+        "peakon_acme",
+        "acme-secret",
+        2,
+    )
+    assert (globex.mongo_db, globex.peakon_app_token, globex.engagement_groups()) == ("globex_peakon", "shared", ["a", "b"])
+    assert base.mongo_db == "peakon"
+
+
+def test_tenant_with_unset_token_variable_fails_instead_of_using_the_shared_token(monkeypatch):
+    monkeypatch.delenv("INITECH_PEAKON_TOKEN", raising=False)
+    tenant = TenantConfig(name="initech", company_id=9, app_token_env="INITECH_PEAKON_TOKEN")
+
+    with pytest.raises(ValueError, match="INITECH_PEAKON_TOKEN is not set"):
+        tenant.apply(Settings(PEAKON_APP_TOKEN="shared"))
+    result = ingest_tenant(Settings(PEAKON_APP_TOKEN="shared"), tenant)
+    assert (result["status"], result["mongo_db"]) == ("failure", "peakon_initech")
+
+
+def test_load_tenants_rejects_shared_databases(tmp_path):
+    path = _write(tmp_path, [{"name": "a", "company_id": 1, "mongo_db": "x"}, {"name": "b", "company_id": 2, "mongo_db": "x"}])
+
+    with pytest.raises(ValueError, match="share a database"):
+        load_tenants(path)
+
+
+def _fake_runner(settings, tenant):
+    if tenant.name == "broken":
+        raise RuntimeError("boom")
+    return {"tenant": tenant.name, "status": "success", "pid": os.getpid(), "db": tenant.apply(settings).mongo_db}
+
+
+def test_ingest_tenants_isolates_failures_per_tenant():
+    tenants = [TenantConfig(name=name, company_id=n) for n, name in enumerate(["acme", "broken", "globex"])]
+
+    results = ingest_tenants(Settings(), tenants, processes=2, runner=_fake_runner)
+
+    assert [r["tenant"] for r in results] == ["acme", "broken", "globex"]
+    assert [r["status"] for r in results] == ["success", "failure", "success"]
+    assert results[1]["error"] == "boom"
+    assert results[0]["db"] == "peakon_acme"
+    assert os.getpid() not in {results[0]["pid"], results[2]["pid"]}